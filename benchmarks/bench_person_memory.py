@@ -0,0 +1,56 @@
+import gc
+import sys
+
+from pedigree.pedigree_lib import Person
+
+"""
+Bytes per Person, as Persons used to be (an instance `__dict__`
+and a fresh name and gender string each) and as they are now.
+
+    python benchmarks/bench_person_memory.py [people]
+
+Names are built at run time, as they are when read from a file,
+so equal names aren't shared unless something interns them.
+"""
+
+
+class DictPerson(object):
+  """Person as it was before `__slots__`"""
+  def __init__(self, name, gender):
+    self.name = name
+    self.gender = gender
+
+
+def make_people(cls, count):
+  # Only a few hundred different names, like in a real family
+  return [cls(name="Person {}".format(i % 500),
+      gender="".join(["male" if i % 2 else "female"]))
+    for i in range(count)]
+
+
+def size_of(people):
+  """Bytes taken by `people` and everything only they refer to"""
+  seen = set()
+  total = 0
+  for person in people:
+    objects = [person, getattr(person, '__dict__', None), person.name,
+        person.gender]
+    for thing in objects:
+      if thing is not None and id(thing) not in seen:
+        seen.add(id(thing))
+        total += sys.getsizeof(thing)
+  return total
+
+
+def main(count=100000):
+  gc.collect()
+  for label, cls in [("before (__dict__)", DictPerson),
+      ("after (__slots__)", Person)]:
+    people = make_people(cls, count)
+    print("{:<20}{:7.1f} bytes per person".format(
+        label, size_of(people) / float(count)))
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import time
+
+"""
+How long `pedigree` takes to get going for commands that don't
+open the GUI.  Each run is a fresh interpreter, so nothing is
+already imported.
+
+    python benchmarks/bench_startup.py [runs]
+
+Exits with status 1 if the median of either measurement is over
+its budget.
+"""
+
+# Seconds
+IMPORT_BUDGET = 0.1
+VERSION_BUDGET = 0.1
+
+
+def median(numbers):
+  numbers = sorted(numbers)
+  return numbers[len(numbers) // 2]
+
+
+def time_command(command, runs):
+  times = []
+  with open(os.devnull, 'w') as devnull:
+    for run in range(runs):
+      start = time.time()
+      subprocess.check_call(command, stdout=devnull)
+      times.append(time.time() - start)
+  return median(times)
+
+
+def main(runs=11):
+  python = sys.executable
+  empty = [python, '-c', 'pass']
+  baseline = time_command(empty, runs)
+  import_time = time_command(
+      [python, '-c', 'import pedigree.main'], runs) - baseline
+
+  version_time = time_command([python, '-c',
+      'from pedigree import main; main.main()', '--version'],
+      runs) - baseline
+
+  over_budget = False
+  for label, seconds, budget in [
+      ("import pedigree.main", import_time, IMPORT_BUDGET),
+      ("pedigree --version", version_time, VERSION_BUDGET)]:
+    print("{:<22}{:7.1f} ms  (budget {:.0f} ms)".format(
+        label, seconds * 1000, budget * 1000))
+    if seconds > budget:
+      over_budget = True
+  return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,73 @@
+import random
+import sys
+import time
+
+from pedigree.pedigree_lib import Family, Person
+
+"""
+How long `Family.summary()` takes on a made-up family.
+
+    python benchmarks/bench_summary.py [people]
+
+Exits with status 1 if the best of a few runs is over its
+budget, so one slow moment on a busy machine doesn't count.
+"""
+
+# Seconds
+BUDGET = 1.0
+RUNS = 3
+
+
+def made_up_family(size, seed=0):
+  """
+  `size` people: a first generation of couples, then children of
+  random couples from the generation before, each of whom marries
+  someone from outside the family.
+  """
+  random.seed(seed)
+  family = Family()
+  count = [0]
+  def new_person(gender):
+    count[0] += 1
+    return Person(name="Person {}".format(count[0]), gender=gender)
+
+  couples = []
+  for i in range(10):
+    couple = (new_person("male"), new_person("female"))
+    family.add_spouse(*couple)
+    family.add_spouse(*reversed(couple))
+    couples.append(couple)
+  while count[0] < size:
+    next_couples = []
+    for i in range(len(couples) * 2):
+      father, mother = random.choice(couples)
+      child = new_person(random.choice(["male", "female"]))
+      family.add_child(father, child)
+      family.add_child(mother, child)
+      in_law = new_person("female" if child.gender == "male" else "male")
+      family.add_spouse(child, in_law)
+      family.add_spouse(in_law, child)
+      next_couples.append((child, in_law) if child.gender == "male"
+          else (in_law, child))
+      if count[0] >= size:
+        break
+    couples = next_couples
+  return family
+
+
+def main(size=100000):
+  family = made_up_family(size)
+  times = []
+  for run in range(RUNS):
+    start = time.time()
+    summary = family.summary()
+    times.append(time.time() - start)
+  seconds = min(times)
+  print("{} people, {} generations: summary in {:.0f} ms"
+      " (budget {:.0f} ms)".format(summary['persons'],
+          summary['generations'], seconds * 1000, BUDGET * 1000))
+  return 1 if seconds > BUDGET else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -20,6 +20,7 @@ if __name__ == "__main__":
           'console_scripts': ['pedigree=pedigree.main:main'],
         },
         package_dir={"": "src"},
+        package_data={"pedigree": ["static/*.js"]},
         zip_safe=False,
         install_requires=requirements,
         include_package_data=True,
@@ -0,0 +1,447 @@
+import array
+import ast
+import bisect
+import itertools
+import math
+import operator
+from pedigree import timeline
+
+"""
+Places, occupations, tags and anything else said about people,
+kept a column to an attribute rather than a dict to a person.
+
+Each person has a row number.  A number column is an `array('d')`
+of every row's value (NaN if it has none), a text column an
+`array('l')` of codes into its list of distinct values (-1 for
+none), and a tags column a list of each row's tags.  `gender`,
+`birth_year` and `death_year` are columns too, filled in from the
+Persons the first time they're asked about, so adding people costs
+next to nothing until then.
+
+Filters such as
+
+    birth_year < 1900 and place == "Bedrock"
+
+are parsed with `ast` and worked out a whole column at a time:
+each column keeps its rows sorted by value, so a comparison is a
+bisect and a slice of that, and `and`, `or` and `not` are set
+operations on the slices.  Nothing goes through the people one by
+one in Python except to hand back those found; even sorting a
+column is done with builtins.
+"""
+
+# Columns worked out from the Persons themselves, which can't be set
+DERIVED = ['gender', 'birth_year', 'death_year']
+
+MISSING = float('nan')
+
+
+def is_missing(number):
+  return math.isnan(number)
+
+
+class NumberColumn(object):
+  kind = 'number'
+
+  def __init__(self):
+    self.values = array.array('d')
+
+  def extend(self, rows):
+    self.values.extend([MISSING] * (rows - len(self.values)))
+
+  def set(self, row, value):
+    self.values[row] = MISSING if value is None else float(value)
+
+  def append(self, value):
+    self.values.append(MISSING if value is None else float(value))
+
+  def get(self, row):
+    value = self.values[row]
+    if is_missing(value):
+      return None
+    return int(value) if value.is_integer() else value
+
+  def copy(self):
+    copied = NumberColumn()
+    copied.values = array.array('d', self.values)
+    return copied
+
+  def sorted_rows(self):
+    """Rows with values, and their values, in order of value"""
+    values = self.values
+    # NaN isn't equal to itself
+    present = itertools.compress(xrange(len(values)),
+        itertools.imap(operator.eq, values, values))
+    rows = array.array('l', sorted(present, key=values.__getitem__))
+    return rows, array.array('d', itertools.imap(values.__getitem__, rows))
+
+  def accepts(self, value):
+    return value is None or (isinstance(value, (int, long, float)) and
+        not isinstance(value, bool))
+
+
+class TextColumn(object):
+  kind = 'text'
+
+  def __init__(self):
+    self.codes = array.array('l')
+    self.texts = []
+    self.code_of = {}
+
+  def extend(self, rows):
+    self.codes.extend([-1] * (rows - len(self.codes)))
+
+  def set(self, row, value):
+    if value is None:
+      self.codes[row] = -1
+      return
+    value = value if isinstance(value, basestring) else unicode(value)
+    if value not in self.code_of:
+      self.code_of[value] = len(self.texts)
+      self.texts.append(value)
+    self.codes[row] = self.code_of[value]
+
+  def append(self, value):
+    self.codes.append(-1)
+    if value is not None:
+      self.set(len(self.codes) - 1, value)
+
+  def get(self, row):
+    code = self.codes[row]
+    return None if code < 0 else self.texts[code]
+
+  def copy(self):
+    copied = TextColumn()
+    copied.codes = array.array('l', self.codes)
+    copied.texts = list(self.texts)
+    copied.code_of = dict(self.code_of)
+    return copied
+
+  def sorted_rows(self):
+    """Rows with values, and their values, in order of value"""
+    # Sorting the texts once saves comparing text for every row; the
+    # last rank is for code -1, nobody
+    order = sorted(xrange(len(self.texts)), key=self.texts.__getitem__)
+    rank = array.array('l', [0] * len(order) + [-1])
+    for position, code in enumerate(order):
+      rank[code] = position
+    ranks = array.array('l', itertools.imap(rank.__getitem__, self.codes))
+    present = itertools.compress(xrange(len(ranks)),
+        itertools.imap(operator.le, itertools.repeat(0), ranks))
+    rows = array.array('l', sorted(present, key=ranks.__getitem__))
+    return rows, map(self.texts.__getitem__,
+        itertools.imap(self.codes.__getitem__, rows))
+
+  def accepts(self, value):
+    return not isinstance(value, (list, tuple))
+
+
+class TagsColumn(object):
+  kind = 'tags'
+
+  def __init__(self):
+    self.tags = []
+
+  def extend(self, rows):
+    self.tags.extend([None] * (rows - len(self.tags)))
+
+  def set(self, row, value):
+    if value is not None and not isinstance(value, (list, tuple)):
+      value = [value]
+    self.tags[row] = None if value is None else tuple(value)
+
+  def append(self, value):
+    self.tags.append(None)
+    if value is not None:
+      self.set(len(self.tags) - 1, value)
+
+  def get(self, row):
+    tags = self.tags[row]
+    return None if tags is None else list(tags)
+
+  def copy(self):
+    copied = TagsColumn()
+    copied.tags = list(self.tags)
+    return copied
+
+  def rows_by_tag(self):
+    by_tag = {}
+    for row, tags in enumerate(self.tags):
+      for tag in tags or ():
+        by_tag.setdefault(tag, array.array('l')).append(row)
+    return by_tag
+
+  def accepts(self, value):
+    return True
+
+# From the narrowest kind of column to the widest, so a column can
+# be widened to hold a value it doesn't accept
+COLUMN_KINDS = [NumberColumn, TextColumn, TagsColumn]
+
+
+class AttributeStore(object):
+  """
+  The attributes of `persons` (and anyone added later), one
+  column to each attribute.
+  """
+  def __init__(self, persons=()):
+    self.persons = []
+    self.row_of = {}
+    self.columns = {}
+    # The DERIVED columns, made when first needed
+    self._derived = {}
+    # Each column's rows in order of value, made when first needed
+    self._indexes = {}
+    for person in persons:
+      self.add_person(person)
+
+  def copy(self):
+    copied = AttributeStore()
+    copied.persons = list(self.persons)
+    copied.row_of = dict(self.row_of)
+    for name, column in self.columns.iteritems():
+      copied.columns[name] = column.copy()
+    return copied
+
+  def __len__(self):
+    return len(self.persons)
+
+  def add_person(self, person):
+    """Give `person` a row, if they don't have one yet"""
+    if person.name in self.row_of:
+      return
+    self.row_of[person.name] = len(self.persons)
+    self.persons.append(person)
+    for column in self.columns.itervalues():
+      column.append(None)
+    if self._derived:
+      self._derived.clear()
+    if self._indexes:
+      self._indexes.clear()
+
+  def change_name(self, old_name, renamed):
+    """
+    File what `old_name` had under the Person `renamed`, who may
+    have a different gender or dates too.
+    """
+    row = self.row_of.pop(old_name)
+    self.row_of[renamed.name] = row
+    self.persons[row] = renamed
+    # The derived columns were made from the Person replaced
+    for attribute in self._derived.keys():
+      del self._derived[attribute]
+      self._indexes.pop(attribute, None)
+
+  def names(self):
+    """The attributes people have, besides the derived ones"""
+    return sorted(self.columns)
+
+  def column(self, attribute):
+    """The column of `attribute`, or None if nobody has it"""
+    if attribute in DERIVED:
+      if attribute not in self._derived:
+        self._derived[attribute] = self._derive(attribute)
+      return self._derived[attribute]
+    return self.columns.get(attribute)
+
+  def _derive(self, attribute):
+    if attribute == 'gender':
+      column = TextColumn()
+      for person in self.persons:
+        gender = person.gender
+        column.append(str(gender) if isinstance(gender, str) else gender)
+      return column
+    column = NumberColumn()
+    field = 'born' if attribute == 'birth_year' else 'died'
+    column.values.extend(MISSING if value is None else value
+        for value in (timeline.year(getattr(person, field))
+          for person in self.persons))
+    return column
+
+  def set(self, person, attribute, value):
+    if attribute in DERIVED:
+      raise ValueError("{} comes from the person's gender and dates and"
+          " can't be set".format(attribute))
+    self.add_person(person)
+    column = self.columns.get(attribute)
+    if column is None or not column.accepts(value):
+      column = self._widened(column, value)
+      self.columns[attribute] = column
+    column.set(self.row_of[person.name], value)
+    self._indexes.pop(attribute, None)
+
+  def _widened(self, column, value):
+    """A new column holding what `column` does, and `value` too"""
+    kinds = COLUMN_KINDS
+    if column is not None:
+      kinds = kinds[kinds.index(type(column)):]
+    kind = [kind for kind in kinds if kind().accepts(value)][0]
+    widened = kind()
+    widened.extend(len(self.persons))
+    if column is not None:
+      for row in xrange(len(self.persons)):
+        widened.set(row, column.get(row))
+    return widened
+
+  def get(self, person, attribute, default=None):
+    column = self.column(attribute)
+    row = self.row_of.get(person.name)
+    if column is None or row is None:
+      return default
+    value = column.get(row)
+    return default if value is None else value
+
+  def attributes_of(self, person):
+    """`{attribute: value}` for what's been set for `person`"""
+    row = self.row_of.get(person.name)
+    if row is None:
+      return {}
+    found = {}
+    for name in self.names():
+      value = self.columns[name].get(row)
+      if value is not None:
+        found[name] = value
+    return found
+
+  def _index(self, attribute):
+    column = self.column(attribute)
+    if column is None:
+      raise ValueError("Nobody has a {}; attributes are {}".format(
+          attribute, ", ".join(self.names() + DERIVED)))
+    if attribute not in self._indexes:
+      if column.kind == 'tags':
+        self._indexes[attribute] = column.rows_by_tag()
+      else:
+        self._indexes[attribute] = column.sorted_rows()
+    return self._indexes[attribute]
+
+  def select(self, expression):
+    """The Persons for whom `expression` holds, in the order added"""
+    rows = Filter(expression).rows(self)
+    return map(self.persons.__getitem__, sorted(rows))
+
+  def compare(self, attribute, op, value):
+    """The set of rows whose `attribute` is `op` `value`"""
+    index = self._index(attribute)
+    if op == 'in':
+      found = set()
+      for each in value:
+        found |= self.compare(attribute,
+            'has' if self.column(attribute).kind == 'tags' else '==', each)
+      return found
+    if self.column(attribute).kind == 'tags':
+      if op != 'has':
+        raise ValueError("{0} is tags, which can only be asked about as"
+            " in `\"x\" in {0}`".format(attribute))
+      return set(index.get(value, ()))
+    if op == 'has':
+      raise ValueError("`... in {0}` only works on tags; {0} isn't"
+          " tags".format(attribute))
+    rows, keys = index
+    if isinstance(keys, array.array):
+      if not isinstance(value, (int, long, float)):
+        raise ValueError("{} is a number, so can't be compared with"
+            " {!r}".format(attribute, value))
+    else:
+      value = value if isinstance(value, basestring) else unicode(value)
+    low = bisect.bisect_left(keys, value)
+    high = bisect.bisect_right(keys, value)
+    if op == '==':
+      return set(rows[low:high])
+    if op == '!=':
+      return set(rows[:low]) | set(rows[high:])
+    if op == '<':
+      return set(rows[:low])
+    if op == '<=':
+      return set(rows[:high])
+    if op == '>':
+      return set(rows[high:])
+    return set(rows[low:])
+
+
+OPERATORS = {ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=',
+    ast.Gt: '>', ast.GtE: '>=', ast.In: 'in'}
+# `3 < x` is `x > 3`
+FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==',
+    '!=': '!='}
+
+
+class Filter(object):
+  """
+  A filter expression, checked when it's made: comparisons of an
+  attribute with a constant, joined with `and`, `or`, `not` and
+  brackets.  `x in ("a", "b")` is true if x is either (or for
+  tags, has either), and `"a" in tags` if a is one of the tags.
+  People without an attribute fail any comparison of it (but pass
+  its `not`).
+  """
+  def __init__(self, expression):
+    self.expression = expression
+    try:
+      self.tree = ast.parse(expression.strip(), mode='eval').body
+    except SyntaxError:
+      raise ValueError("Can't make sense of the filter {!r}".format(
+          expression))
+    self._check(self.tree)
+
+  def _check(self, node):
+    if isinstance(node, ast.BoolOp):
+      for value in node.values:
+        self._check(value)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+      self._check(node.operand)
+    elif isinstance(node, ast.Compare):
+      list(self._comparisons(node))
+    else:
+      raise ValueError("Filters are made of comparisons like"
+          " `place == \"Bedrock\"`, not {!r}".format(self.expression))
+
+  def _comparisons(self, node):
+    """`(attribute, op, value)` for each link of a chained comparison"""
+    operands = [node.left] + node.comparators
+    for left, op, right in zip(operands, node.ops, operands[1:]):
+      if type(op) not in OPERATORS:
+        raise ValueError("Filters can't use {}".format(
+            type(op).__name__))
+      op = OPERATORS[type(op)]
+      if isinstance(left, ast.Name) and not isinstance(right, ast.Name):
+        value = _constant(right)
+        if op == 'in' and not isinstance(value, (list, tuple, set)):
+          raise ValueError("`{} in ...` needs a list of values".format(
+              left.id))
+        yield left.id, op, value
+      elif isinstance(right, ast.Name) and not isinstance(left, ast.Name):
+        yield right.id, 'has' if op == 'in' else FLIPPED[op], \
+            _constant(left)
+      else:
+        raise ValueError("Each comparison should be of an attribute with"
+            " a value, as in `place == \"Bedrock\"`")
+
+  def rows(self, store):
+    """The set of `store`'s rows the filter holds for"""
+    return self._rows(self.tree, store)
+
+  def _rows(self, node, store):
+    if isinstance(node, ast.BoolOp):
+      found = self._rows(node.values[0], store)
+      for value in node.values[1:]:
+        if isinstance(node.op, ast.And):
+          found &= self._rows(value, store)
+        else:
+          found |= self._rows(value, store)
+      return found
+    if isinstance(node, ast.UnaryOp):
+      return set(xrange(len(store))) - self._rows(node.operand, store)
+    found = None
+    for attribute, op, value in self._comparisons(node):
+      rows = store.compare(attribute, op, value)
+      found = rows if found is None else found & rows
+    return found
+
+
+def _constant(node):
+  try:
+    return ast.literal_eval(node)
+  except ValueError:
+    raise ValueError("Only names of attributes and constants can be"
+        " compared in filters")
@@ -0,0 +1,202 @@
+import collections
+import difflib
+import re
+import unicodedata
+
+"""
+Finding people who are probably listed twice, e.g. as "Jon Smith"
+and "John Smith (2)" after two trees were put together.
+
+Rather than comparing everyone with everyone, people are put into
+blocks by what a duplicate would likely share with them: their
+surname, how their surname sounds, a parent or a spouse.  Only
+people in the same block are compared, by how alike their names
+are and how many relatives they have in common.
+"""
+
+# Blocks bigger than this (everyone called Smith, say) are too
+# costly to compare all of and say little, so they're skipped;
+# the people in them still meet in their other blocks
+MAX_BLOCK = 200
+
+# Suggestions scoring under this aren't reported
+THRESHOLD = 0.8
+
+# How much of a name's similarity comes from the given names
+GIVEN_NAMES_WEIGHT = 0.7
+
+# What each relative in common, or each parent that differs, adds
+# to a name's similarity
+SHARED_BONUS = 0.1
+CONFLICT_PENALTY = 0.25
+
+Suggestion = collections.namedtuple('Suggestion',
+    ['score', 'person', 'duplicate', 'reasons'])
+
+suffix_regex = re.compile(r'\s*\(\d+\)\s*$')
+SOUNDEX_CODES = dict((letter, str(code))
+    for code, letters in enumerate(
+        ['aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r'])
+    for letter in letters)
+
+
+def normalize_name(name):
+  """
+  `"  Zo\xeb  O'Brien (2) "` -> `u"zoe obrien"`: lower case, without
+  accents, punctuation or a "(n)" suffix.  Letters of other
+  scripts are kept as they are.
+  """
+  if isinstance(name, str):
+    name = name.decode('utf-8', 'replace')
+  name = suffix_regex.sub('', name)
+  name = unicodedata.normalize('NFKD', name)
+  name = u"".join(char for char in name
+      if (char.isalnum() or char.isspace()) and
+          not unicodedata.combining(char)).lower()
+  return u" ".join(name.split())
+
+
+def surname(name):
+  """Last word of the normalized name, or "" if there isn't one"""
+  words = normalize_name(name).split()
+  return words[-1] if words else ""
+
+
+def soundex(word):
+  """American Soundex, e.g. 'robert' and 'rupert' -> 'r163'"""
+  word = "".join(char for char in word.lower() if char in SOUNDEX_CODES)
+  if not word:
+    return ""
+  code = word[0]
+  last = SOUNDEX_CODES[word[0]]
+  for char in word[1:]:
+    digit = SOUNDEX_CODES[char]
+    if digit != '0' and digit != last:
+      code += digit
+    # h and w don't separate letters with the same code
+    if char not in 'hw':
+      last = digit
+  return (code + '000')[:4]
+
+
+class Relatives(object):
+  """Everyone's parents, spouses and children by name, in one pass"""
+  def __init__(self, family):
+    self.parents = collections.defaultdict(dict)
+    self.spouses = collections.defaultdict(set)
+    self.children = collections.defaultdict(set)
+    for relator, person, relation_type in family.relations():
+      if relation_type == "spouse":
+        self.spouses[relator.name].add(person.name)
+        self.spouses[person.name].add(relator.name)
+      else:
+        self.parents[person.name][relation_type] = relator.name
+        self.children[relator.name].add(person.name)
+
+  def close(self, name, other):
+    """Whether `name` and `other` are parent and child or spouses"""
+    return other in self.parents[name].values() or \
+        name in self.parents[other].values() or \
+        other in self.spouses[name]
+
+
+def blocking_keys(person, relatives):
+  name_surname = surname(person.name)
+  if name_surname:
+    yield ('surname', name_surname)
+    # Soundex only codes Latin letters
+    if soundex(name_surname):
+      yield ('soundex', soundex(name_surname))
+  for parent in relatives.parents[person.name].values():
+    yield ('parent', parent)
+  for spouse in relatives.spouses[person.name]:
+    yield ('spouse', spouse)
+
+
+def blocks(persons, relatives, max_block=MAX_BLOCK):
+  """Lists of people sharing a blocking key, small enough to compare"""
+  by_key = collections.defaultdict(list)
+  for person in persons:
+    for key in set(blocking_keys(person, relatives)):
+      by_key[key].append(person)
+  for key in sorted(by_key):
+    if 1 < len(by_key[key]) <= max_block:
+      yield by_key[key]
+
+
+def name_similarity(name, other):
+  """
+  How alike two names are, from 0 to 1.  Given names count for
+  more than surnames, which relatives often share.  A name with
+  nothing left once normalized is like no other.
+  """
+  words = normalize_name(name).split()
+  other_words = normalize_name(other).split()
+  if not words or not other_words:
+    return 0.0
+  if len(words) < 2 or len(other_words) < 2:
+    return ratio(" ".join(words), " ".join(other_words))
+  return GIVEN_NAMES_WEIGHT * \
+      ratio(" ".join(words[:-1]), " ".join(other_words[:-1])) + \
+      (1 - GIVEN_NAMES_WEIGHT) * ratio(words[-1], other_words[-1])
+
+
+def ratio(string, other):
+  return difflib.SequenceMatcher(None, string, other).ratio()
+
+
+def score(person, other, relatives):
+  """
+  How likely `person` and `other` are to be the same, from 0 to
+  1, and why, or None if they can't be (their genders differ, or
+  one is the other's parent, child or spouse).
+  """
+  if person.gender is not None and other.gender is not None and \
+      person.gender != other.gender:
+    return None
+  if relatives.close(person.name, other.name):
+    return None
+  similarity = name_similarity(person.name, other.name)
+  reasons = ["names {:.0%} alike".format(similarity)]
+
+  parents = relatives.parents[person.name]
+  other_parents = relatives.parents[other.name]
+  for relation_type in sorted(set(parents) & set(other_parents)):
+    if parents[relation_type] == other_parents[relation_type]:
+      similarity += SHARED_BONUS
+      reasons.append("same {}".format(relation_type))
+    else:
+      similarity -= CONFLICT_PENALTY
+      reasons.append("different {}s".format(relation_type))
+  for kind, relation in [("spouses", relatives.spouses),
+      ("children", relatives.children)]:
+    shared = len(relation[person.name] & relation[other.name])
+    if shared:
+      similarity += SHARED_BONUS * shared
+      reasons.append("{} {} in common".format(shared, kind))
+  return max(0.0, min(1.0, similarity)), reasons
+
+
+def duplicates(family, threshold=THRESHOLD, max_block=MAX_BLOCK):
+  """
+  Suggestions of people in `family` who may be the same person,
+  best first.
+  """
+  relatives = Relatives(family)
+  compared = set()
+  suggestions = []
+  for block in blocks(family.persons(), relatives, max_block):
+    for i, person in enumerate(block):
+      for other in block[i + 1:]:
+        pair = tuple(sorted([person.name, other.name]))
+        if pair in compared:
+          continue
+        compared.add(pair)
+        scored = score(person, other, relatives)
+        if scored is not None and scored[0] >= threshold:
+          first, second = sorted([person, other])
+          suggestions.append(
+              Suggestion(scored[0], first, second, scored[1]))
+  suggestions.sort(key=lambda suggestion: (-suggestion.score,
+      suggestion.person.name, suggestion.duplicate.name))
+  return suggestions
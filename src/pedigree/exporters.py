@@ -0,0 +1,503 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+from xml.sax.saxutils import escape, quoteattr
+from pedigree.pedigree_lib import NoteStore, d3_canvas_page_generator, \
+    d3_html_page_generator, d3_script, dot_file_generator, \
+    generated_lines, install_d3
+
+"""
+Writing a Family out in several formats at once.
+
+Each native format has an exporter in `EXPORTERS`: a function
+that streams the family (or a FamilyView of it) into an open
+file, line by line.  Formats
+graphviz draws (svg, png, pdf, ...) are all made by one run of
+`dot`, so the layout is only worked out once, and unrelated parts
+of the family are drawn by several runs of `dot` at once.  The
+exporters and `dot` run side by side, each on a snapshot of the
+family.
+
+`dot` lays out generations in rows, but takes far longer than
+`sfdp`'s force-directed layout for big families, so the layout
+engine is chosen by the size of what's being drawn unless it's
+given.  A run can also be given a timeout, after which it's killed
+and the drawing is tried again with a faster engine; while it's
+going it says so on stderr now and then, so it can be told apart
+from one that's hung.
+"""
+
+EXPORTERS = {}
+GRAPHVIZ_FORMATS = ['svg', 'png', 'pdf', 'ps', 'eps', 'jpg', 'gif']
+DEFAULT_FORMATS = ['html', 'dot', 'svg']
+HTML_FORMATS = ['html', 'canvas.html']
+
+# Unrelated parts of the family with fewer people than this are
+# drawn together, to save starting `dot` for each of them
+COMPONENT_BATCH = 100
+
+# How many names the index of parts shows for each one
+INDEX_NAMES = 5
+
+# Graphviz layout engines, which "auto" chooses from by size
+ENGINES = ['dot', 'sfdp', 'neato', 'twopi']
+
+# Drawings with more people and relations than this together are
+# laid out by sfdp rather than dot
+DOT_LIMIT = 5000
+
+# What to try when an engine runs out of time
+FALLBACK_ENGINES = {'dot': 'sfdp', 'neato': 'sfdp', 'twopi': 'sfdp'}
+
+# Seconds between checks on a running engine, and between saying
+# it's still going
+POLL_INTERVAL = 0.1
+HEARTBEAT_INTERVAL = 30
+
+
+def exporter(extension):
+  """
+  Register the decorated function as how to write `.extension`
+  files.  It's called with a family and a file open for writing.
+  """
+  def register(function):
+    EXPORTERS[extension] = function
+    return function
+  return register
+
+
+def known_formats():
+  return sorted(EXPORTERS) + GRAPHVIZ_FORMATS
+
+
+def write_text(output_file, text):
+  """Write `text`, encoded as UTF-8 if it's unicode"""
+  if isinstance(text, unicode):
+    text = text.encode('utf-8')
+  output_file.write(text)
+
+
+def write_lines(lines, output_file, end=""):
+  for line in lines:
+    write_text(output_file, line + end)
+
+
+def notes_of(family, person):
+  if person in family.notes:
+    return family.notes[person]
+  return []
+
+
+@exporter('html')
+def write_html(family, output_file, d3=None):
+  write_lines(generated_lines(family, d3_html_page_generator, d3),
+      output_file)
+
+
+@exporter('canvas.html')
+def write_canvas_html(family, output_file, d3=None):
+  write_lines(generated_lines(family, d3_canvas_page_generator, d3),
+      output_file)
+
+
+@exporter('dot')
+def write_dot(family, output_file):
+  write_lines(generated_lines(family, dot_file_generator), output_file,
+      "\n")
+
+
+@exporter('ged')
+def write_gedcom(family, output_file):
+  from pedigree import gedcom
+  write_lines(gedcom.gedcom_generator(family), output_file, "\n")
+
+
+@exporter('json')
+def write_json(family, output_file):
+  """
+  The node-link layout d3 and networkx read, with people known
+  by their uids:
+
+      {"nodes": [{"id": uid, "name": label, "gender": ...,
+                  "notes": [...]}, ...],
+       "links": [{"source": uid, "target": uid, "type": ...}, ...]}
+  """
+  output_file.write('{"nodes": [')
+  separator = "\n  "
+  for person in family.persons():
+    output_file.write(separator + json.dumps({"id": family.uid(person),
+        "name": family.label(person), "gender": person.gender,
+        "notes": notes_of(family, person)}, sort_keys=True))
+    separator = ",\n  "
+  output_file.write('],\n"links": [')
+  separator = "\n  "
+  for source, target, relation_type in family.relations():
+    output_file.write(separator + json.dumps({"source": family.uid(source),
+        "target": family.uid(target), "type": relation_type},
+        sort_keys=True))
+    separator = ",\n  "
+  output_file.write("]}\n")
+
+
+@exporter('graphml')
+def write_graphml(family, output_file):
+  write_lines([
+    '<?xml version="1.0" encoding="UTF-8"?>',
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">',
+    '  <key id="name" for="node" attr.name="name"'
+        ' attr.type="string"/>',
+    '  <key id="gender" for="node" attr.name="gender"'
+        ' attr.type="string"/>',
+    '  <key id="notes" for="node" attr.name="notes"'
+        ' attr.type="string"/>',
+    '  <key id="type" for="edge" attr.name="type"'
+        ' attr.type="string"/>',
+    '  <graph edgedefault="directed">',
+  ], output_file, "\n")
+  for person in family.persons():
+    write_text(output_file, u'    <node id={}>\n'.format(
+        quoteattr(family.uid(person))))
+    write_text(output_file, u'      <data key="name">{}</data>\n'.format(
+        escape(family.label(person))))
+    if person.gender:
+      write_text(output_file,
+          u'      <data key="gender">{}</data>\n'.format(
+              escape(person.gender)))
+    notes = notes_of(family, person)
+    if notes:
+      write_text(output_file,
+          u'      <data key="notes">{}</data>\n'.format(
+              escape(u"\n".join(notes))))
+    output_file.write('    </node>\n')
+  for source, target, relation_type in family.relations():
+    write_text(output_file, u'    <edge source={} target={}>'
+        u'<data key="type">{}</data></edge>\n'.format(
+            quoteattr(family.uid(source)), quoteattr(family.uid(target)),
+            relation_type))
+  write_lines(['  </graph>', '</graphml>'], output_file, "\n")
+
+
+@exporter('gexf')
+def write_gexf(family, output_file):
+  write_lines([
+    '<?xml version="1.0" encoding="UTF-8"?>',
+    '<gexf xmlns="http://www.gexf.net/1.2draft" version="1.2">',
+    '  <graph defaultedgetype="directed">',
+    '    <attributes class="node">',
+    '      <attribute id="gender" title="gender" type="string"/>',
+    '      <attribute id="notes" title="notes" type="string"/>',
+    '    </attributes>',
+    '    <nodes>',
+  ], output_file, "\n")
+  for person in family.persons():
+    write_text(output_file, u'      <node id={} label={}><attvalues>'.format(
+        quoteattr(family.uid(person)), quoteattr(family.label(person))))
+    if person.gender:
+      write_text(output_file, u'<attvalue for="gender" value={}/>'.format(
+          quoteattr(person.gender)))
+    notes = notes_of(family, person)
+    if notes:
+      write_text(output_file, u'<attvalue for="notes" value={}/>'.format(
+          quoteattr(u"\n".join(notes))))
+    output_file.write('</attvalues></node>\n')
+  output_file.write('    </nodes>\n    <edges>\n')
+  for number, (source, target, relation_type) in \
+      enumerate(family.relations()):
+    write_text(output_file, u'      <edge id="{}" source={} target={}'
+        u' label="{}"/>\n'.format(number, quoteattr(family.uid(source)),
+            quoteattr(family.uid(target)), relation_type))
+  write_lines(['    </edges>', '  </graph>', '</gexf>'], output_file, "\n")
+
+
+def export_file(family, base_filename, extension, options=None):
+  """`options` are keyword arguments for the exporter"""
+  with open('{}.{}'.format(base_filename, extension), 'w') as output_file:
+    EXPORTERS[extension](family, output_file, **(options or {}))
+
+
+def choose_engine(family, engine='auto'):
+  """
+  `engine`, or if it's "auto" dot for up to DOT_LIMIT people and
+  relations in `family` and sfdp for more.  ValueError if it's
+  neither.
+  """
+  if engine == 'auto':
+    # Stop counting relations once there are too many
+    size = family.number_of_persons()
+    for relation in family.relations():
+      if size > DOT_LIMIT:
+        break
+      size += 1
+    return 'dot' if size <= DOT_LIMIT else 'sfdp'
+  if engine not in ENGINES:
+    raise ValueError("Unknown layout engine {}; choose from auto, {}".format(
+        engine, ", ".join(ENGINES)))
+  return engine
+
+
+def heartbeat(message):
+  sys.stderr.write(message + "\n")
+  sys.stderr.flush()
+
+
+def wait(process, timeout, description):
+  """
+  Wait for `process` to finish, saying every HEARTBEAT_INTERVAL
+  seconds that it's `description`.  Kills it after `timeout`
+  seconds, if given.  Returns its exit status, or None if it was
+  killed.
+  """
+  started = time.time()
+  next_heartbeat = started + HEARTBEAT_INTERVAL
+  while process.poll() is None:
+    now = time.time()
+    if timeout is not None and now - started >= timeout:
+      process.kill()
+      process.wait()
+      return None
+    if now >= next_heartbeat:
+      heartbeat("Still {} after {:.0f}s".format(description, now - started))
+      next_heartbeat += HEARTBEAT_INTERVAL
+    time.sleep(POLL_INTERVAL)
+  return process.returncode
+
+
+def run_dot(job):
+  """
+  Have one run of graphviz draw `base_filename.dot` in every one
+  of `formats`, as `base_filename.svg` etc.  `job` is the tuple
+  `(base_filename, formats, engine, timeout)`, so this can be
+  handed to a pool.  If the run takes more than `timeout` seconds,
+  it's tried again with the engine's FALLBACK_ENGINES, given as
+  long.  Returns whether it worked.
+  """
+  base_filename, formats, engine, timeout = job
+  dot_filename = '{}.dot'.format(base_filename)
+  outputs = ['{}.{}'.format(dot_filename, extension) for extension in formats]
+  description = "drawing {} with {}".format(
+      ", ".join(os.path.basename(output) for output in outputs), engine)
+  try:
+    # -O names each output after the input, as XXX.dot.svg etc.
+    process = subprocess.Popen(['dot', '-K{}'.format(engine), '-O'] +
+        ['-T{}'.format(extension) for extension in formats] +
+        [dot_filename])
+  except OSError, e:
+    logging.error("Couldn't run dot to make {} files: {}".format(
+        ", ".join(formats), e))
+    return False
+  returncode = wait(process, timeout, description)
+  if returncode is None:
+    for output in outputs:
+      if os.path.exists(output):
+        os.remove(output)
+    fallback = FALLBACK_ENGINES.get(engine)
+    if fallback is None:
+      logging.error("Gave up {} after {}s".format(description, timeout))
+      return False
+    logging.warn("Gave up {} after {}s; trying {}".format(description,
+        timeout, fallback))
+    return run_dot((base_filename, formats, fallback, timeout))
+  if returncode != 0:
+    logging.error("{} failed to make {} files".format(engine,
+        ", ".join(formats)))
+    return False
+  for extension, output in zip(formats, outputs):
+    os.rename(output, '{}.{}'.format(base_filename, extension))
+  return True
+
+
+def render_with_graphviz(family, base_filename, formats, keep_dot,
+    engine='auto', timeout=None):
+  """Draw the whole family with one run of graphviz"""
+  export_file(family, base_filename, 'dot')
+  try:
+    if formats:
+      run_dot((base_filename, formats, choose_engine(family, engine),
+          timeout))
+  finally:
+    if not keep_dot:
+      os.remove('{}.dot'.format(base_filename))
+
+
+def render_components(family, base_filename, formats, keep_dot,
+    split=False, processes=None, engine='auto', timeout=None):
+  """
+  Draw each unrelated part of the family with a run of `dot` of
+  its own, several at once, since `dot` takes more than twice as
+  long for twice as many people.
+
+  If `split`, part N goes to `base_filename.N.svg` etc. and
+  `base_filename.index.html` lists them.  Otherwise the parts
+  (small ones drawn together, COMPONENT_BATCH people at a time) are
+  stacked in one `base_filename.svg`, while the formats
+  that can't be stitched together are drawn whole.
+
+  Each part is drawn with `engine`, or if it's "auto" with
+  whichever suits its size; see `run_dot` for `timeout`.
+  """
+  parts = family.components(1 if split else COMPONENT_BATCH)
+  if len(parts) < 2 and not split:
+    render_with_graphviz(family, base_filename, formats, keep_dot,
+        engine, timeout)
+    return
+
+  if split:
+    part_formats = formats
+    whole_formats = []
+  else:
+    part_formats = [extension for extension in formats if extension == 'svg']
+    whole_formats = [extension for extension in formats if extension != 'svg']
+  if whole_formats or keep_dot:
+    render_with_graphviz(family, base_filename, whole_formats, keep_dot,
+        engine, timeout)
+  if not part_formats:
+    return
+
+  part_filenames = ['{}.{}'.format(base_filename, number + 1)
+      for number in range(len(parts))]
+  for part, part_filename in zip(parts, part_filenames):
+    export_file(part, part_filename, 'dot')
+  # Threads, as each only waits on its `dot`; forking here, in one
+  # of export_family's threads, could copy a held lock into the child
+  pool = ThreadPool(processes)
+  try:
+    done = pool.map(run_dot,
+        [(part_filename, part_formats, choose_engine(part, engine), timeout)
+          for part, part_filename in zip(parts, part_filenames)])
+  finally:
+    pool.close()
+    pool.join()
+    if not (split and keep_dot):
+      for part_filename in part_filenames:
+        os.remove('{}.dot'.format(part_filename))
+  if not all(done):
+    return
+
+  if split:
+    with open('{}.index.html'.format(base_filename), 'w') as index_file:
+      write_lines(index_page_generator(parts, part_filenames, formats),
+          index_file, "\n")
+  else:
+    svg_filenames = ['{}.svg'.format(part_filename)
+        for part_filename in part_filenames]
+    with open('{}.svg'.format(base_filename), 'w') as svg_file:
+      write_lines(stitched_svg_generator(svg_filenames), svg_file, "\n")
+    for svg_filename in svg_filenames:
+      os.remove(svg_filename)
+
+
+svg_tag_regex = re.compile(r'<svg\b([^>]*)>(.*)</svg>', re.DOTALL)
+svg_attribute_regex = re.compile(r'\b(width|height|viewBox)="([^"]*)"')
+
+
+def stitched_svg_generator(svg_filenames):
+  """
+  Yield lines of one SVG with the drawings in `svg_filenames`
+  (as `dot` makes them) one above another.  Ids are prefixed with
+  the drawing's number so they stay unique.
+  """
+  parts = []
+  for number, svg_filename in enumerate(svg_filenames):
+    with open(svg_filename) as svg_file:
+      match = svg_tag_regex.search(svg_file.read())
+    attributes = dict(svg_attribute_regex.findall(match.group(1)))
+    width = float(attributes['width'].replace('pt', ''))
+    height = float(attributes['height'].replace('pt', ''))
+    body = match.group(2).replace(' id="', ' id="c{}_'.format(number + 1))
+    parts.append((width, height, attributes.get('viewBox'), body))
+
+  total_width = max(width for width, height, view_box, body in parts)
+  total_height = sum(height for width, height, view_box, body in parts)
+  yield '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+  yield ('<svg width="{0:g}pt" height="{1:g}pt" viewBox="0 0 {0:g} {1:g}"'
+      ' xmlns="http://www.w3.org/2000/svg"'
+      ' xmlns:xlink="http://www.w3.org/1999/xlink">').format(
+          total_width, total_height)
+  top = 0
+  for width, height, view_box, body in parts:
+    yield '<svg x="0" y="{:g}" width="{:g}" height="{:g}"{}>'.format(
+        top, width, height,
+        ' viewBox="{}"'.format(view_box) if view_box else '')
+    yield body.strip()
+    yield '</svg>'
+    top += height
+  yield '</svg>'
+
+
+def index_page_generator(parts, part_filenames, formats):
+  """Yield lines of an html page linking to each part's drawings"""
+  yield '<!DOCTYPE html>'
+  yield '<meta charset="utf-8">'
+  yield '<title>Family tree</title>'
+  yield '<ol>'
+  for part, part_filename in zip(parts, part_filenames):
+    names = sorted(part.label(person) for person in part.persons())
+    shown = ", ".join(names[:INDEX_NAMES])
+    if len(names) > INDEX_NAMES:
+      shown += ", ..."
+    links = " ".join('<a href="{0}.{1}">{1}</a>'.format(
+        escape(os.path.basename(part_filename)), extension)
+        for extension in formats)
+    yield '  <li>{} {} ({}): {}</li>'.format(len(names),
+        "person" if len(names) == 1 else "people", escape(shown), links)
+  yield '</ol>'
+
+
+def export_family(family, base_filename, formats=DEFAULT_FORMATS,
+    threads=None, split_components=False, processes=None,
+    self_contained=False, engine='auto', timeout=None):
+  """
+  Write `family` to `base_filename.extension` for each of
+  `formats`.  Raises ValueError for a format or layout engine
+  nobody knows.
+
+  With `split_components`, graphviz formats are drawn in a file
+  for each unrelated part of the family (see `render_components`).
+  They're laid out by `engine` (see ENGINES, or "auto" to choose
+  by size), falling back to a faster one after `timeout` seconds.
+  HTML pages have d3 written into them if `self_contained`, and
+  otherwise load the copy of it put next to them.
+  """
+  unknown = [extension for extension in formats
+      if extension not in known_formats()]
+  if unknown:
+    raise ValueError("Unknown format(s) {}; choose from {}".format(
+        ", ".join(unknown), ", ".join(known_formats())))
+  if engine != 'auto':
+    choose_engine(family, engine)
+
+  graphviz_formats = [extension for extension in formats
+      if extension in GRAPHVIZ_FORMATS]
+  jobs = []
+  if graphviz_formats:
+    jobs.append((render_components, (base_filename, graphviz_formats,
+        'dot' in formats, split_components, processes, engine, timeout)))
+  html_formats = [extension for extension in formats
+      if extension in HTML_FORMATS]
+  if html_formats:
+    html_options = {'d3': d3_script(self_contained)}
+    if not self_contained:
+      install_d3(os.path.dirname(os.path.abspath(base_filename)))
+  for extension in formats:
+    if extension in EXPORTERS and \
+        not (extension == 'dot' and graphviz_formats):
+      jobs.append((export_file, (base_filename, extension,
+          html_options if extension in html_formats else None)))
+
+  # Parse every note now, rather than in several threads at once
+  if len(jobs) > 1 and isinstance(family.notes, NoteStore):
+    family.notes.load()
+  pool = ThreadPool(threads or len(jobs) or 1)
+  try:
+    results = [pool.apply_async(job, (family.snapshot(),) + arguments)
+        for job, arguments in jobs]
+    for result in results:
+      result.get()
+  finally:
+    pool.close()
+    pool.join()
@@ -0,0 +1,319 @@
+import datetime
+import logging
+import re
+from pedigree.pedigree_lib import Family, Person
+
+"""
+Reading and writing GEDCOM, the usual interchange format between
+genealogy programs.
+
+Only the parts that map onto a Family are used: INDI records
+become Persons (with their NAME, SEX, the DATEs of their BIRT and
+DEAT, and NOTEs) and FAM records
+give father/mother edges to each CHIL.  HUSB and WIFE are only
+made spouses if the FAM has a MARR event or no children, since
+otherwise it may just record who the parents were.  Everything
+else is skipped.
+"""
+
+GENDERS = {'M': "male", 'F': "female"}
+# Python's names for the character sets a HEAD's CHAR may give;
+# ANSEL has none, and is read as UTF-8 like any other
+CHARSETS = {'UTF-8': 'utf-8', 'ASCII': 'ascii', 'ANSI': 'cp1252',
+    'IBMPC': 'cp437'}
+SEXES = {"male": 'M', "female": 'F'}
+# Events giving the dates a Person has
+DATE_EVENTS = {'BIRT': 'born', 'DEAT': 'died'}
+
+line_regex = re.compile(
+    r'^\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?: (.*))?$')
+
+
+def parse_line(line):
+  """
+  Split a GEDCOM line into `(level, xref, tag, value)`, e.g.
+
+      "0 @I1@ INDI"          -> (0, '@I1@', 'INDI', '')
+      "1 NAME Fred /Flint/"  -> (1, None, 'NAME', 'Fred /Flint/')
+  """
+  match = line_regex.match(line.rstrip('\r\n'))
+  if not match:
+    return None
+  level, xref, tag, value = match.groups()
+  return int(level), xref, tag, value or ''
+
+
+def decode(line, encoding):
+  """
+  `line` as unicode if it has more than ASCII in it, as YAML reads
+  text, or as it is if it's plain ASCII or unicode already
+  """
+  if isinstance(line, unicode):
+    return line
+  try:
+    line.decode('ascii')
+    return line
+  except UnicodeDecodeError:
+    return line.decode(encoding, 'replace')
+
+
+def records(lines):
+  """
+  Group GEDCOM lines into records, yielding one level-0 record at
+  a time as `(xref, tag, value, [(level, tag, value), ...])`.
+  Only the current record is ever held in memory.  Lines are
+  decoded as the HEAD's CHAR says, UTF-8 until then.
+  """
+  record = None
+  encoding = 'utf-8'
+  for number, line in enumerate(lines):
+    if number == 0 and not isinstance(line, unicode):
+      line = line.lstrip('\xef\xbb\xbf')
+    parsed = parse_line(decode(line, encoding))
+    if parsed is None:
+      continue
+    level, xref, tag, value = parsed
+    if level == 1 and tag == 'CHAR' and record is not None and \
+        record[1] == 'HEAD':
+      encoding = CHARSETS.get(value.strip().upper(), 'utf-8')
+    if level == 0:
+      if record is not None:
+        yield record
+      record = (xref, tag, value, [])
+    elif record is not None:
+      record[3].append((level, tag, value))
+  if record is not None:
+    yield record
+
+
+def gedcom_name(value):
+  """`"Fred /Flintstone/ Jr."` -> `"Fred Flintstone Jr."`"""
+  return ' '.join(value.replace('/', ' ').split())
+
+
+def gedcom_date(date):
+  """
+  A Person's date as a GEDCOM DATE, e.g. `date(1850, 3, 2)` ->
+  `"2 MAR 1850"`; years and text are written as they are.
+  """
+  if isinstance(date, datetime.date):
+    return u"{} {} {}".format(date.day, date.strftime('%b').upper(),
+        date.year)
+  return unicode(date)
+
+
+def read_notes(fields):
+  """
+  Collect the NOTEs of a record, joining CONT/CONC continuation
+  lines.  Pointers to shared NOTE records are skipped.
+  """
+  notes = []
+  in_note = False
+  for level, tag, value in fields:
+    if level == 1:
+      in_note = tag == 'NOTE' and not value.startswith('@')
+      if in_note:
+        notes.append(value)
+    elif in_note and level == 2 and tag == 'CONT':
+      notes[-1] += '\n' + value
+    elif in_note and level == 2 and tag == 'CONC':
+      notes[-1] += value
+  return notes
+
+
+class GedcomReader(object):
+  """
+  Adds the people and relations of a GEDCOM file to a Family, one
+  record at a time.
+
+  Apart from the Family itself, the only things remembered
+  between records are which Person each INDI became and any FAM
+  records that mention an INDI not read yet.
+  """
+  def __init__(self, family):
+    self.family = family
+    self.persons = {}
+    self.used_names = set(family.names())
+    self.pending_families = []
+    self.has_father = set()
+    self.has_mother = set()
+
+  def unique_name(self, name):
+    """Tell apart people with the same name as "Name (2)" etc."""
+    if not name:
+      name = '?'
+    candidate = name
+    number = 1
+    while candidate in self.used_names:
+      number += 1
+      candidate = "{} ({})".format(name, number)
+    self.used_names.add(candidate)
+    return candidate
+
+  def read(self, lines):
+    for xref, tag, value, fields in records(lines):
+      if tag == 'INDI':
+        self.read_individual(xref, fields)
+      elif tag == 'FAM':
+        self.read_family(fields)
+    for fields in self.pending_families:
+      self.read_family(fields, last_chance=True)
+    self.pending_families = []
+    return self.family
+
+  def read_individual(self, xref, fields):
+    name = None
+    gender = None
+    dates = {}
+    event = None
+    for level, tag, value in fields:
+      if level == 1:
+        event = DATE_EVENTS.get(tag)
+      if level == 1 and tag == 'NAME' and name is None:
+        name = gedcom_name(value)
+      elif level == 1 and tag == 'SEX':
+        gender = GENDERS.get(value.strip().upper())
+      elif level == 2 and tag == 'DATE' and event is not None and \
+          value.strip():
+        dates.setdefault(event, value.strip())
+    person = Person(name=self.unique_name(name), gender=gender, **dates)
+    self.persons[xref] = person
+    self.family.add_person(person)
+    for note in read_notes(fields):
+      self.family.add_note(person, note)
+
+  def with_gender(self, xref, gender):
+    """The Person `xref` became, given `gender` if SEX didn't say"""
+    person = self.persons[xref]
+    if person.gender is None:
+      person = self.family.change_gender(person, gender)
+      self.persons[xref] = person
+    return person
+
+  def read_family(self, fields, last_chance=False):
+    members = [
+      (tag, value.strip())
+      for level, tag, value in fields
+      if level == 1 and tag in ('HUSB', 'WIFE', 'CHIL')
+    ]
+    missing = [xref for tag, xref in members
+        if xref not in self.persons]
+    if missing:
+      if not last_chance:
+        self.pending_families.append(fields)
+        return
+      logging.warn("Skipping {} in a FAM record: no INDI record"
+          " for them.".format(", ".join(missing)))
+      members = [(tag, xref) for tag, xref in members
+          if xref in self.persons]
+
+    children = [self.persons[xref] for tag, xref in members
+        if tag == 'CHIL']
+    married = not children or any(
+        level == 1 and tag == 'MARR' for level, tag, value in fields)
+
+    # The role in a FAM record says what SEX may have left out
+    husbands = [self.with_gender(xref, "male") for tag, xref in members
+        if tag == 'HUSB']
+    wives = [self.with_gender(xref, "female") for tag, xref in members
+        if tag == 'WIFE']
+
+    if married:
+      for husband in husbands:
+        for wife in wives:
+          self.family.add_spouse(husband, wife)
+          self.family.add_spouse(wife, husband)
+    for parents, already in [(husbands, self.has_father),
+        (wives, self.has_mother)]:
+      for parent in parents[:1]:
+        for child in children:
+          if child.name in already:
+            logging.warn("{} already has a {}; not adding {}.".format(
+                child, "father" if already is self.has_father
+                    else "mother", parent))
+            continue
+          already.add(child.name)
+          self.family.add_child(parent, child)
+
+
+def read_gedcom(lines, family=None):
+  """
+  Read GEDCOM `lines` (any iterable, such as an open file) into
+  `family`, or into a new Family if none is given.
+  """
+  if family is None:
+    family = Family()
+  return GedcomReader(family).read(lines)
+
+
+def gedcom_generator(family):
+  """
+  Yield the lines of a GEDCOM 5.5.1 file describing `family`, as
+  unicode, to be written out as UTF-8 as the header says.
+
+  Names are written as `family` labels them (so it may be a
+  FamilyView), without marking a surname.  Each
+  pair of parents (or lone parent) becomes one FAM record, as does
+  every couple of spouses, whose FAM gets a MARR event.
+  """
+  yield u"0 HEAD"
+  yield u"1 SOUR PEDIGREE"
+  yield u"1 GEDC"
+  yield u"2 VERS 5.5.1"
+  yield u"2 FORM LINEAGE-LINKED"
+  yield u"1 CHAR UTF-8"
+
+  xrefs = {}
+  for number, person in enumerate(family.persons()):
+    xref = u"@I{}@".format(number + 1)
+    xrefs[person.name] = xref
+    yield u"0 {} INDI".format(xref)
+    yield u"1 NAME {}".format(family.label(person))
+    if person.gender in SEXES:
+      yield u"1 SEX {}".format(SEXES[person.gender])
+    else:
+      yield u"1 SEX U"
+    for event, field in sorted(DATE_EVENTS.items()):
+      if getattr(person, field) is not None:
+        yield u"1 {}".format(event)
+        yield u"2 DATE {}".format(gedcom_date(getattr(person, field)))
+    if person in family.notes:
+      for note in family.notes[person]:
+        lines = note.split('\n')
+        yield u"1 NOTE {}".format(lines[0])
+        for line in lines[1:]:
+          yield u"2 CONT {}".format(line)
+
+  # Group children by their pair of parents
+  fathers = {}
+  mothers = {}
+  for father in family.fathers():
+    for child in family.children(father):
+      fathers[child.name] = father.name
+  for mother in family.mothers():
+    for child in family.children(mother):
+      mothers[child.name] = mother.name
+  units = {}
+  for child_name in set(fathers) | set(mothers):
+    units.setdefault((fathers.get(child_name), mothers.get(child_name)),
+        []).append(child_name)
+  married = set()
+  for prime_spouse in family.spouses():
+    for spouse in family.all_spouses(prime_spouse):
+      one, two = sorted([prime_spouse, spouse],
+          key=lambda person: (person.gender != "male", person.name))
+      units.setdefault((one.name, two.name), [])
+      married.add((one.name, two.name))
+
+  for number, (parents, children) in enumerate(sorted(units.items())):
+    yield u"0 @F{}@ FAM".format(number + 1)
+    husband, wife = parents
+    if husband is not None:
+      yield u"1 HUSB {}".format(xrefs[husband])
+    if wife is not None:
+      yield u"1 WIFE {}".format(xrefs[wife])
+    for child_name in sorted(children):
+      yield u"1 CHIL {}".format(xrefs[child_name])
+    if parents in married:
+      yield u"1 MARR Y"
+  yield u"0 TRLR"
@@ -0,0 +1,434 @@
+import easygui
+import tempfile
+from urllib import pathname2url
+import webbrowser
+import os
+import shutil
+import subprocess
+import threading
+import time
+from pedigree.pedigree_lib import Person, BackgroundRenderer, \
+    load_family, save_family, d3_html_page_generator, d3_script, \
+    dot_file_generator, generated_lines, VENDORED_D3
+
+"""
+The easygui interface used by `pedigree` with no subcommand, and
+the browser charts it shows.  Nothing else imports this module, so
+the other commands work without a display.
+"""
+
+# Families bigger than this are searched rather than listed in
+# full when choosing someone, and searches show this many matches.
+SEARCH_THRESHOLD = 200
+SEARCH_RESULTS = 50
+
+# Bytes buffered each way on the pipes to and from `dot`
+PIPE_BUFFER = 1 << 16
+
+# Where this session's charts are written, made when the first one
+# is and removed when `interact` ends
+_temp_dir = None
+
+# Seconds a browser is given to read a chart it's been asked to
+# open before the chart can be deleted, and when one last was
+BROWSER_LOAD_TIME = 5
+_last_opened = None
+
+def temp_dir():
+  global _temp_dir
+  if _temp_dir is None:
+    _temp_dir = tempfile.mkdtemp(prefix="pedigree-")
+  return _temp_dir
+
+def remove_temp_dir():
+  """Delete the charts, once the browser has had time to open them"""
+  global _temp_dir
+  if _temp_dir is not None:
+    if _last_opened is not None:
+      time.sleep(max(0, _last_opened + BROWSER_LOAD_TIME - time.time()))
+    shutil.rmtree(_temp_dir, ignore_errors=True)
+    _temp_dir = None
+
+def search_choice(family, message, title, extra_choices=[]):
+  """
+  Ask for part of a name (or a word from someone's notes), then
+  choose among the best matches or `extra_choices`.
+  """
+  while True:
+    query = easygui.enterbox(
+        "{}\n\nSearch by name or notes:".format(message), title)
+    if not query:
+      return None
+    matches = family.search(query, SEARCH_RESULTS)
+    if not matches:
+      easygui.msgbox("Nobody matches {}.".format(query), title)
+      continue
+    chosen = easygui.choicebox(message, title,
+        [person.name for person in matches] + extra_choices + \
+        ["**** Search again ****"]
+      )
+    if chosen != "**** Search again ****":
+      return chosen
+
+def choose_person(family, message, title, persons=None):
+  if persons == None and \
+      family.number_of_persons() > SEARCH_THRESHOLD:
+    return family.name_to_person(
+        search_choice(family, message, title))
+  if persons == None:
+    persons = family.persons()
+  chosen = easygui.choicebox(message, title,
+    [person.name for person in persons]
+  )
+  return family.name_to_person(chosen)
+
+def choose_note(family, person, title):
+  if person not in family.notes:
+    return None
+
+  chosen = easygui.choicebox("Which note?", title,
+    ["- " + note for note in family.notes[person]]
+  )
+  if chosen is None:
+    return None
+  return chosen[2: ]
+
+def display_notes(family, person):
+  easygui.textbox(
+    person.name,
+    "",
+    "\n".join(["- " + note for note in family.notes[person]])
+  )
+
+def display_siblings(family, person):
+  groups = [
+    ("Full siblings", family.full_siblings(person)),
+    ("Half siblings through their father",
+      family.half_siblings(person, "paternal")),
+    ("Half siblings through their mother",
+      family.half_siblings(person, "maternal")),
+    ("Step siblings", family.step_siblings(person)),
+  ]
+  easygui.textbox(
+    person.name,
+    "",
+    "\n\n".join(["{}:\n{}".format(heading,
+        "\n".join(["- " + sibling.name for sibling in sorted(siblings)])
+        or "- none known")
+      for heading, siblings in groups])
+  )
+
+def choose_person_or_add(family, message, title, gender=None):
+  if family.number_of_persons() > SEARCH_THRESHOLD:
+    chosen = search_choice(family, message, title,
+        ["**** Add a new person ****"])
+  else:
+    chosen = easygui.choicebox(message, title,
+        [person.name for person in family.persons()] + \
+        ["**** Add a new person ****"]
+      )
+  if not chosen:
+    return None
+  if chosen == "**** Add a new person ****":
+    new_name = easygui.enterbox(
+      "Enter the new person's name", title)
+    if not new_name:
+      return None
+    if not gender:
+      given = easygui.choicebox("Gender", title,
+        ["Male", "Female"]
+      )
+      gender = given.lower()
+    new_person = Person(new_name, gender)
+    family.add_person(new_person)
+    return new_person
+  else:
+    return family.name_to_person(chosen)
+
+def choose_couple_or_add(family, message, title):
+  chosen = easygui.choicebox(message, title,
+      ["{} and {}".format(couple[0].name, couple[1].name)
+        for couple in family.couples()] + \
+      ["**** Add a new couple ****"]
+    )
+  if not chosen:
+    return None
+  if chosen == "**** Add a new couple ****":
+    person_1 = choose_person_or_add(family,
+        "First member of the couple:", title)
+    person_2 = choose_person_or_add(family,
+        "Second member of the couple:", title)
+    if person_1 and person_2:
+      return (person_1, person_2)
+    return None
+  else:
+    return family.string_to_couple(chosen)
+
+def add_person(family, message, title, gender=None):
+  new_name = easygui.enterbox(message, title)
+  if not new_name:
+    return None
+  if not gender:
+    given = easygui.choicebox("Gender", title,
+      ["Male", "Female"]
+    )
+    gender = given.lower()
+  new_person = Person(new_name, gender)
+  family.add_person(new_person)
+  return new_person
+
+
+def open_in_browser(filename):
+  global _last_opened
+  webbrowser.open('file:{}'.format(pathname2url(filename)))
+  _last_opened = time.time()
+
+def show_temp_floating_chart(family):
+  """
+  Create a floating chart in a temporary file and open it in the browser.
+  """
+
+  # Create a temporary file
+  html_file_descriptor, html_filename = tempfile.mkstemp(suffix=".html",
+      dir=temp_dir())
+
+  # Put html of the floating chart in it
+  html_file = os.fdopen(html_file_descriptor, 'w')
+  # Nothing is next to the temporary file for it to load
+  for line in generated_lines(family, d3_html_page_generator,
+      d3_script(self_contained=os.path.exists(VENDORED_D3))):
+    html_file.write(line)
+  html_file.close()
+
+  open_in_browser(html_filename)
+
+def write_svg(family, svg_file, first_names_only=False):
+  """
+  Draw a rigid chart of `family` into `svg_file`, piping the DOT
+  into `dot` and its SVG back out, without a .dot file between.
+  """
+  process = subprocess.Popen(['dot', '-Tsvg'], bufsize=PIPE_BUFFER,
+      stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+  # Written from another thread so neither end can be left waiting
+  # on the other's full pipe
+  def feed():
+    try:
+      for line in generated_lines(family, dot_file_generator,
+          first_names_only):
+        process.stdin.write(line + "\n")
+    except IOError:
+      pass  # dot stopped reading; its exit status says why
+    finally:
+      process.stdin.close()
+  feeder = threading.Thread(target=feed)
+  feeder.daemon = True
+  feeder.start()
+  shutil.copyfileobj(process.stdout, svg_file, PIPE_BUFFER)
+  feeder.join()
+  if process.wait() != 0:
+    raise RuntimeError("dot failed to draw the chart")
+
+def show_temp_rigid_chart(family, first_names_only=False):
+  """
+  Create a rigid chart in a temporary file and open it in the browser.
+  Each chart replaces the last, so a long session leaves only one.
+  """
+  svg_filename = os.path.join(temp_dir(), "family_tree.svg")
+  # Moved into place when finished, so a browser still showing the
+  # last chart never reads half of this one
+  svg_file = tempfile.NamedTemporaryFile(suffix=".svg", dir=temp_dir(),
+      delete=False)
+  try:
+    with svg_file:
+      write_svg(family, svg_file, first_names_only)
+    os.rename(svg_file.name, svg_filename)
+  except:
+    os.remove(svg_file.name)
+    raise
+
+  open_in_browser(svg_filename)
+
+def interact(yaml_filename):
+  family = load_family(yaml_filename)
+  renderer = BackgroundRenderer()
+  # However the menus end, charts asked for are finished and then
+  # deleted
+  try:
+    edit_family(family, yaml_filename, renderer)
+  finally:
+    renderer.close()
+    remove_temp_dir()
+
+def edit_family(family, yaml_filename, renderer):
+  """The menus, until the user quits"""
+  titlebar = "Editing {0}".format(yaml_filename)
+  quit_yet = False
+  while not quit_yet:
+    new_relations = {
+      "b.  Add a new person as a full sibling":
+        ["full sibling", family.add_full_sibling, None],
+      "c.  Add a new person as a father":
+        ["father", family.add_father, "male"],
+      "d.  Add a new person as a mother":
+        ["mother", family.add_mother, "female"],
+      "e.  Add a new person as a child":
+        ["child", family.add_child, None],
+    }
+    existing_relations = {
+      "f.  Add an existing person as a full sibling":
+        ["full_sibling", family.add_full_sibling],
+      "g.  Add an existing person as a father":
+        ["father", family.add_father],
+      "h.  Add an existing person as a mother":
+        ["mother", family.add_mother],
+      "i.  Add an existing person as a child":
+        ["child", family.add_child],
+    }
+    next_move = easygui.choicebox("What would you like to do?",
+        titlebar,
+        [
+        "a. Add a new person",
+        ] + \
+        existing_relations.keys() + new_relations.keys() + \
+        [
+        "j. Add new people as children of a couple",
+        "k. Add a pair of spouses",
+        "l. See a floating chart in the browser",
+        "m. See a rigid chart in the browser",
+        "n. Change an existing person's name",
+        "o. See a rigid chart in the browser (first names only)",
+        "p. Add a note to a person",
+        "q. Quit",
+        "r. See notes about a person",
+        "s. Delete a note from a person",
+        "t. Find a person by name or notes",
+        "u. See a person's siblings",
+        ]
+    )
+    change_made = False
+    if not next_move:
+      quit_yet = True
+    if next_move in existing_relations:
+      relationship = existing_relations[next_move][0]
+      add_function = existing_relations[next_move][1]
+      person = choose_person(family, "To whom?", titlebar)
+      if person:
+        rel = choose_person(family,
+            "Who is the {}?".format(relationship), titlebar)
+        if rel:
+          add_function(person, rel)
+          change_made = True
+    if next_move in new_relations:
+      relationship = new_relations[next_move][0]
+      add_function = new_relations[next_move][1]
+      gender = new_relations[next_move][2]
+      person = choose_person(family, "To whom?", titlebar)
+      if person:
+        rel = add_person(family,
+            "Who is the new {}?".format(relationship), titlebar,
+            gender)
+        if rel:
+          add_function(person, rel)
+          change_made = True
+    if next_move == "j. Add new people as children of a couple":
+      couple = choose_couple_or_add(family, "Choose a couple",
+          titlebar)
+
+      # Loop over and over adding kids until the user presses Cancel
+      kid = "Fake thing that's just not None"
+      while kid:
+        kid = add_person(family,
+            "Child's name? (Press Cancel to stop)", titlebar)
+        if kid:
+          family.add_child(couple[0], kid)
+          family.add_child(couple[1], kid)
+          change_made = True
+    if next_move == "n. Change an existing person's name":
+      person = choose_person(family, "Whom?", titlebar)
+      if person:
+        new_name = easygui.enterbox(
+            "Enter {}'s new name".format(person.name, titlebar))
+        if new_name:
+          try:
+            family.change_name(person, new_name)
+            change_made = True
+          except ValueError as error:
+            easygui.msgbox(str(error), titlebar)
+    if next_move == "p. Add a note to a person":
+      person = choose_person(family, "To whom?", titlebar)
+      if person:
+        new_note = easygui.enterbox(
+            "Enter anything about {}".format(person.name))
+        if new_note:
+            family.add_note(person, new_note)
+            change_made = True
+    if next_move == "s. Delete a note from a person":
+      people = family.people_with_notes()
+      person = None
+      if len(people) == 0:
+        easygui.textbox(titlebar, "", "Nobody has any notes yet.")
+      elif len(people) == 1:
+        person = people[0] 
+      else:
+        person = choose_person(family, "Whom?", titlebar, people)
+      if person:
+        to_be_deleted = choose_note(family, person, titlebar)
+        if to_be_deleted:
+          family.delete_note(person, to_be_deleted)
+          change_made = True
+    if next_move == "r. See notes about a person":
+      people = family.people_with_notes()
+      person = None
+      if len(people) == 0:
+        easygui.textbox(titlebar, "", "Nobody has any notes yet.")
+      elif len(people) == 1:
+        person = people[0] 
+      else:
+        person = choose_person(family, "Whom?", titlebar, people)
+      if person:
+        display_notes(family, person)
+    if next_move == "t. Find a person by name or notes":
+      person = family.name_to_person(
+          search_choice(family, "Whom?", titlebar))
+      # SqliteNotes can't be asked about nobody
+      if person and person in family.notes:
+        display_notes(family, person)
+      elif person:
+        easygui.textbox(titlebar, "",
+            "{} has no notes yet.".format(person.name))
+    if next_move == "u. See a person's siblings":
+      person = choose_person(family, "Whose?", titlebar)
+      if person:
+        display_siblings(family, person)
+    if next_move == "k. Add a pair of spouses":
+      person_1 = choose_person_or_add(family, "First person?",
+          titlebar)
+      if person_1:
+        person_2 = choose_person_or_add(family,
+            "Second person?", titlebar)
+        if person_2:
+          family.add_spouse(person_1, person_2)
+          family.add_spouse(person_2, person_1)
+          change_made = True
+    if next_move == "a. Add a new person":
+      person = add_person(family, "New person's name?", titlebar)
+      if person:
+        change_made = True
+    # Charts open in the browser whenever they're ready
+    popup_string = "\n\033[91mThe chart will open when it's ready\033[0m"
+    if next_move == "l. See a floating chart in the browser":
+      print(popup_string)
+      renderer.submit(show_temp_floating_chart, family)
+    if next_move == "m. See a rigid chart in the browser":
+      print(popup_string)
+      renderer.submit(show_temp_rigid_chart, family)
+    if next_move == "o. See a rigid chart in the browser (first names only)":
+      print(popup_string)
+      renderer.submit(show_temp_rigid_chart, family,
+          first_names_only=True)
+    if next_move == "q. Quit":
+      quit_yet = True
+    if change_made:
+      if easygui.ynbox("Save changes?", titlebar):
+        save_family(family, yaml_filename)
@@ -20,22 +20,126 @@ For a quick example
 
     pedigree -y examples/example.yaml
 
+A SQLite database (.sqlite, .sqlite3 or .db) made with `pedigree
+convert` can be used anywhere a .yaml file can.  People and relations
+are then looked up in the database as they are needed, rather than
+all being read into memory first.
+
+`generate` also accepts a directory of .yaml files, or a manifest
+.yaml file containing only
+
+    shards:
+      - smiths.yaml
+      - joneses.yaml
+
+in place of a single .yaml file.  The shards are merged into one
+family by name, so a shard may refer to people listed in another.
+Parsed shards are cached in `.pedigree_cache` and only re-read when
+they change.
+
 Usage:
   pedigree [--yaml-filename=<filename>]
-  pedigree generate [--base-filename=<filename>] [--yaml-filename=<filename>] 
+  pedigree generate [--base-filename=<filename>] [--yaml-filename=<filename>] [--formats=<formats>] [--split-components] [--names=<names>] [--lineage=<name>] [--alive-in=<year>] [--where=<filter>] [--self-contained] [--engine=<engine>] [--timeout=<seconds>] [--salt=<salt>]
   pedigree cleanup [--base-filename=<filename>]
+  pedigree stats [--yaml-filename=<filename>]
+  pedigree relate --people=<filename> [--yaml-filename=<filename>] [--output=<filename>]
+  pedigree dedupe [--yaml-filename=<filename>] [--threshold=<score>]
+  pedigree query --stdin [--yaml-filename=<filename>]
+  pedigree convert <from-filename> <to-filename>
+  pedigree merge <from-filename> <other-filename> --output=<filename> [--aliases=<filename>]
+  pedigree import <gedcom-filename> [--yaml-filename=<filename>]
+  pedigree export <gedcom-filename> [--yaml-filename=<filename>]
   pedigree -h | --help
   pedigree --version
 
 Options:
   -h --help                      Show this screen.
   -v --version                   Show version.
-  -y --yaml-filename=<filename>  .yaml file containing relations for tree.
+  -y --yaml-filename=<filename>  .yaml file containing relations for tree,
+                                 or a directory/manifest of shards.
                                  [DEFAULT: relations.yaml]
   -b --base-filename=<filename>  XXX in output filenames XXX.svg, XXX.html, ...
                                  [DEFAULT: family_tree]
+  -f --formats=<formats>         Comma-separated formats for `generate` to
+                                 write, from html, canvas.html (the html
+                                 chart drawn quickly enough for big families),
+                                 dot, json, graphml, gexf, ged and whatever
+                                 graphviz draws (svg, png, pdf, ps, eps, jpg,
+                                 gif)
+                                 [DEFAULT: html,dot,svg]
+  -s --split-components          Draw each unrelated part of the family in
+                                 its own XXX.1.svg, XXX.2.svg, ... and list
+                                 them in XXX.index.html, rather than stacking
+                                 them in one XXX.svg
+  -n --names=<names>             How `generate` shows names: full, first,
+                                 initials or anonymous (made-up names that
+                                 can't be traced back without the --salt,
+                                 and no notes)
+                                 [DEFAULT: full]
+  --salt=<salt>                  Secret that anonymous names are made
+                                 with, to give someone the same made-up name
+                                 from one run to the next.  Random (so
+                                 different every run) if not given
+  -l --lineage=<name>            Only show <name> and their ancestors and
+                                 descendants
+  --alive-in=<year>              Only show people alive in <year>, going by
+                                 the born and died dates in the people
+                                 section
+  -w --where=<filter>            Only show people this holds for, e.g.
+                                 'birth_year < 1900 and place == "Bedrock"',
+                                 going by the attributes in the people
+                                 section (and gender, birth_year and
+                                 death_year)
+  -c --self-contained            Write d3 into .html files, rather than
+                                 putting a d3.v3.min.js next to them for
+                                 them to load
+  -e --engine=<engine>           Graphviz layout engine for `generate`: dot
+                                 (generations in rows), sfdp (much faster
+                                 for big families), neato, twopi, or auto
+                                 for dot unless there are more than 5000
+                                 people and relations to draw
+                                 [DEFAULT: auto]
+  --timeout=<seconds>            If laying out a drawing takes longer than
+                                 this, stop and lay it out again with sfdp
+                                 (given as long again).  While it's going,
+                                 `generate` says so every 30 seconds
+  -o --output=<filename>         Where `merge` writes the merged .yaml file,
+                                 or `relate` its table (JSON if it ends in
+                                 .json, else CSV; on the screen if not given)
+  -p --people=<filename>         File of names, one to a line, for `relate`
+  -a --aliases=<filename>        .yaml file of `other name: name` for people
+                                 `merge` should treat as the same
+  -t --threshold=<score>         How alike (0 to 1) two people must be for
+                                 `dedupe` to suggest they're the same
+                                 [DEFAULT: 0.8]
+  --stdin                        Read `query`'s queries from stdin
   cleanup                        Delete generated files (XXX.svg, etc.)
   generate                       Simply create the .svg, .dot, .html files
+                                 (or those of --formats)
+  stats                          Show how many people, generations, couples,
+                                 etc. the family has, and how many people
+                                 are missing parents
+  relate                         Tabulate how each of the --people is related
+                                 to each of the others
+  dedupe                         List people who may be listed twice under
+                                 different spellings, with a score for each
+  query                          Answer queries, one JSON object to a line,
+                                 such as {"query": "ancestors", "name": "X"},
+                                 with a line of JSON each, reading the family
+                                 only once.  Queries are parents, children,
+                                 spouses, siblings (full, half and step),
+                                 ancestors, descendants, couples,
+                                 relationship (of "name" to "other") and
+                                 select (everyone a "where" filter holds
+                                 for)
+  convert                        Copy a family from a .yaml file into a
+                                 SQLite database (.sqlite, .sqlite3, .db)
+                                 or back again
+  merge                          Merge two .yaml files into one, listing
+                                 what they disagree on (the first wins)
+  import                         Add the people in a GEDCOM file to the
+                                 .yaml file (or SQLite database)
+  export                         Write the family out as a GEDCOM file
 """
 
 def main():
@@ -43,18 +147,81 @@ def main():
   base_filename = args['--base-filename']
   yaml_filename = args['--yaml-filename']
 
+  if args['convert']:
+    pedigree_lib.convert_family(args['<from-filename>'],
+        args['<to-filename>'])
+    return
+
+  if args['merge']:
+    pedigree_lib.merge_files(
+        [args['<from-filename>'], args['<other-filename>']],
+        args['--output'], args['--aliases'])
+    return
+
   # If yaml file doesn't exist or is completely empty, create a blank one
-  if not os.path.exists(yaml_filename) or os.stat(yaml_filename).st_size == 0:
+  # (SQLite databases are created when they're opened)
+  if not pedigree_lib.is_sqlite(yaml_filename) and \
+      (not os.path.exists(yaml_filename) or
+          os.stat(yaml_filename).st_size == 0):
     pedigree_lib.create_blank_yaml(yaml_filename)
 
   if args['cleanup']:
     pedigree_lib.cleanup_files(yaml_filename, base_filename)
 
   elif args['generate']:
-    pedigree_lib.generate_files(yaml_filename, base_filename)
+    formats = [extension.strip().lower()
+        for extension in args['--formats'].split(',') if extension.strip()]
+    alive_in = None
+    if args['--alive-in'] is not None:
+      try:
+        alive_in = int(args['--alive-in'])
+      except ValueError:
+        print("--alive-in should be a year.")
+        exit(1)
+    timeout = None
+    if args['--timeout'] is not None:
+      try:
+        timeout = float(args['--timeout'])
+      except ValueError:
+        print("--timeout should be a number of seconds.")
+        exit(1)
+    pedigree_lib.generate_files(yaml_filename, base_filename, formats,
+        args['--split-components'], args['--names'], args['--lineage'],
+        args['--self-contained'], alive_in, args['--where'],
+        args['--engine'], timeout, args['--salt'])
+
+  elif args['stats']:
+    pedigree_lib.print_summary(yaml_filename)
+
+  elif args['relate']:
+    pedigree_lib.relate_people(yaml_filename, args['--people'],
+        args['--output'])
+
+  elif args['dedupe']:
+    try:
+      threshold = float(args['--threshold'])
+    except ValueError:
+      print("--threshold should be a number from 0 to 1.")
+      exit(1)
+    pedigree_lib.find_duplicates(yaml_filename, threshold)
+
+  elif args['query']:
+    pedigree_lib.answer_queries(yaml_filename)
+
+  elif args['import']:
+    pedigree_lib.import_gedcom(args['<gedcom-filename>'], yaml_filename)
+
+  elif args['export']:
+    pedigree_lib.export_gedcom(yaml_filename, args['<gedcom-filename>'])
+
+  elif pedigree_lib.is_shard_set(yaml_filename):
+    print("{} is made of several shards, which can only be used with"
+        " `pedigree generate`.".format(yaml_filename))
+    exit(1)
 
   else:
-    pedigree_lib.interact(yaml_filename)
+    from pedigree import gui
+    gui.interact(yaml_filename)
 
 if __name__ == "__main__":
   main()
@@ -1,15 +1,39 @@
-import hashids
+import importlib
 import re
-import networkx as nx
-import yaml
-import easygui
-import tempfile
-from urllib import pathname2url
-import webbrowser
 import os
-import subprocess
-import time
+import threading
 import logging
+import bisect
+import gc
+import heapq
+import itertools
+import json
+import pickle
+import shutil
+import sys
+
+
+class LazyModule(object):
+  """
+  Stands in for a module, importing it the first time one of its
+  attributes is used.  Keeps commands that never touch the module
+  from paying to import it.
+  """
+  def __init__(self, name):
+    self._name = name
+
+  def __getattr__(self, attribute):
+    # Only called for what isn't found on the instance, so once
+    # the module is kept as `_module` this is a plain lookup
+    if attribute == '_module':
+      self._module = importlib.import_module(self._name)
+      return self._module
+    return getattr(self._module, attribute)
+
+hashids = LazyModule('hashids')
+nx = LazyModule('networkx')
+yaml = LazyModule('yaml')
+multiprocessing = LazyModule('multiprocessing')
 
 """
 Family is kept as a "directed multigraph" with Persons as
@@ -31,27 +55,78 @@ class PersonExistsError(Exception):
   pass
 
 
+class Gender(str):
+  """
+  "male" or "female".  There's only one of each, MALE and FEMALE,
+  so genders can be compared with `is`; they're still equal to the
+  plain strings.
+  """
+  __slots__ = ()
+
+  def __reduce__(self):
+    return (to_gender, (str(self),))
+
+MALE = Gender("male")
+FEMALE = Gender("female")
+GENDERS = {"male": MALE, "female": FEMALE}
+# The gender of a father and of a mother
+PARENT_GENDERS = {"father": MALE, "mother": FEMALE}
+
+def to_gender(value):
+  """MALE or FEMALE for "male" or "female", else `value` as it is"""
+  if isinstance(value, basestring):
+    return GENDERS.get(value, value)
+  return value
+
+
 class Person(object):
   """
   Persons are uniquely identified by their name string.
+
+  They're small values: compared and hashed by name alone, with
+  the name's hash worked out once.  Nothing about them can be
+  changed, since the name is what the Person is filed under and
+  a family remembers what it worked out from the rest, so
+  Family.change_name and Family.change_gender make a new Person
+  instead.
+
+  `born` and `died` are dates as given in the .yaml file (a year,
+  a date, or text such as "c. 1850"), or None if not known.  They
+  can't be changed either; see timeline.py for using them.
   """
-  def __init__(self, name, gender):
-    self.name = name
-    self.gender = gender
+  __slots__ = ('name', 'gender', 'born', 'died', '_hash')
+
+  def __init__(self, name, gender, born=None, died=None):
+    if type(name) is str:
+      name = intern(name)
+    object.__setattr__(self, 'name', name)
+    object.__setattr__(self, '_hash', hash(name))
+    object.__setattr__(self, 'gender', to_gender(gender))
+    object.__setattr__(self, 'born', born)
+    object.__setattr__(self, 'died', died)
+
+  def __setattr__(self, attribute, value):
+    raise AttributeError(
+        "A Person's {} can't be changed".format(attribute))
+
+  def __reduce__(self):
+    return (Person, (self.name, self.gender, self.born, self.died))
+
+  def __hash__(self):
+    return self._hash
 
   # Only care about the name
   def __eq__(self, other):
+    if self is other:
+      return True
     # If `other` doesn't even have a name, then no chance.
-    if not hasattr(other, 'name'):
+    try:
+      return self.name == other.name
+    except AttributeError:
       return False
-    return self.name == other.name
 
   def __ne__(self, other):
-    # If `other` doesn't even have a name, they're guaranteed
-    # do be different.
-    if not hasattr(other, 'name'):
-      return True
-    return (self.name != other.name)
+    return not self == other
 
   def __lt__(self, other):
     return self.name < other.name
@@ -60,10 +135,10 @@ class Person(object):
     return self.name > other.name
 
   def __le__(self, other):
-    return self.name >= other.name
+    return self.name <= other.name
 
   def __ge__(self, other):
-    return self.name <= other.name
+    return self.name >= other.name
 
   def __str__(self):
     return self.name
@@ -84,6 +159,296 @@ def first_name(name):
   return name.split(' ')[0]
 
 
+def search_tokens(text):
+  """Lowercased words of `text`, as used by SearchIndex"""
+  return re.findall(r'\w+', text.lower(), re.UNICODE)
+
+
+class SearchIndex(object):
+  """
+  Finds people by prefixes of the words in their names and by
+  words in their notes.
+
+  Name words are kept in one sorted list of `(word, name)` pairs,
+  so all the words starting with a prefix are a single run found
+  by bisection.  Note words are kept in an inverted index from
+  each word to how often it appears in each person's notes.
+  """
+  def __init__(self, persons=(), notes=None):
+    self.persons = {}
+    self.name_tokens = []
+    self.note_tokens = {}
+    self.note_tokens_by_name = {}
+
+    # One sort rather than an insertion per word
+    for person in persons:
+      self.persons[person.name] = person
+      for token in set(search_tokens(person.name)):
+        self.name_tokens.append((token, person.name))
+    self.name_tokens.sort()
+    if notes is not None:
+      for person in notes:
+        for note in notes[person]:
+          self.add_note(person, note)
+
+  def add_person(self, person):
+    if person.name in self.persons:
+      return
+    self.persons[person.name] = person
+    for token in set(search_tokens(person.name)):
+      bisect.insort(self.name_tokens, (token, person.name))
+
+  def change_name(self, old_name, renamed):
+    """File the person called `old_name` as the Person `renamed`"""
+    new_name = renamed.name
+    if self.persons.pop(old_name, None) is None:
+      return
+    for token in set(search_tokens(old_name)):
+      i = bisect.bisect_left(self.name_tokens, (token, old_name))
+      if self.name_tokens[i:i + 1] == [(token, old_name)]:
+        del self.name_tokens[i]
+    self.add_person(renamed)
+    counts = self.note_tokens_by_name.pop(old_name, {})
+    for token, count in counts.items():
+      del self.note_tokens[token][old_name]
+      self.note_tokens[token][new_name] = count
+    if counts:
+      self.note_tokens_by_name[new_name] = counts
+
+  def add_note(self, person, note):
+    counts = self.note_tokens_by_name.setdefault(person.name, {})
+    for token in search_tokens(note):
+      counts[token] = counts.get(token, 0) + 1
+      by_name = self.note_tokens.setdefault(token, {})
+      by_name[person.name] = by_name.get(person.name, 0) + 1
+
+  def delete_note(self, person, note):
+    counts = self.note_tokens_by_name.get(person.name, {})
+    for token in search_tokens(note):
+      if counts.get(token):
+        counts[token] -= 1
+        self.note_tokens[token][person.name] -= 1
+        if not counts[token]:
+          del counts[token]
+          del self.note_tokens[token][person.name]
+          if not self.note_tokens[token]:
+            del self.note_tokens[token]
+
+  def names_with_prefix(self, prefix):
+    i = bisect.bisect_left(self.name_tokens, (prefix,))
+    while i < len(self.name_tokens) and \
+        self.name_tokens[i][0].startswith(prefix):
+      yield self.name_tokens[i][1]
+      i += 1
+
+  def search(self, query, k=10):
+    """
+    The `k` best matches for `query`.  Every word of the query has
+    to start a word of the person's name or be a word of their
+    notes.  Name matches count for more than note matches, and a
+    name starting with the whole query for more still.
+    """
+    tokens = search_tokens(query)
+    if not tokens:
+      return []
+    scores = {}
+    candidates = None
+    for token in tokens:
+      by_name = set(self.names_with_prefix(token))
+      by_note = self.note_tokens.get(token, {})
+      if candidates is None:
+        candidates = by_name | set(by_note)
+      else:
+        candidates &= by_name | set(by_note)
+      for name in by_name:
+        scores[name] = scores.get(name, 0) + 3
+      for name, count in by_note.items():
+        scores[name] = scores.get(name, 0) + min(count, 2)
+    query = query.strip().lower()
+    for name in candidates:
+      if name.lower().startswith(query):
+        scores[name] += 10 if name.lower() == query else 5
+    best = heapq.nsmallest(k, candidates,
+        key=lambda name: (-scores[name], name))
+    return [self.persons[name] for name in best]
+
+
+class NoteStore(dict):
+  """
+  The notes of a Family, keyed by Person.
+
+  Notes read from a .yaml file are kept as the unparsed text of
+  the notes document.  Asking whether someone has notes only
+  needs an index of where each person's entry starts, found by
+  scanning lines, and asking for one person's notes parses only
+  their entry.  The whole document is parsed the first time the
+  notes are iterated over or changed; until then `raw_text()`
+  lets them be written back out untouched.
+
+  `changes` counts the entries set or removed, so a Family can
+  tell its notes were changed behind its back.
+  """
+  def __init__(self, text=None, persons_dict=None):
+    dict.__init__(self)
+    self.changes = 0
+    self._text = text
+    self._persons_dict = persons_dict or {}
+    self._offsets = None
+    self._lines = None
+    self._indent = None
+
+  def attach(self, persons_dict):
+    """Tell the store which Person each name in the text means"""
+    self._persons_dict = persons_dict
+
+  def loaded(self):
+    return self._text is None
+
+  def raw_text(self):
+    """The notes document, if it hasn't been parsed and changed"""
+    return self._text
+
+  def load(self):
+    """Parse every note, after which this is an ordinary dict"""
+    if self.loaded():
+      return
+    notes = yaml.safe_load(self._text)['notes'] or {}
+    self._text = None
+    self._offsets = None
+    self._lines = None
+    dict.clear(self)
+    for name in notes:
+      if name in self._persons_dict:
+        dict.__setitem__(self, self._persons_dict[name], notes[name])
+      else:
+        logging.warn("Note\n\n{}\n\nprovided for {}, but they're not"
+            " listed in the people section.".format(notes[name], name))
+
+  def _index(self):
+    """
+    Map each name in the notes document to the (start, end) lines
+    of its entry, or return None if the layout is anything but a
+    block mapping of names.
+    """
+    if self._offsets is not None:
+      return self._offsets
+    lines = self._text.splitlines(True)
+    content = [i for i, line in enumerate(lines)
+        if line.strip() and not line.lstrip().startswith('#')]
+    if not content or lines[content[0]].rstrip() != 'notes:':
+      return None
+    indents = dict((i, len(lines[i]) - len(lines[i].lstrip()))
+        for i in content[1:])
+    indent = indents[content[1]] if len(content) > 1 else 1
+    if indent == 0 or min(indents.values() + [indent]) < indent:
+      return None
+
+    # Entries start at lines as indented as the first one, except
+    # for list items, which may line up with the keys
+    keys = [i for i in content[1:] if indents[i] == indent and
+        not lines[i].lstrip().startswith('-')]
+    offsets = {}
+    for number, i in enumerate(keys):
+      try:
+        key = yaml.safe_load(lines[i])
+      except yaml.YAMLError:
+        return None
+      if not isinstance(key, dict) or len(key) != 1:
+        return None
+      end = keys[number + 1] if number + 1 < len(keys) else len(lines)
+      offsets[list(key)[0]] = (i, end)
+    self._lines = lines
+    self._indent = indent
+    self._offsets = offsets
+    return self._offsets
+
+  def _known(self, person):
+    # Persons are equal by name, as they are as dict keys
+    return getattr(person, 'name', None) in self._persons_dict
+
+  def __contains__(self, person):
+    if self.loaded() or dict.__contains__(self, person):
+      return dict.__contains__(self, person)
+    offsets = self._index()
+    if offsets is None:
+      self.load()
+      return dict.__contains__(self, person)
+    return self._known(person) and person.name in offsets
+
+  def __getitem__(self, person):
+    if self.loaded() or dict.__contains__(self, person):
+      return dict.__getitem__(self, person)
+    if person not in self:
+      raise KeyError(person)
+    if self.loaded():
+      return dict.__getitem__(self, person)
+    start, end = self._offsets[person.name]
+    entry = "".join(line[self._indent:]
+        for line in self._lines[start:end])
+    notes = list(yaml.safe_load(entry).values())[0] or []
+    dict.__setitem__(self, person, notes)
+    return notes
+
+  def get(self, person, default=None):
+    if person in self:
+      return self[person]
+    return default
+
+  def copy(self):
+    """
+    A copy, still unparsed if this is, whose lists of notes can be
+    changed without affecting this one's.
+    """
+    copy = NoteStore(self._text, self._persons_dict)
+    copy.changes = self.changes
+    for person, notes in dict.items(self):
+      dict.__setitem__(copy, person, list(notes))
+    return copy
+
+  def __eq__(self, other):
+    self.load()
+    if isinstance(other, NoteStore):
+      other.load()
+    return dict.__eq__(self, other)
+
+  def __ne__(self, other):
+    return not (self == other)
+
+  def __repr__(self):
+    self.load()
+    return dict.__repr__(self)
+
+
+def memoized(method):
+  """
+  Make a Family method with hashable arguments remember what it
+  returned for each version of the family; see Family.memoize.
+  """
+  def method_memoized(self, *args):
+    return self.memoize((method.__name__,) + args,
+        lambda: method(self, *args))
+  method_memoized.__name__ = method.__name__
+  method_memoized.__doc__ = method.__doc__
+  return method_memoized
+
+
+def _loading(method_name, changing=False):
+  def method(self, *args, **kwargs):
+    self.load()
+    if changing:
+      self.changes += 1
+    return getattr(dict, method_name)(self, *args, **kwargs)
+  method.__name__ = method_name
+  return method
+
+for _method_name in ['__iter__', '__len__', 'keys', 'values', 'items',
+    'iterkeys', 'itervalues', 'iteritems', 'has_key']:
+  setattr(NoteStore, _method_name, _loading(_method_name))
+for _method_name in ['__setitem__', '__delitem__', 'setdefault', 'pop',
+    'popitem', 'update', 'clear']:
+  setattr(NoteStore, _method_name, _loading(_method_name, changing=True))
+
+
 class Family(object):
   """
   Family is kept as a "directed multigraph" with Persons as
@@ -95,6 +460,7 @@ class Family(object):
   unique .name property and connections between them.
   """
   def __init__(self, persons=None):
+    from pedigree.attributes import AttributeStore
     # Full directed multipgraph of Persons with spouse, father,
     # and spouse as all the relation_type's.
     self.graph = nx.MultiDiGraph()
@@ -103,11 +469,90 @@ class Family(object):
     else:
       self.graph.add_nodes_from(persons)
 
+    # Places, occupations, tags and so on, a column to each; see
+    # attributes.py
+    self.attributes = AttributeStore(persons or [])
+
     # Interesting data about individuals is kept in the
     # `notes` dict, keyed by Persons.  May add pairs
     # of Persons as a key so that notes can be made on
     # edges.
-    self.notes = {}
+    self.notes = NoteStore()
+
+    # Built by the first `search` and kept up to date after that
+    self._search_index = None
+
+    # Goes up with every change, so what's worked out from the
+    # family can be kept until then; see `memoize`
+    self.version = 0
+    self._memo = {}
+
+    # Set once a snapshot shares our graph, notes, attributes or
+    # memo; see `snapshot`
+    self._graph_shared = False
+    self._notes_shared = False
+    self._attributes_shared = False
+    self._memo_shared = False
+
+  def snapshot(self):
+    """
+    Return a copy of the family as it is now, to be read (say, by
+    another thread) while this one carries on changing.
+
+    Nothing is copied up front: the snapshot shares our graph,
+    notes and attributes (and Persons, which never change), and we
+    copy them the next time we change them.  It shares what's been
+    memoized too, until one of us changes.
+    """
+    snapshot = Family()
+    snapshot.graph = self.graph
+    snapshot.notes = self.notes
+    snapshot.attributes = self.attributes
+    snapshot.version = self.version
+    snapshot._memo = self._memo
+    self._graph_shared = True
+    self._notes_shared = True
+    self._attributes_shared = True
+    self._memo_shared = snapshot._memo_shared = True
+    return snapshot
+
+  def _unshare_graph(self):
+    if self._graph_shared:
+      self.graph = self.graph.copy()
+      self._graph_shared = False
+
+  def _unshare_notes(self):
+    if self._notes_shared:
+      self.notes = self.notes.copy()
+      self._notes_shared = False
+
+  def _unshare_attributes(self):
+    if self._attributes_shared:
+      self.attributes = self.attributes.copy()
+      self._attributes_shared = False
+
+  def _changed(self):
+    """Call after every change, so nothing stale is memoized"""
+    self.version += 1
+    if self._memo_shared:
+      self._memo = {}
+      self._memo_shared = False
+
+  def memoize(self, key, compute):
+    """
+    What `compute()` returns, worked out once for each version of
+    the family and kept under `key` until it next changes.  What's
+    returned is shared by every caller, so mustn't be changed.
+    """
+    # Notes can be set straight into `notes`, which doesn't call
+    # _changed, so count those changes too
+    version = (self.version, getattr(self.notes, 'changes', 0))
+    cached = self._memo.get(key)
+    if cached is not None and cached[0] == version:
+      return cached[1]
+    value = compute()
+    self._memo[key] = (version, value)
+    return value
 
   def __eq__(self, other):
     # Two families are the same if they have the same lists of
@@ -147,14 +592,93 @@ class Family(object):
     return not (self == other)
 
   def add_person(self, person):
+    self._unshare_graph()
     self.graph.add_node(person)
+    self._indexed(person)
+
+  def _indexed(self, *persons):
+    self._changed()
+    if self._attributes_shared:
+      self._unshare_attributes()
+    for person in persons:
+      self.attributes.add_person(person)
+    if self._search_index is not None:
+      for person in persons:
+        self._search_index.add_person(person)
 
   def persons(self):
     return self.graph.nodes()
 
+  def number_of_persons(self):
+    return self.graph.number_of_nodes()
+
+  def search(self, query, k=10):
+    """
+    The `k` people best matching `query` by name prefix or by
+    words in their notes, best first.  See SearchIndex.
+    """
+    if self._search_index is None:
+      self._search_index = SearchIndex(self.persons(), self.notes)
+    return self._search_index.search(query, k)
+
+  def set_attribute(self, person, attribute, value):
+    """
+    Set `person`'s `attribute` (a place, occupation, list of tags
+    or whatever) to `value`, or clear it if None.
+    """
+    self._unshare_attributes()
+    self.attributes.set(person, attribute, value)
+    self._changed()
+
+  def attribute(self, person, attribute, default=None):
+    return self.attributes.get(person, attribute, default)
+
+  def attributes_of(self, person):
+    """`{attribute: value}` for each attribute `person` has"""
+    return self.attributes.attributes_of(person)
+
+  def select(self, expression):
+    """
+    The people a filter such as `birth_year < 1900 and place ==
+    "Bedrock"` holds for; see attributes.Filter.
+    """
+    return self.attributes.select(expression)
+
+  @memoized
+  def lifespans(self):
+    """
+    A timeline.Lifespans of everyone with dates, for asking who
+    was alive when.
+    """
+    from pedigree import timeline
+    return timeline.Lifespans(self.persons())
+
+  def alive_in(self, year):
+    """Everyone who was alive in `year`, as far as their dates say"""
+    return self.lifespans().alive_in(year)
+
+  def alive_between(self, start, end):
+    """Everyone alive at some time from year `start` to `end`"""
+    return self.lifespans().alive_between(start, end)
+
+  def couples_overlapping(self):
+    """
+    `(person, other, (start, end))` for each couple who were
+    alive at the same time, and the years they both were.
+    """
+    return list(self.lifespans().couples_overlapping(self.couples()))
+
   def names(self):
     return [person.name for person in self.persons()]
 
+  def label(self, person):
+    """What charts call `person`"""
+    return person.name
+
+  def uid(self, person):
+    """An id for `person` in charts, made only of letters and digits"""
+    return name_to_uid(person.name)
+
   def name_to_person(self, name):
     for person in self.persons():
       if person.name == name:
@@ -162,26 +686,83 @@ class Family(object):
     return None
 
   def change_name(self, person, new_name):
-    person.name = new_name
+    """
+    Give `person` a new name, returning the renamed Person.
+    ValueError if someone else already has it.
+    """
+    if new_name != person.name and self.name_to_person(new_name):
+      raise ValueError("{} is already in the family".format(new_name))
+    renamed = Person(name=new_name, gender=person.gender,
+        born=person.born, died=person.died)
+    self._unshare_graph()
+    nx.relabel_nodes(self.graph, {person: renamed}, copy=False)
+    # Unparsed notes are still filed under the old name
+    if person in self.notes:
+      self._unshare_notes()
+      self.notes.load()
+      self.notes[renamed] = self.notes.pop(person)
+    if self._search_index is not None:
+      self._search_index.change_name(person.name, renamed)
+    self._unshare_attributes()
+    self.attributes.change_name(person.name, renamed)
+    self._changed()
+    return renamed
+
+  def change_gender(self, person, gender):
+    """Give `person` a new gender, returning the changed Person"""
+    changed = Person(name=person.name, gender=gender,
+        born=person.born, died=person.died)
+    self._unshare_graph()
+    # Persons with the same name are equal, so relabel_nodes would
+    # keep the old one; put the new one in edge by edge instead
+    edges = self.graph.out_edges(person, data=True) + [
+        (parent, child, data) for parent, child, data
+        in self.graph.in_edges(person, data=True) if parent != person]
+    self.graph.remove_node(person)
+    self.graph.add_node(changed)
+    for parent, child, data in edges:
+      self.graph.add_edge(changed if parent == person else parent,
+          changed if child == person else child, **data)
+    if person in self.notes:
+      self._unshare_notes()
+      self.notes.load()
+      self.notes[changed] = self.notes.pop(person)
+    if self._search_index is not None:
+      self._search_index.change_name(person.name, changed)
+    self._unshare_attributes()
+    self.attributes.change_name(person.name, changed)
+    self._changed()
+    return changed
 
   def add_note(self, person, new_note):
+    self._unshare_notes()
+    self.notes.load()
     if person not in self.notes:
       self.notes[person] = [new_note]
     else:
       self.notes[person].append(new_note)
+    if self._search_index is not None:
+      self._search_index.add_note(person, new_note)
+    self._changed()
 
   def delete_note(self, person, to_be_deleted):
+    self._unshare_notes()
+    self.notes.load()
     if person in self.notes:
       if to_be_deleted in self.notes[person]:
         self.notes[person].remove(to_be_deleted)
+        if self._search_index is not None:
+          self._search_index.delete_note(person, to_be_deleted)
+        self._changed()
 
   def add_child(self, parent, child):
+    self._unshare_graph()
     # Does nothing if `parent` already present
     self.graph.add_node(parent)
     relation_type = None
-    if parent.gender == "male":
+    if parent.gender is MALE:
       relation_type = "father"
-    elif parent.gender == "female":
+    elif parent.gender is FEMALE:
       relation_type = "mother"
     else:
       raise GenderError("Without a gender on {}, can't tell"
@@ -190,39 +771,44 @@ class Family(object):
 
     self.graph.add_edge(parent, child,
         relation_type=relation_type)
+    self._indexed(parent, child)
 
   def add_children(self, parent, children):
     for child in children:
       self.add_child(parent, child)
 
   def add_spouse(self, person, spouse):
+    self._unshare_graph()
     # Does nothing if `parent` already present
     self.graph.add_node(person)
     self.graph.add_edge(person, spouse, relation_type="spouse")
+    self._indexed(person, spouse)
 
   def add_spouses(self, person, spouses):
     for spouse in spouses:
       self.add_spouse(person, spouse)
 
   def add_full_sibling(self, person, sibling):
-    if person not in self.persons():
+    if not self.graph.has_node(person):
       raise PersonExistsError(
           "{} isn't in the family yet.".format(person))
+    self._unshare_graph()
     # Does nothing if `sibling` already present
     self.graph.add_node(sibling)
+    self._indexed(sibling)
 
     # Add either parent if they don't exist
-    if not self.father(person):
-      self.add_father(person,
-          Person(name=self.new_anonymous_name(), gender="male"))
-    if not self.mother(person):
-      self.add_mother(person,
-          Person(name=self.new_anonymous_name(), gender="female"))
+    father, mother = self.father(person), self.mother(person)
+    if not father:
+      father = Person(name=self.new_anonymous_name(), gender=MALE)
+      self.add_father(person, father)
+    if not mother:
+      mother = Person(name=self.new_anonymous_name(), gender=FEMALE)
+      self.add_mother(person, mother)
 
-    self.graph.add_edge(self.father(person), sibling,
-        relation_type="father")
-    self.graph.add_edge(self.mother(person), sibling,
-        relation_type="mother")
+    self.graph.add_edge(father, sibling, relation_type="father")
+    self.graph.add_edge(mother, sibling, relation_type="mother")
+    self._changed()
 
 
   def new_anonymous_name(self):
@@ -257,7 +843,7 @@ class Family(object):
           "{0} can't mother herself".format(child))
 
     # Error on non-female mother
-    if mother.gender != "female":
+    if mother.gender is not FEMALE:
       raise GenderError("{0} isn't female, so can't " \
           "be a mother.".format(mother))
 
@@ -289,7 +875,7 @@ class Family(object):
           "{0} can't father himself".format(child))
 
     # Error on non-male father
-    if father.gender != "male":
+    if father.gender is not MALE:
       raise GenderError("{0} isn't male, so can't " \
           "be a father.".format(father))
 
@@ -308,31 +894,40 @@ class Family(object):
       self.add_child(father, child)
 
 
+  def _related(self, adjacency, person, relation_types):
+    """
+    Those an edge of one of `relation_types` joins to `person` in
+    `adjacency` (the graph's succ or pred), once for each edge.
+    Only looks at `person`'s own edges.
+    """
+    return [
+      other
+      for other, edges in adjacency.get(person, {}).iteritems()
+      for data in edges.itervalues()
+      if data['relation_type'] in relation_types
+    ]
+
   def children(self, parent):
-    if parent not in self.persons():
+    if not self.graph.has_node(parent):
       raise PersonExistsError(
           "{} isn't in the family yet.".format(parent))
+    return self._related(self.graph.succ, parent, ("father", "mother"))
 
-    return [
-      edge[1]
-      for edge in self.graph.edges(data=True)
-      if (edge[2]['relation_type'] == "father" or \
-          edge[2]['relation_type'] == "mother") and \
-         edge[0] == parent
-    ]
-
+  @memoized
   def fathers(self):
     return set([
         edge[0]
         for edge in self.graph.edges(data=True)
         if edge[2]['relation_type'] == "father"
     ])
+  @memoized
   def mothers(self):
     return set([
         edge[0]
         for edge in self.graph.edges(data=True)
         if edge[2]['relation_type'] == "mother"
     ])
+  @memoized
   def spouses(self):
     return set([
         edge[0]
@@ -340,6 +935,7 @@ class Family(object):
         if edge[2]['relation_type'] == "spouse"
     ])
 
+  @memoized
   def couples(self):
     """
     Return pairs `sorted([one, two])` for any pairs of people
@@ -360,74 +956,90 @@ class Family(object):
     return to_return
 
   def father(self, person):
-    for edge in self.graph.edges(data=True):
-      if edge[2]['relation_type'] == "father" and \
-          edge[1] == person:
-        return edge[0]
-    return None
+    fathers = self._related(self.graph.pred, person, ("father",))
+    return fathers[0] if fathers else None
   def mother(self, person):
-    for edge in self.graph.edges(data=True):
-      if edge[2]['relation_type'] == "mother" and \
-          edge[1] == person:
-        return edge[0]
-    return None
+    mothers = self._related(self.graph.pred, person, ("mother",))
+    return mothers[0] if mothers else None
   def all_spouses(self, person):
-    cur_spouses = []
-    for edge in self.graph.edges(data=True):
-      if edge[2]['relation_type'] == "spouse" and \
-        edge[0] == person:
-          cur_spouses.append(edge[1])
-    return cur_spouses
+    return self._related(self.graph.succ, person, ("spouse",))
+
+  def partners(self, person):
+    """
+    Everyone `person` is a spouse of or who is a spouse of them,
+    as spouses may be listed under either one
+    """
+    return _unique(self.all_spouses(person) +
+        self._related(self.graph.pred, person, ("spouse",)))
+
+  def full_siblings(self, person):
+    """Others with the same father and mother as `person`, both known"""
+    father, mother = self.father(person), self.mother(person)
+    if father is None or mother is None:
+      return []
+    mothers_children = set(self.children(mother))
+    return [child for child in _unique(self.children(father))
+        if child != person and child in mothers_children]
+
+  def half_siblings(self, person, side=None):
+    """
+    Others with one parent in common with `person` but not both
+    (or not both known): their father's other children if `side`
+    is "paternal", their mother's if "maternal", and both if None.
+    """
+    sides = {"paternal": (self.father, self.mother),
+        "maternal": (self.mother, self.father)}
+    if side is not None and side not in sides:
+      raise ValueError("side should be paternal or maternal, not"
+          " {}".format(side))
+    found = []
+    for side in [side] if side else ["paternal", "maternal"]:
+      shared, other = sides[side]
+      parent = shared(person)
+      if parent is None:
+        continue
+      other_parent = other(person)
+      for child in self.children(parent):
+        if child != person and child not in found and \
+            (other_parent is None or other(child) != other_parent):
+          found.append(child)
+    return found
+
+  def siblings(self, person):
+    """Full siblings of `person`, then half siblings"""
+    return self.full_siblings(person) + self.half_siblings(person)
+
+  def step_siblings(self, person):
+    """
+    Children of a spouse of one of `person`'s parents who have
+    neither of `person`'s parents
+    """
+    parents = [parent for parent in
+        [self.father(person), self.mother(person)] if parent is not None]
+    found = []
+    for parent in parents:
+      for partner in self.partners(parent):
+        if partner in parents:
+          continue
+        for child in self.children(partner):
+          if child != person and child not in found and \
+              self.father(child) not in parents and \
+              self.mother(child) not in parents:
+            found.append(child)
+    return found
+
+  def relations(self):
+    """Yield `(relator, person, relation_type)` for every edge"""
+    # Straight from the adjacency dicts, which is several times
+    # quicker than networkx's edge iterators
+    for relator, neighbours in self.graph.adj.iteritems():
+      for person, edges in neighbours.iteritems():
+        for data in edges.itervalues():
+          yield relator, person, data['relation_type']
   def persons(self):
     return self.graph.nodes()
 
-  def gui_choose_person(self, message, title, persons=None):
-    if persons == None:
-      persons = self.persons()
-    chosen = easygui.choicebox(message, title,
-      [person.name for person in persons]
-    )
-    return self.name_to_person(chosen)
-
-  def gui_choose_note(self, person, title):
-    if person not in self.notes:
-      return None
-
-    chosen = easygui.choicebox("Which note?", title,
-      ["- " + note for note in self.notes[person]]
-    )
-    return chosen[2: ]
-
-  def gui_display_notes(self, person):
-    easygui.textbox(
-      person.name,
-      "",
-      "\n".join(["- " + note for note in self.notes[person]])
-    )
-
-  def gui_choose_person_or_add(self, message, title, gender=None):
-    chosen = easygui.choicebox(message, title,
-        [person.name for person in self.persons()] + \
-        ["**** Add a new person ****"]
-      )
-    if not chosen:
-      return None
-    if chosen == "**** Add a new person ****":
-      new_name = easygui.enterbox(
-        "Enter the new person's name", title)
-      if not new_name:
-        return None
-      if not gender:
-        given = easygui.choicebox("Gender", title,
-          ["Male", "Female"]
-        )
-        gender = given.lower()
-      new_person = Person(new_name, gender)
-      self.add_person(new_person)
-      return new_person
-    else:
-      return self.name_to_person(chosen)
-
+  @memoized
   def people_with_notes(self):
     return [
         person
@@ -444,35 +1056,199 @@ class Family(object):
     return (self.name_to_person(first_name),
         self.name_to_person(second_name))
 
-  def gui_choose_couple_or_add(self, message, title):
-    chosen = easygui.choicebox(message, title,
-        ["{} and {}".format(couple[0].name, couple[1].name)
-          for couple in self.couples()] + \
-        ["**** Add a new couple ****"]
-      )
-    if not chosen:
-      return None
-    if chosen == "**** Add a new couple ****":
-      person_1 = self.gui_choose_person_or_add("First member of the couple:", title)
-      person_2 = self.gui_choose_person_or_add("Second member of the couple:", title)
-      if person_1 and person_2:
-        return (person_1, person_2)
-      return None
-    else:
-      return self.string_to_couple(chosen)
+  @memoized
+  def generations(self):
+    """
+    Map each name to a generation number, 0 for the earliest,
+    so that children come after their parents and couples (spouses,
+    or the father and mother of a child, married or not) share a
+    generation.
+
+    A couple across generations are both put in the later one.
+    Where that can't be done without putting someone above their
+    own parent (say, someone marrying their grandchild), the couple
+    furthest apart by descent alone is left unaligned instead.
+    """
+    names = self.names()
+    parent_edges = []
+    spouse_pairs = set()
+    parents = {}
+    for relator, person, relation_type in self.relations():
+      if relation_type == "spouse":
+        spouse_pairs.add(tuple(sorted([relator.name, person.name])))
+      else:
+        parent_edges.append((relator.name, person.name))
+        parents.setdefault(person.name, []).append(relator.name)
+    for child_parents in parents.itervalues():
+      if len(child_parents) == 2:
+        spouse_pairs.add(tuple(sorted(child_parents)))
+
+    apart = _place_generations(names, parent_edges, [])[0]
+    while True:
+      generation, conflicts = _place_generations(names, parent_edges,
+          spouse_pairs)
+      crossing = [(abs(apart[one] - apart[two]), (one, two))
+          for one, two in spouse_pairs
+          if one in conflicts or two in conflicts]
+      if not crossing:
+        return generation
+      spouse_pairs.remove(max(crossing)[1])
+
+  def summary(self):
+    """
+    Health numbers for the family, worked out in one pass over its
+    relations:
+
+      - `persons`
+      - `missing_parents`: people without a known father or mother
+      - `no_parents`: people with neither
+      - `generations`: the most in any line of descent
+      - `widest_generation`: `(generation, people)` for the
+        generation, counted down lines of descent from 0, with the
+        most people in it
+      - `couples`: spouses and parents of a child together
+      - `children_per_couple`: children with both parents known,
+        over `couples`
+      - `remarriages`: couples after each person's first
+      - `components`: unrelated parts, as in `components()`
+    """
+    # Hundreds of thousands of small tuples and lists are made on
+    # the way, none of them in cycles, and a garbage collection of
+    # a big family partway through can cost as much as the rest
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+      return self._summary()
+    finally:
+      if collecting:
+        gc.enable()
+
+  def _summary(self):
+    # The pass itself only files each relation away; everything
+    # else is worked out from these afterwards, as far as possible
+    # with whole-dict and set operations
+    names = [person.name for person in self.persons()]
+    # `(person, relator)` name pairs
+    edges = {"father": [], "mother": [], "spouse": []}
+    for relator, person, relation_type in self.relations():
+      edges[relation_type].append((person.name, relator.name))
+    fathers = dict(edges["father"])
+    mothers = dict(edges["mother"])
+    children = {}
+    for child, parent in itertools.chain(edges["father"], edges["mother"]):
+      if parent in children:
+        children[parent].append(child)
+      else:
+        children[parent] = [child]
+
+    # Each couple once, first name first
+    with_both_parents = list(fathers.viewkeys() & mothers.viewkeys())
+    couples = set((one, other) if one < other else (other, one)
+        for one, other in itertools.chain(edges["spouse"],
+          zip(map(fathers.get, with_both_parents),
+            map(mothers.get, with_both_parents))))
+    in_couples = set(itertools.chain.from_iterable(couples))
+
+    # Down the lines of descent a generation at a time, from people
+    # without parents.  Someone is reached once all their parents
+    # have been, so a generation after the latest of them; anyone
+    # in a circle of parents is never reached.  Each person
+    # reached is joined to the part of the family of the parent
+    # they're reached from, in a union-find forest like
+    # components()'s, by pointing them straight at its root
+    group_of = dict(zip(names, names))
+    waiting = dict.fromkeys(fathers, 1)
+    waiting.update(dict.fromkeys(mothers, 1))
+    waiting.update(dict.fromkeys(with_both_parents, 2))
+    generation = [name for name in names if name not in waiting]
+    widths = []
+    while generation:
+      widths.append(len(generation))
+      next_generation = []
+      for name in generation:
+        for child in children.get(name, ()):
+          waiting[child] -= 1
+          if not waiting[child]:
+            group_of[child] = group_of[name]
+            next_generation.append(child)
+      generation = next_generation
+
+    # Then join couples, and the people never reached to their
+    # parents, counting the parts as they merge
+    components = len(names) - sum(widths[1:])
+    unreached = [(child, parent) for child, parent in
+        itertools.chain(fathers.iteritems(), mothers.iteritems())
+        if waiting[child]]
+    for one, other in itertools.chain(couples, unreached):
+      # _find, written out
+      while group_of[one] != one:
+        group_of[one] = one = group_of[group_of[one]]
+      while group_of[other] != other:
+        group_of[other] = other = group_of[group_of[other]]
+      if one != other:
+        group_of[one] = other
+        components -= 1
+
+    return {
+      'persons': len(names),
+      'missing_parents': len(names) - len(with_both_parents),
+      'no_parents': widths[0] if widths else 0,
+      'generations': len(widths),
+      'widest_generation': max(enumerate(widths),
+          key=lambda item: (item[1], -item[0]))
+          if widths else None,
+      'couples': len(couples),
+      'children_per_couple': float(len(with_both_parents)) / len(couples)
+          if couples else 0.0,
+      # Everyone in a couple has one, and a remarriage for each after
+      'remarriages': 2 * len(couples) - len(in_couples),
+      'components': components,
+    }
 
-  def gui_add_person(self, message, title, gender=None):
-    new_name = easygui.enterbox(message, title)
-    if not new_name:
-      return None
-    if not gender:
-      given = easygui.choicebox("Gender", title,
-        ["Male", "Female"]
-      )
-      gender = given.lower()
-    new_person = Person(new_name, gender)
-    self.add_person(new_person)
-    return new_person
+  def components(self, batch_size=1):
+    """
+    Split the family into its unrelated parts: one Family for each
+    set of people joined by parent or spouse edges, biggest first.
+    Parts of fewer than `batch_size` people are put together with
+    the next ones until there are enough of them.
+    """
+    persons = dict((person.name, person) for person in self.persons())
+    group_of = dict((name, name) for name in persons)
+    relations = list(self.relations())
+    for relator, person, relation_type in relations:
+      group_of[_find(group_of, relator.name)] = \
+          _find(group_of, person.name)
+
+    groups = {}
+    for name in persons:
+      groups.setdefault(_find(group_of, name), []).append(name)
+    batch_of = {}
+    batches = []
+    for group in sorted(groups.itervalues(),
+        key=lambda names: (-len(names), min(names))):
+      if not batches or len(batches[-1]) >= batch_size:
+        batches.append([])
+      batches[-1].extend(group)
+      for name in group:
+        batch_of[name] = len(batches) - 1
+
+    families = [Family() for batch in batches]
+    for name, person in persons.iteritems():
+      family = families[batch_of[name]]
+      family.graph.add_node(person)
+      if person in self.notes:
+        family.notes[person] = self.notes[person]
+    for relator, person, relation_type in relations:
+      families[batch_of[relator.name]].graph.add_edge(
+          persons[relator.name], persons[person.name],
+          relation_type=relation_type)
+    return families
+
+def _unique(items):
+  """`items` without repeats, in order"""
+  seen = set()
+  return [item for item in items
+      if not (item in seen or seen.add(item))]
 
 
 def name_to_uid(name):
@@ -481,6 +1257,81 @@ def name_to_uid(name):
   return hashids_instance.encode(int(''.join([str(ord(x)) for x in name])))
 
 
+def _find(parent_of, name):
+  """The name standing for `name`'s whole set in a union-find forest"""
+  while parent_of[name] != name:
+    parent_of[name] = parent_of[parent_of[name]]
+    name = parent_of[name]
+  return name
+
+def _place_generations(names, parent_edges, spouse_pairs):
+  """
+  Number the generations of `names` for `Family.generations()`.
+
+  Spouses are bundled together and the bundles put in order in
+  one topological pass (Kahn's algorithm), each going one after
+  the latest of its parents.  People whose parents aren't known
+  are then moved down to just above their earliest child, so that
+  in-laws line up with their children rather than with the very
+  first generation.
+
+  Returns the numbering and the names caught in a circle of
+  parent edges, or in a bundle with their own parent.  Such a
+  circle is broken by placing the bundle with the fewest parents
+  left to place anyway.
+  """
+  bundle_of = dict((name, name) for name in names)
+  find = lambda name: _find(bundle_of, name)
+  for one, two in spouse_pairs:
+    bundle_of[find(one)] = find(two)
+
+  conflicts = set()
+  bundles = set(find(name) for name in names)
+  children = dict((bundle, set()) for bundle in bundles)
+  parents = dict((bundle, set()) for bundle in bundles)
+  for parent, child in parent_edges:
+    if find(parent) == find(child):
+      conflicts.update([parent, child])
+    else:
+      children[find(parent)].add(find(child))
+      parents[find(child)].add(find(parent))
+
+  generation = dict((bundle, 0) for bundle in bundles)
+  waiting = dict((bundle, len(parents[bundle])) for bundle in bundles)
+  ready = sorted(bundle for bundle in bundles if not waiting[bundle])
+  order = []
+  while len(order) < len(bundles):
+    if not ready:
+      # What's left is circles and whatever comes after them;
+      # strip off the latter to leave just the circles
+      circles = set(waiting)
+      leaves = [bundle for bundle in circles
+          if not children[bundle] & circles]
+      while leaves:
+        circles.difference_update(leaves)
+        leaves = [bundle for bundle in circles
+            if not children[bundle] & circles]
+      conflicts.update(name for name in names if find(name) in circles)
+      ready.append(min((waiting[bundle], bundle) for bundle in waiting)[1])
+    bundle = ready.pop()
+    del waiting[bundle]
+    order.append(bundle)
+    for child in children[bundle]:
+      if child in waiting:
+        generation[child] = max(generation[child], generation[bundle] + 1)
+        waiting[child] -= 1
+        if not waiting[child]:
+          ready.append(child)
+
+  for bundle in reversed(order):
+    if not parents[bundle] and children[bundle]:
+      generation[bundle] = min(generation[child]
+          for child in children[bundle]) - 1
+  first = min(generation.values()) if generation else 0
+
+  return dict((name, generation[find(name)] - first)
+      for name in names), conflicts
+
 def split_biglist(biglist):
   """
   Take `biglist` as would be returned from a .yaml file
@@ -539,27 +1390,136 @@ def split_biglist(biglist):
   return fathers, mothers, spouses
 
 
-def yaml_to_family(yaml_file):
-  family = Family()
+def split_notes_document(text):
+  """
+  Split the text of a .yaml file into everything before the notes
+  document and the notes document itself, without parsing either.
+  Returns `(text, None)` if the last document isn't the notes.
+  """
+  markers = list(re.finditer(r'^---[ \t]*$', text, re.M))
+  if not markers:
+    return text, None
+  notes_text = text[markers[-1].end():].lstrip('\r\n')
+  for line in notes_text.splitlines():
+    if line.strip() and not line.lstrip().startswith('#'):
+      if line.startswith('notes:'):
+        return text[:markers[-1].start()], notes_text
+      break
+  return text, None
+
+
+def yaml_to_sections(yaml_file, lazy_notes=False):
+  """
+  Parse the five documents of a .yaml file into the raw
+  sections
+
+      (people, fathers, mothers, spouses, notes)
 
+  `people` is a list of one-entry `{name: gender}` dicts and the
+  others are dicts keyed by name, exactly as they appear in the
+  file but with empty sections replaced by empty containers.
+
+  If `lazy_notes`, the notes document is left unparsed and
+  `notes` is a NoteStore holding its text.
+  """
+  notes_text = None
+  if lazy_notes:
+    if hasattr(yaml_file, 'read'):
+      yaml_file = yaml_file.read()
+    yaml_file, notes_text = split_notes_document(yaml_file)
   try:
-    people, fathers, mothers, spouses, notes = \
-        yaml.load_all(yaml_file)
+    documents = list(yaml.load_all(yaml_file))
   except yaml.constructor.ConstructorError, e:
     print("{} is not a well-formed YAML file.  Maybe some names have special" \
         " characters in them?".format(yaml_file.name))
+  if notes_text is not None:
+    people, fathers, mothers, spouses = documents
+    notes = NoteStore(notes_text)
+  else:
+    people, fathers, mothers, spouses, notes = documents
+    notes = notes['notes'] if notes['notes'] else {}
   people  = people['people'] if people['people'] else []
-  fathers = fathers['father'] if fathers['father'] else []
-  mothers = mothers['mother'] if mothers['mother'] else []
-  spouses = spouses['spouse'] if spouses['spouse'] else []
-  notes = notes['notes'] if notes['notes'] else {}
+  fathers = fathers['father'] if fathers['father'] else {}
+  mothers = mothers['mother'] if mothers['mother'] else {}
+  spouses = spouses['spouse'] if spouses['spouse'] else {}
+  return people, fathers, mothers, spouses, notes
+
+
+# Said of someone in the people section besides their gender
+DATE_FIELDS = ['born', 'died']
+
+def person_entry(person, attributes=None):
+  """
+  `person` as listed in the people section of a .yaml file: just
+
+      {name: gender}
+
+  unless they have dates or `attributes`, when it's
+
+      {name: {'gender': gender, 'born': 1850, 'place': 'Bedrock'}}
+  """
+  details = dict(attributes or {})
+  for field in DATE_FIELDS:
+    details[field] = getattr(person, field)
+  details['gender'] = person.gender
+  return details_entry(person.name, details)
+
+def details_entry(name, details):
+  """The people section entry for `name`, from `entry_details`"""
+  gender = details.get('gender')
+  if isinstance(gender, Gender):
+    gender = str(gender)
+  others = [(key, value) for key, value in details.iteritems()
+      if key != 'gender' and value is not None]
+  if not others:
+    return {name: gender}
+  return {name: dict([('gender', gender)] + others)}
+
+def entry_details(value):
+  """
+  The gender, dates and anything else said of someone in the
+  people section, as a dict with at least 'gender' and the dates
+  """
+  details = dict.fromkeys(DATE_FIELDS)
+  if isinstance(value, dict):
+    details.update(value)
+    details.setdefault('gender', None)
+  else:
+    details['gender'] = value
+  return details
+
+def entry_to_person(name, value):
+  """The Person listed as `{name: value}` in a people section"""
+  if isinstance(value, dict):
+    return Person(name, value.get('gender'), value.get('born'),
+        value.get('died'))
+  return Person(name, value)
+
+def entry_attributes(value):
+  """What a people section entry says besides gender and dates"""
+  if not isinstance(value, dict):
+    return {}
+  return dict((key, value) for key, value in value.iteritems()
+      if key != 'gender' and key not in DATE_FIELDS)
+
+
+def sections_to_family(people, fathers, mothers, spouses, notes):
+  """
+  Build a Family from raw sections as returned by
+  `yaml_to_sections`.  Every name mentioned in a relation must
+  appear in `people`.
+  """
+  family = Family()
 
   persons_dict = {}
   for person in people:
-    for name, gender in person.iteritems():
-      cur_person = Person(name=name, gender=gender)
+    for name, value in person.iteritems():
+      cur_person = entry_to_person(name, value)
       persons_dict[name] = cur_person
       family.add_person(cur_person)
+      for attribute, attribute_value in \
+          entry_attributes(value).iteritems():
+        family.set_attribute(cur_person, attribute, attribute_value)
 
   for father in fathers:
     father_person = persons_dict[father]
@@ -585,6 +1545,12 @@ def yaml_to_family(yaml_file):
     ]
     family.add_spouses(spouse_person, spouse_primes)
 
+  # Unparsed notes only need to know who's who
+  if isinstance(notes, NoteStore):
+    notes.attach(persons_dict)
+    family.notes = notes
+    return family
+
   for person_name in notes:
     if person_name in persons_dict:
 
@@ -597,11 +1563,294 @@ def yaml_to_family(yaml_file):
   return family
 
 
-def family_to_yaml(family):
-  people_part = [
-    {person.name: person.gender}
-    for person in family.persons()
+def yaml_to_family(yaml_file):
+  """
+  Read a Family from a .yaml file (or its text).  The notes are
+  only parsed when they're needed; see NoteStore.
+  """
+  return sections_to_family(*yaml_to_sections(yaml_file,
+      lazy_notes=True))
+
+
+def merge_sections(sections_list, aliases=None, conflicts=None):
+  """
+  Hash join several `(people, fathers, mothers, spouses, notes)`
+  tuples on name into a single such tuple.
+
+  A person listed in more than one shard is kept once; their
+  children, spouses and notes are the union of what each shard
+  says.  Names are not looked up here, so a shard may mention
+  people listed only in another shard.  `aliases` maps other
+  names people go by to the names to join them on.
+
+  Where shards disagree (on someone's gender, dates or other
+  details, or on who their father or mother is), a father isn't
+  listed as male or a mother as female, or a relation names
+  someone nobody lists,
+  a GenderError, GenealogicalError or PersonExistsError is raised,
+  unless `conflicts` is a list, in which case what's wrong is
+  added to it and the first shard to say something wins.
+  """
+  aliases = aliases or {}
+  def conflict(error, message):
+    if conflicts is None:
+      raise error(message)
+    conflicts.append(message)
+
+  genders = {}
+  details_of = {}
+  listed = []
+  fathers = {}
+  mothers = {}
+  spouses = {}
+  notes = {}
+  parent_of = {}
+  # Everyone's gender is known before any parents are checked for it
+  for shard_people, shard_fathers, shard_mothers, shard_spouses, \
+      shard_notes in sections_list:
+    for person in shard_people:
+      for name, value in person.iteritems():
+        name = aliases.get(name, name)
+        details = entry_details(value)
+        gender = details['gender']
+        if name not in genders:
+          genders[name] = gender
+          details_of[name] = details
+          listed.append(name)
+          continue
+        if genders[name] != gender:
+          conflict(GenderError, "{} is listed as both {} and {}.".format(
+              name, genders[name], gender))
+        # Details only one shard knows are kept
+        merged = details_of[name]
+        for field in sorted(details):
+          if field == 'gender' or details[field] is None or \
+              details[field] == merged.get(field):
+            continue
+          if merged.get(field) is None:
+            merged[field] = details[field]
+          else:
+            conflict(GenealogicalError, "{} is listed as {} both {}"
+                " and {}.".format(name, field, merged[field],
+                    details[field]))
+  for shard_people, shard_fathers, shard_mothers, shard_spouses, \
+      shard_notes in sections_list:
+    for merged, shard_part, relation_type in [
+        (fathers, shard_fathers, "father"),
+        (mothers, shard_mothers, "mother"),
+        (spouses, shard_spouses, None), (notes, shard_notes, None)]:
+      for name, values in shard_part.iteritems():
+        name = aliases.get(name, name)
+        existing = merged.setdefault(name, [])
+        for value in values:
+          if relation_type is not None:
+            value = aliases.get(value, value)
+            if name in genders and \
+                genders[name] != PARENT_GENDERS[relation_type]:
+              conflict(GenderError, "{}'s {} is given as {}, who is"
+                  " listed as {}.".format(value, relation_type, name,
+                      genders[name] or "neither male nor female"))
+              continue
+            parent = parent_of.setdefault((relation_type, value), name)
+            if parent != name:
+              conflict(GenealogicalError, "{}'s {} is given as both {}"
+                  " and {}.".format(value, relation_type, parent, name))
+              continue
+          elif merged is spouses:
+            value = aliases.get(value, value)
+          if value not in existing:
+            existing.append(value)
+
+  unlisted = set()
+  for merged in fathers, mothers, spouses:
+    for name in list(merged):
+      for other in [name] + merged[name]:
+        if other not in genders and other not in unlisted:
+          unlisted.add(other)
+          conflict(PersonExistsError, "{} isn't listed in the people"
+              " section.".format(other))
+      if name in unlisted:
+        del merged[name]
+      else:
+        merged[name] = [other for other in merged[name]
+            if other not in unlisted]
+  people = [details_entry(name, details_of[name]) for name in listed]
+  return people, fathers, mothers, spouses, notes
+
+
+# Parsed shards by path, with the (mtime, size) they were parsed
+# at.  Lets a long-running process re-read only changed shards.
+_shard_cache = {}
+
+def _shard_stamp(path):
+  stat = os.stat(path)
+  return (stat.st_mtime, stat.st_size)
+
+def _shard_cache_filename(cache_dir, path):
+  return os.path.join(cache_dir,
+      "{}.pickle".format(name_to_uid(os.path.abspath(path))))
+
+def _read_cached_shard(path, stamp, cache_dir):
+  if path in _shard_cache and _shard_cache[path][0] == stamp:
+    return _shard_cache[path][1]
+  if cache_dir is None:
+    return None
+  try:
+    with open(_shard_cache_filename(cache_dir, path), 'rb') as f:
+      cached_stamp, sections = pickle.load(f)
+  except (IOError, EOFError, pickle.UnpicklingError):
+    return None
+  if cached_stamp != stamp:
+    return None
+  _shard_cache[path] = (stamp, sections)
+  return sections
+
+def _write_cached_shard(path, stamp, sections, cache_dir):
+  _shard_cache[path] = (stamp, sections)
+  if cache_dir is None:
+    return
+  if not os.path.isdir(cache_dir):
+    os.makedirs(cache_dir)
+  with open(_shard_cache_filename(cache_dir, path), 'wb') as f:
+    pickle.dump((stamp, sections), f, pickle.HIGHEST_PROTOCOL)
+
+def _parse_shard(path):
+  """Worker: parse one shard file into raw sections"""
+  with open(path) as f:
+    return yaml_to_sections(f)
+
+
+def shards_to_family(paths, cache_dir=None, processes=None):
+  """
+  Load every .yaml file in `paths` and merge them into one
+  Family.
+
+  Shards that changed since they were last parsed (by this
+  process, or according to the pickles in `cache_dir`) are
+  parsed in parallel worker processes; the others come from the
+  cache.  References between shards are resolved only once all
+  of them are merged.
+  """
+  stamps = [_shard_stamp(path) for path in paths]
+  sections_list = [
+    _read_cached_shard(path, stamp, cache_dir)
+    for path, stamp in zip(paths, stamps)
+  ]
+  stale = [i for i, sections in enumerate(sections_list)
+      if sections is None]
+
+  if len(stale) > 1 and processes != 1:
+    pool = multiprocessing.Pool(processes)
+    try:
+      parsed = pool.map(_parse_shard, [paths[i] for i in stale])
+    finally:
+      pool.close()
+      pool.join()
+  else:
+    parsed = [_parse_shard(paths[i]) for i in stale]
+
+  for i, sections in zip(stale, parsed):
+    _write_cached_shard(paths[i], stamps[i], sections, cache_dir)
+    sections_list[i] = sections
+
+  return sections_to_family(*merge_sections(sections_list))
+
+
+def is_manifest(filename):
+  """
+  Whether `filename` is a shard manifest, i.e. a .yaml file whose
+  only key is `shards`, listing shard files relative to it.
+  """
+  if not os.path.isfile(filename):
+    return False
+  with open(filename) as f:
+    for line in f:
+      if line.strip() and not line.lstrip().startswith('#'):
+        return line.startswith('shards:')
+  return False
+
+
+def is_shard_set(filename):
+  return os.path.isdir(filename) or is_manifest(filename)
+
+
+def shard_paths(filename):
+  """
+  List the shard files making up the family at `filename`, which
+  is either a directory of .yaml files or a manifest.  A manifest
+  in the directory isn't a shard itself.
+  """
+  if os.path.isdir(filename):
+    paths = [
+      os.path.join(filename, name)
+      for name in os.listdir(filename)
+      if name.endswith('.yaml') or name.endswith('.yml')
+    ]
+    return sorted(path for path in paths if not is_manifest(path))
+  with open(filename) as f:
+    manifest = yaml.safe_load(f)
+  base_dir = os.path.dirname(filename)
+  return [
+    os.path.join(base_dir, shard)
+    for shard in manifest['shards'] or []
   ]
+
+
+def is_sqlite(filename):
+  return filename.endswith(('.sqlite', '.sqlite3', '.db'))
+
+
+def load_family(filename):
+  """
+  Load a Family from a single .yaml file, a directory of .yaml
+  shards, a shard manifest, or a SQLite database.
+  """
+  if is_sqlite(filename):
+    from pedigree import sqlite_family
+    return sqlite_family.SqliteFamily(filename)
+  if is_shard_set(filename):
+    if os.path.isdir(filename):
+      cache_dir = os.path.join(filename, '.pedigree_cache')
+    else:
+      cache_dir = os.path.join(os.path.dirname(filename),
+          '.pedigree_cache')
+    return shards_to_family(shard_paths(filename), cache_dir)
+  with open(filename) as f:
+    return yaml_to_family(f)
+
+
+def save_family(family, filename):
+  """
+  Write `family` back to where `load_family(filename)` got it.
+  """
+  if is_sqlite(filename):
+    family.commit()
+  else:
+    with open(filename, 'w') as yaml_file:
+      yaml_file.write(family_to_yaml(family))
+
+
+def convert_family(source_filename, destination_filename):
+  """
+  Copy a family between a .yaml file and a SQLite database,
+  whichever way round the filenames say.
+  """
+  from pedigree import sqlite_family
+  if is_sqlite(destination_filename):
+    with open(source_filename) as yaml_file:
+      sqlite_family.yaml_to_sqlite(yaml_file, destination_filename)
+  elif is_sqlite(source_filename):
+    with open(destination_filename, 'w') as yaml_file:
+      sqlite_family.sqlite_to_yaml(source_filename, yaml_file)
+  else:
+    raise ValueError("One of {} and {} should be a SQLite database"
+        " (.sqlite, .sqlite3 or .db)".format(source_filename,
+            destination_filename))
+
+
+def family_to_yaml(family):
+  people_part = [person_entry(person, family.attributes_of(person))
+      for person in family.persons()]
   fathers = family.fathers()
   mothers = family.mothers()
   spouses = family.spouses()
@@ -624,16 +1873,23 @@ def family_to_yaml(family):
     for sub_spouse in family.all_spouses(spouse):
       sub_spouses.append(sub_spouse.name)
     spouses_part[spouse.name] = sub_spouses
-  notes_part = {}
-  for person in notes:
-    notes_part[person.name] = notes[person]
-  return yaml.dump_all([
+  documents = [
     {'people': people_part},
     {'father': fathers_part},
     {'mother': mothers_part},
     {'spouse': spouses_part},
-    {'notes': notes_part},
-  ])
+  ]
+
+  # Notes nobody has touched are copied out as they were read
+  raw_notes = notes.raw_text() if isinstance(notes, NoteStore) \
+      else None
+  if raw_notes is not None:
+    return yaml.dump_all(documents) + "---\n" + raw_notes
+
+  notes_part = {}
+  for person in notes:
+    notes_part[person.name] = notes[person]
+  return yaml.dump_all(documents + [{'notes': notes_part}])
 
 
 def create_blank_yaml(filename):
@@ -656,8 +1912,64 @@ def biglist_to_family(biglist):
   return Family(*split_biglist(biglist))
 
 
-def d3_html_page_generator(family):
-  """Yield lines of an html page showing connections"""
+# d3 ships with pedigree, in static/, so charts work offline; pages
+# load a copy put next to them, or have it written into them
+D3_FILENAME = 'd3.v3.min.js'
+VENDORED_D3 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    'static', D3_FILENAME)
+D3_URL = 'https://d3js.org/d3.v3.min.js'
+
+
+def d3_script(self_contained=False):
+  """
+  The <script> element for a chart to load d3 with: d3 itself if
+  `self_contained`, else a reference to a copy next to the page
+  (see `install_d3`).  Without the vendored copy, pages can only
+  load d3 from the web, and `self_contained` is a ValueError.
+  """
+  if not os.path.exists(VENDORED_D3):
+    if self_contained:
+      raise ValueError("Can't make a self-contained page without d3"
+          " in {}".format(VENDORED_D3))
+    logging.warn("{} is missing, so charts will load d3 from {}".format(
+        VENDORED_D3, D3_URL))
+    return '<script src="{}"></script>'.format(D3_URL)
+  if not self_contained:
+    return '<script src="{}"></script>'.format(D3_FILENAME)
+  with open(VENDORED_D3) as d3_file:
+    # Not to end the <script> early
+    return "<script>{}</script>".format(
+        d3_file.read().replace("</script", "<\\/script"))
+
+
+def install_d3(directory):
+  """
+  Copy the vendored d3 into `directory`, for pages there that
+  refer to it, unless it's already there.
+  """
+  destination = os.path.join(directory, D3_FILENAME)
+  if os.path.exists(VENDORED_D3) and not (os.path.exists(destination)
+      and os.path.getsize(destination) == os.path.getsize(VENDORED_D3)):
+    shutil.copyfile(VENDORED_D3, destination)
+
+
+def generated_lines(family, generator, *args):
+  """
+  The lines `generator(family, *args)` yields, such as those of
+  `dot_file_generator`, made only once for each version of
+  `family` (see Family.memoize).
+  """
+  return family.memoize((generator.__name__,) + args,
+      lambda: list(generator(family, *args)))
+
+
+def d3_html_page_generator(family, d3=None):
+  """
+  Yield lines of an html page showing connections.  People are
+  known by their uids in the page and shown with their labels, so
+  `family` may be a FamilyView.  `d3` is the <script> element that
+  loads d3, by default `d3_script()`.
+  """
   yield """<!DOCTYPE html>
   <meta charset="utf-8">
   <style>
@@ -700,7 +2012,9 @@ def d3_html_page_generator(family):
 
   </style>
   <body>
-  <script src="http://d3js.org/d3.v3.min.js"></script>
+  """
+  yield d3 or d3_script()
+  yield """
   <script>
 
   var links = [];
@@ -708,26 +2022,31 @@ def d3_html_page_generator(family):
   function addRelation(sourcey, targety, relationy, listy) {
     listy.push({source: sourcey, target: targety, type: relationy})
   }
+  labels = {"""
+  for person in family.persons():
+    yield '{}: {},\n'.format(json.dumps(family.uid(person)),
+        json.dumps(family.label(person)))
+  yield """}
   family = {"""
   yield '  "father": {'
   for father in family.fathers():
-    yield '"{}": ['.format(father)
+    yield '"{}": ['.format(family.uid(father))
     for child in family.children(father):
-      yield '"{}",\n'.format(child)
+      yield '"{}",\n'.format(family.uid(child))
     yield '],\n'
   yield '},\n'
   yield '"mother": {\n'
   for mother in family.mothers():
-    yield '"{}": [\n'.format(mother)
+    yield '"{}": [\n'.format(family.uid(mother))
     for child in family.children(mother):
-      yield '"{}",\n'.format(child)
+      yield '"{}",\n'.format(family.uid(child))
     yield '],\n'
   yield '},\n'
   yield '"spouse": {\n'
   for prime_spouse in family.spouses():
-    yield '"{}": [\n'.format(prime_spouse)
+    yield '"{}": [\n'.format(family.uid(prime_spouse))
     for spouse in family.all_spouses(prime_spouse):
-      yield '"{}",\n'.format(spouse)
+      yield '"{}",\n'.format(family.uid(spouse))
     yield '],\n'
   yield '}\n'
   yield """
@@ -801,7 +2120,7 @@ var text = svg.append("g").selectAll("text")
   .enter().append("text")
     .attr("x", 8)
     .attr("y", ".31em")
-    .text(function(d) { return d.name; });
+    .text(function(d) { return labels[d.name]; });
 
 // Use elliptical arc path segments to doubly-encode directionality.
 function tick() {
@@ -826,271 +2145,522 @@ function transform(d) {
 </html>
 """
 
-def show_temp_floating_chart(family):
+def d3_canvas_page_generator(family, d3=None):
   """
-  Create a floating chart in a temporary file and open it in the browser.
+  Yield lines of an html page like `d3_html_page_generator`'s,
+  but drawn on a <canvas> rather than with an SVG element per
+  person and relation, so it keeps up with tens of thousands of
+  people.  People are found under the mouse with a quadtree, for
+  dragging and to show who they are, and names are only drawn
+  once zoomed in far enough to read them.
   """
+  yield """<!DOCTYPE html>
+<meta charset="utf-8">
+<style>
+body {
+  margin: 0;
+  overflow: hidden;
+}
+canvas {
+  display: block;
+  cursor: move;
+}
+</style>
+<body>
+"""
+  yield d3 or d3_script()
+  yield """
+<script>
+"""
+  index = {}
+  yield "var labels = [\n"
+  for person in family.persons():
+    index[person.name] = len(index)
+    # Not to end the <script> early
+    yield json.dumps(family.label(person)).replace("</", "<\\/") + ",\n"
+  yield "];\n"
+  # Links as [source, target, type], types numbered as in `colors`
+  types = {"father": 0, "mother": 1, "spouse": 2}
+  yield "var relations = [\n"
+  for relator, person, relation_type in family.relations():
+    yield "[{},{},{}],\n".format(index[relator.name], index[person.name],
+        types[relation_type])
+  yield """];
+
+// Names are drawn at this zoom and closer; before that only the
+// name of whoever is under the mouse is
+var LABEL_ZOOM = 1.5,
+    RADIUS = 5,
+    // How far from someone, in pixels, still counts as on them
+    HIT_DISTANCE = 10,
+    colors = ["blue", "red", "#666"];
+
+var width = window.innerWidth,
+    height = window.innerHeight;
+
+var nodes = labels.map(function(label) { return {label: label}; });
+var links = relations.map(function(relation) {
+  return {source: relation[0], target: relation[1], type: relation[2]};
+});
 
-  # Create a temporary file
-  html_file_descriptor, html_filename = tempfile.mkstemp()
+var force = d3.layout.force()
+    .nodes(nodes)
+    .links(links)
+    .size([width, height])
+    .chargeDistance(400)
+    .linkDistance(60)
+    .gravity(0.01)
+    .charge(-300)
+    .on("tick", redraw)
+    .start();
 
-  # Put html of the floating chart in it
-  html_file = os.fdopen(html_file_descriptor, 'w')
-  for line in d3_html_page_generator(family):
-    html_file.write(line)
-  html_file.close()
+var canvas = d3.select("body").append("canvas")
+    .attr("width", width)
+    .attr("height", height);
+var context = canvas.node().getContext("2d");
+
+var zoom = d3.behavior.zoom()
+    .scaleExtent([0.02, 8])
+    .on("zoom", redraw);
+
+// Quadtree of where everyone is, remade after they move
+var tree = null,
+    hovered = null,
+    dragged = null;
+
+function nodeAt(point) {
+  var t = zoom.translate(), k = zoom.scale(),
+      x = (point[0] - t[0]) / k,
+      y = (point[1] - t[1]) / k,
+      nearest = HIT_DISTANCE / k,
+      found = null;
+  if (!tree) {
+    tree = d3.geom.quadtree()
+        .x(function(d) { return d.x; })
+        .y(function(d) { return d.y; })(nodes);
+  }
+  tree.visit(function(quad, x1, y1, x2, y2) {
+    var d = quad.point;
+    if (d) {
+      var distance = Math.sqrt((d.x - x) * (d.x - x) + (d.y - y) * (d.y - y));
+      if (distance < nearest) {
+        nearest = distance;
+        found = d;
+      }
+    }
+    // Skip squares too far away to hold anyone nearer
+    return x1 > x + nearest || x2 < x - nearest ||
+        y1 > y + nearest || y2 < y - nearest;
+  });
+  return found;
+}
 
-  # Open it in a browser
-  webbrowser.open('file:{}'.format(pathname2url(html_filename)))
+// Dragging someone takes precedence over panning, so this has to
+// be listened for before the zoom behaviour is
+canvas.on("mousedown.drag", function() {
+  dragged = nodeAt(d3.mouse(this));
+  if (!dragged) return;
+  d3.event.stopImmediatePropagation();
+  dragged.fixed |= 2;
+  d3.select(window)
+      .on("mousemove.drag", function() {
+        var point = d3.mouse(canvas.node()),
+            t = zoom.translate(), k = zoom.scale();
+        dragged.px = dragged.x = (point[0] - t[0]) / k;
+        dragged.py = dragged.y = (point[1] - t[1]) / k;
+        force.resume();
+      })
+      .on("mouseup.drag", function() {
+        dragged.fixed &= ~2;
+        dragged = null;
+        d3.select(window).on("mousemove.drag", null).on("mouseup.drag", null);
+      });
+});
 
-  # Don't delete it since the user may want to examine it.
+canvas.call(zoom);
 
-def show_temp_rigid_chart(family, first_names_only=False):
-  """
-  Create a rigid chart in a temporary file and open it in the browser.
-  """
-  # Create a temporary directory
-  temp_dir = tempfile.mkdtemp()
+canvas.on("mousemove.hover", function() {
+  var found = dragged || nodeAt(d3.mouse(this));
+  if (found !== hovered) {
+    hovered = found;
+    redraw();
+  }
+});
 
-  # Put a .dot file there
-  dot_filename = os.path.join(temp_dir, "family_tree.dot")
-  with open(dot_filename, 'w') as dot_file:
-    for line in dot_file_generator(family, first_names_only):
-      dot_file.write(line + "\n")
+var drawing = false;
+function redraw() {
+  tree = null;
+  if (!drawing) {
+    drawing = true;
+    window.requestAnimationFrame(function() {
+      drawing = false;
+      draw();
+    });
+  }
+}
 
-  # Generate .svg from .dot file
-  svg_filename = os.path.join(temp_dir, "family_tree.svg")
-  with open(svg_filename, 'w') as svg_file:
-    process = subprocess.Popen(['dot', '-Tsvg', dot_filename],
-        stdout=svg_file)
+function draw() {
+  var t = zoom.translate(), k = zoom.scale();
+  context.save();
+  context.clearRect(0, 0, width, height);
+  context.translate(t[0], t[1]);
+  context.scale(k, k);
+
+  // One path per type of relation, and one for everyone
+  colors.forEach(function(color, type) {
+    context.beginPath();
+    links.forEach(function(d) {
+      if (d.type === type) {
+        context.moveTo(d.source.x, d.source.y);
+        context.lineTo(d.target.x, d.target.y);
+      }
+    });
+    context.setLineDash(type === 2 ? [1, 6] : []);
+    context.lineWidth = 1.5;
+    context.strokeStyle = color;
+    context.stroke();
+  });
+  context.setLineDash([]);
+
+  context.beginPath();
+  nodes.forEach(function(d) {
+    context.moveTo(d.x + RADIUS, d.y);
+    context.arc(d.x, d.y, RADIUS, 0, 2 * Math.PI);
+  });
+  context.fillStyle = "#ccc";
+  context.fill();
+  context.lineWidth = 1;
+  context.strokeStyle = "#333";
+  context.stroke();
+
+  context.font = "10px sans-serif";
+  context.fillStyle = "#000";
+  if (k >= LABEL_ZOOM) {
+    // Only those on screen
+    var left = -t[0] / k, top = -t[1] / k,
+        right = left + width / k, bottom = top + height / k;
+    nodes.forEach(function(d) {
+      if (d.x >= left && d.x <= right && d.y >= top && d.y <= bottom) {
+        context.fillText(d.label, d.x + 8, d.y + 3);
+      }
+    });
+  } else if (hovered) {
+    context.font = (10 / k) + "px sans-serif";
+    context.fillText(hovered.label, hovered.x + 8 / k, hovered.y + 3 / k);
+  }
+  context.restore();
+}
+
+</script>
+</body>
+</html>
+"""
 
-    # Wait until it's done writing out
-    process.wait()
 
-  # Open it in a browser
-  webbrowser.open('file:{}'.format(pathname2url(svg_filename)))
+class BackgroundRenderer(object):
+  """
+  Runs chart rendering on a worker thread, each time on a snapshot
+  of the family, so that `interact` can carry on editing.
 
-  # Don't delete it since the user may want to examine it.
+  Only the latest request waits to be rendered: asking for another
+  chart before the worker gets to the last one replaces it.
+  """
+  def __init__(self):
+    self.condition = threading.Condition()
+    self.pending = None
+    self.closing = False
+    self.thread = None
+
+  def submit(self, render, family, *args, **kwargs):
+    """Call `render(snapshot_of_family, *args, **kwargs)` soon"""
+    with self.condition:
+      self.pending = (render, family.snapshot(), args, kwargs)
+      self.condition.notify()
+      if self.thread is None:
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+  def close(self):
+    """Wait for the latest request to be rendered, then stop"""
+    with self.condition:
+      self.closing = True
+      self.condition.notify()
+    if self.thread is not None:
+      self.thread.join()
+
+  def _run(self):
+    while True:
+      with self.condition:
+        while self.pending is None and not self.closing:
+          self.condition.wait()
+        if self.pending is None:
+          return
+        render, family, args, kwargs = self.pending
+        self.pending = None
+      try:
+        render(family, *args, **kwargs)
+      except Exception:
+        logging.exception("Couldn't render the chart")
+
+
+def full_sibling_groups(family):
+  """
+  Lists of two or more children of the same father and mother,
+  found through each father's children
+  """
+  for father in family.fathers():
+    by_mother = {}
+    for child in _unique(family.children(father)):
+      mother = family.mother(child)
+      if mother is not None:
+        by_mother.setdefault(mother, []).append(child)
+    for children in by_mother.itervalues():
+      if len(children) > 1:
+        yield children
 
 def dot_file_generator(family, first_names_only=False):
-  """Generate a graphviz .dot file"""
+  """
+  Generate a graphviz .dot file.  `family` may be a FamilyView;
+  `first_names_only` is short for a view showing first names.
+  """
+  if first_names_only:
+    from pedigree.views import FamilyView
+    family = FamilyView(family, names='first')
 
   yield "digraph family_tree {"
 
   # Set up the nodes
-  for person_name in family.names():
-    uid = name_to_uid(person_name)
-    name = person_name
-    if first_names_only:
-      name = first_name(name)
+  persons = family.persons()
+  for person in persons:
     yield '  "{}" [label="{}", shape="box"];'.format(
-        uid, name)
+        family.uid(person), family.label(person))
+
+  # Keep each generation on one row
+  rows = {}
+  generations = family.generations()
+  for person in persons:
+    rows.setdefault(generations[person.name], []).append(
+        family.uid(person))
+  for generation in sorted(rows):
+    if len(rows[generation]) > 1:
+      yield '  {{ rank=same; {} }}'.format(" ".join(
+          '"{}";'.format(uid) for uid in sorted(rows[generation])))
+
+  # Keep full siblings side by side in their row, with invisible
+  # edges from each to the next
+  for siblings in full_sibling_groups(family):
+    uids = sorted((generations[sibling.name], family.uid(sibling))
+        for sibling in siblings)
+    for (row, uid), (next_row, next_uid) in zip(uids, uids[1:]):
+      if row == next_row:
+        yield '  "{}" -> "{}" [style="invis"];'.format(uid, next_uid)
 
   # Set up the connections
   for father in family.fathers():
     for child in family.children(father):
       yield '  "{}" -> "{}" [color=blue];'.format(
-          name_to_uid(father.name), 
-          name_to_uid(child.name))
+          family.uid(father),
+          family.uid(child))
   for mother in family.mothers():
     for child in family.children(mother):
       yield '  "{}" -> "{}" [color=orange];'.format(
-          name_to_uid(mother.name),
-          name_to_uid(child.name))
+          family.uid(mother),
+          family.uid(child))
   for prime_spouse in family.spouses():
     for spouse in family.all_spouses(prime_spouse):
       yield '  "{}" -> "{}" [style="dotted"];'.format(
-          name_to_uid(prime_spouse.name),
-          name_to_uid(spouse.name))
+          family.uid(prime_spouse),
+          family.uid(spouse))
   yield "}"
 
-def interact(yaml_filename):
-  with open(yaml_filename) as yaml_file:
-    family = yaml_to_family(yaml_file)
-  titlebar = "Editing {0}".format(yaml_filename)
-  quit_yet = False
-  while not quit_yet:
-    new_relations = {
-      "b.  Add a new person as a full sibling":
-        ["full sibling", family.add_full_sibling, None],
-      "c.  Add a new person as a father":
-        ["father", family.add_father, "male"],
-      "d.  Add a new person as a mother":
-        ["mother", family.add_mother, "female"],
-      "e.  Add a new person as a child":
-        ["child", family.add_child, None],
-    }
-    existing_relations = {
-      "f.  Add an existing person as a full sibling":
-        ["full_sibling", family.add_full_sibling],
-      "g.  Add an existing person as a father":
-        ["father", family.add_father],
-      "h.  Add an existing person as a mother":
-        ["mother", family.add_mother],
-      "i.  Add an existing person as a child":
-        ["child", family.add_child],
-    }
-    next_move = easygui.choicebox("What would you like to do?",
-        titlebar,
-        [
-        "a. Add a new person",
-        ] + \
-        existing_relations.keys() + new_relations.keys() + \
-        [
-        "j. Add new people as children of a couple",
-        "k. Add a pair of spouses",
-        "l. See a floating chart in the browser",
-        "m. See a rigid chart in the browser",
-        "n. Change an existing person's name",
-        "o. See a rigid chart in the browser (first names only)",
-        "p. Add a note to a person",
-        "q. Quit",
-        "r. See notes about a person",
-        "s. Delete a note from a person",
-        ]
-    )
-    change_made = False
-    if not next_move:
-      quit_yet = True
-    if next_move in existing_relations:
-      relationship = existing_relations[next_move][0]
-      add_function = existing_relations[next_move][1]
-      person = family.gui_choose_person("To whom?", titlebar)
-      if person:
-        rel = family.gui_choose_person(
-            "Who is the {}?".format(relationship), titlebar)
-        if rel:
-          add_function(person, rel)
-          change_made = True
-    if next_move in new_relations:
-      relationship = new_relations[next_move][0]
-      add_function = new_relations[next_move][1]
-      gender = new_relations[next_move][2]
-      person = family.gui_choose_person("To whom?", titlebar)
-      if person:
-        rel = family.gui_add_person(
-            "Who is the new {}?".format(relationship), titlebar,
-            gender)
-        if rel:
-          add_function(person, rel)
-          change_made = True
-    if next_move == "j. Add new people as children of a couple":
-      couple = family.gui_choose_couple_or_add("Choose a couple",
-          titlebar)
-
-      # Loop over and over adding kids until the user presses Cancel
-      kid = "Fake thing that's just not None"
-      while kid:
-        kid = family.gui_add_person("Child's name? (Press Cancel to stop)", titlebar)
-        if kid:
-          family.add_child(couple[0], kid)
-          family.add_child(couple[1], kid)
-          change_made = True
-    if next_move == "n. Change an existing person's name":
-      person = family.gui_choose_person("Whom?", titlebar)
-      if person:
-        new_name = easygui.enterbox(
-            "Enter {}'s new name".format(person.name, titlebar))
-        if new_name:
-            family.change_name(person, new_name)
-        change_made = True
-    if next_move == "p. Add a note to a person":
-      person = family.gui_choose_person("To whom?", titlebar)
-      if person:
-        new_note = easygui.enterbox(
-            "Enter anything about {}".format(person.name))
-        if new_note:
-            family.add_note(person, new_note)
-            change_made = True
-    if next_move == "s. Delete a note from a person":
-      people = family.people_with_notes()
-      person = None
-      if len(people) == 0:
-        easygui.textbox(titlebar, "", "Nobody has any notes yet.")
-      elif len(people) == 1:
-        person = people[0] 
-      else:
-        person = family.gui_choose_person("Whom?", titlebar, people)
-      if person:
-        to_be_deleted = family.gui_choose_note(person, titlebar)
-        if to_be_deleted:
-          family.delete_note(person, to_be_deleted)
-          change_made = True
-    if next_move == "r. See notes about a person":
-      people = family.people_with_notes()
-      person = None
-      if len(people) == 0:
-        easygui.textbox(titlebar, "", "Nobody has any notes yet.")
-      elif len(people) == 1:
-        person = people[0] 
-      else:
-        person = family.gui_choose_person("Whom?", titlebar, people)
-      if person:
-        family.gui_display_notes(person)
-    if next_move == "k. Add a pair of spouses":
-      person_1 = family.gui_choose_person_or_add("First person?",
-          titlebar)
-      if person_1:
-        person_2 = family.gui_choose_person_or_add(
-            "Second person?", titlebar)
-        if person_2:
-          family.add_spouse(person_1, person_2)
-          family.add_spouse(person_2, person_1)
-          change_made = True
-    if next_move == "a. Add a new person":
-      person = family.gui_add_person("New person's name?", titlebar)
-      if person:
-        change_made = True
-    wait_num_seconds = 2
-    popup_string = "\n\033[91mNew menu in {} seconds\033[0m".format(
-        wait_num_seconds)
-    if next_move == "l. See a floating chart in the browser":
-      print(popup_string)
-      show_temp_floating_chart(family)
-      time.sleep(wait_num_seconds)
-    if next_move == "m. See a rigid chart in the browser":
-      print(popup_string)
-      show_temp_rigid_chart(family)
-      time.sleep(wait_num_seconds)
-    if next_move == "o. See a rigid chart in the browser (first names only)":
-      print(popup_string)
-      show_temp_rigid_chart(family, first_names_only=True)
-      time.sleep(wait_num_seconds)
-    if next_move == "q. Quit":
-      quit_yet = True
-    if change_made:
-      if easygui.ynbox("Save changes?", titlebar):
-        with open(yaml_filename, 'w') as yaml_file:
-          yaml_file.write(family_to_yaml(family))
+def import_gedcom(gedcom_filename, yaml_filename):
+  """
+  Add everyone in a GEDCOM file to the family at `yaml_filename`
+  and save it.
+  """
+  from pedigree import gedcom
+  family = load_family(yaml_filename)
+  with open(gedcom_filename) as gedcom_file:
+    gedcom.read_gedcom(gedcom_file, family)
+  save_family(family, yaml_filename)
 
 
-def cleanup_files(yaml_filename, base_filename):
-  for extension in 'svg', 'dot', 'html':
-    os.remove('{}.{}'.format(base_filename, extension))
+def export_gedcom(yaml_filename, gedcom_filename):
+  from pedigree import gedcom
+  family = load_family(yaml_filename)
+  with open(gedcom_filename, 'w') as gedcom_file:
+    for line in gedcom.gedcom_generator(family):
+      gedcom_file.write((line + u"\n").encode('utf-8'))
+
+
+def merge_files(yaml_filenames, output_filename, aliases_filename=None):
+  """
+  Merge the families in `yaml_filenames` into one at
+  `output_filename`, printing whatever they disagree on.  Where
+  they do, the first file to say something wins.
+
+  `aliases_filename` is a .yaml mapping of names people go by in
+  some files to the names to merge them under, e.g.
 
+      Jon Smith: John Smith
+  """
+  aliases = {}
+  if aliases_filename is not None:
+    with open(aliases_filename) as aliases_file:
+      aliases = yaml.safe_load(aliases_file) or {}
+  sections_list = []
+  for yaml_filename in yaml_filenames:
+    with open(yaml_filename) as yaml_file:
+      sections_list.append(yaml_to_sections(yaml_file))
+  conflicts = []
+  family = sections_to_family(*merge_sections(sections_list, aliases,
+      conflicts))
+  with open(output_filename, 'w') as output_file:
+    output_file.write(family_to_yaml(family))
+  for conflict in conflicts:
+    print("\033[91m{}\033[0m".format(conflict))
+  print("Merged {} people into {}, with {} conflict{}.".format(
+      family.number_of_persons(), output_filename, len(conflicts),
+      "" if len(conflicts) == 1 else "s"))
+  return conflicts
+
+
+def print_summary(yaml_filename):
+  """Print the numbers from `Family.summary()` for a family"""
+  summary = load_family(yaml_filename).summary()
+  widest = summary['widest_generation']
+  for label, value in [
+      ("People", summary['persons']),
+      ("Missing a parent", summary['missing_parents']),
+      ("Missing both parents", summary['no_parents']),
+      ("Generations", summary['generations']),
+      ("Widest generation", "{} ({} people)".format(*widest)
+          if widest else "-"),
+      ("Couples", summary['couples']),
+      ("Children per couple",
+          "{:.2f}".format(summary['children_per_couple'])),
+      ("Remarriages", summary['remarriages']),
+      ("Unrelated parts", summary['components'])]:
+    print("{:<22}{}".format(label, value))
+
+
+def relate_people(yaml_filename, people_filename, output_filename=None):
+  """
+  Write how each of the people named in `people_filename` (one to
+  a line) is related to each of the others, as JSON if
+  `output_filename` ends in .json and CSV otherwise, or to the
+  screen.
+  """
+  from pedigree import relate
+  family = load_family(yaml_filename)
+  persons = dict((person.name, person) for person in family.persons())
+  with open(people_filename) as people_file:
+    names = [line.decode('utf-8').strip() for line in people_file]
+  names = [name for name in names if name and not name.startswith('#')]
+  missing = [name for name in names if name not in persons]
+  if missing:
+    print("\n\033[91mNobody is called {}\033[0m\n".format(
+        ", ".join(missing).encode('utf-8')))
+    sys.exit(1)
+
+  rows = relate.relationships(family, [persons[name] for name in names])
+  write = relate.write_json if output_filename is not None and \
+      output_filename.endswith('.json') else relate.write_csv
+  if output_filename is None:
+    write(rows, sys.stdout)
+  else:
+    with open(output_filename, 'w') as output_file:
+      write(rows, output_file)
+
+
+def find_duplicates(yaml_filename, threshold=None):
+  """Print who in the family may be listed twice, best guesses first"""
+  from pedigree import dedupe
+  family = load_family(yaml_filename)
+  if threshold is None:
+    threshold = dedupe.THRESHOLD
+  suggestions = dedupe.duplicates(family, threshold)
+  if not suggestions:
+    print("Nobody looks listed twice.")
+  for suggestion in suggestions:
+    print("{:.2f}  {} = {}  ({})".format(suggestion.score,
+        suggestion.person.name, suggestion.duplicate.name,
+        ", ".join(suggestion.reasons)))
+
+
+def answer_queries(yaml_filename, input_file=None, output_file=None):
+  """
+  Load the family once and answer JSON queries from `input_file`
+  (stdin) on `output_file` (stdout), a line each; see query.py.
+  """
+  from pedigree import query
+  family = load_family(yaml_filename)
+  query.serve(family, input_file or sys.stdin, output_file or sys.stdout)
 
-def generate_files(yaml_filename, base_filename):
 
-  # Open the YAML file or fail gracefully
+def interact(yaml_filename):
+  from pedigree import gui
+  gui.interact(yaml_filename)
+
+
+def cleanup_files(yaml_filename, base_filename):
+  """Delete whichever generated files are there"""
+  from pedigree import exporters
+  for extension in exporters.known_formats():
+    filename = '{}.{}'.format(base_filename, extension)
+    if os.path.exists(filename):
+      os.remove(filename)
+
+
+def generate_files(yaml_filename, base_filename, formats=None,
+    split_components=False, names='full', lineage=None,
+    self_contained=False, alive_in=None, where=None, engine='auto',
+    timeout=None, salt=None):
+  """
+  Write the family to `base_filename.extension` for each of
+  `formats` (by default .html, .dot and .svg), drawing each
+  unrelated part of it in a file of its own if `split_components`.
+
+  Names are shown as `names` says (see views.NAME_TRANSFORMS, and
+  views.pseudonym for `salt`, random if not given), and
+  if `lineage` names someone, only they and their ancestors and
+  descendants are shown; if `alive_in` is a year, only those alive
+  then are, and if `where` is a filter such as `place == "Bedrock"`
+  (see attributes.Filter), only those it holds for.  HTML pages
+  have d3 written into them if `self_contained`.
+
+  Graphviz lays the family out with `engine` (see
+  exporters.ENGINES, or "auto" to choose by size), and if it takes
+  more than `timeout` seconds, with a faster one instead.
+  """
+  from pedigree import exporters
+  from pedigree import views
+
+  # Open the YAML file(s) or fail gracefully
   try:
-    with open(yaml_filename) as f:
-      family = pedigree_lib.yaml_to_family(f)
+    family = load_family(yaml_filename)
   except IOError, e:
     print("\n\033[91mCouldn't open {}\033[0m\n".format(e.filename))
-    print(help_text)
-    exit(1)
-
-  # Generate d3 html page
-  with open('{}.html'.format(file_basename), 'w') as f:
-    for line in pedigree_lib.d3_html_page_generator(family):
-      f.write(line)
-
-  # Generate graphviz .dot file
-  with open('{}.dot'.format(file_basename), 'w') as f:
-    for line in pedigree_lib.dot_file_generator(family):
-      f.write(line + "\n")
-
-  # Generate .svg from .dot file
-  with open('{}.svg'.format(file_basename), 'w') as svg_file:
-    subprocess.Popen(['dot', '-Tsvg', '{}.dot'.format(file_basename)],
-        stdout=svg_file)
+    sys.exit(1)
+
+  try:
+    keep = None
+    if lineage is not None:
+      person = family.name_to_person(lineage)
+      if person is None:
+        raise ValueError("Nobody is called {}".format(lineage))
+      keep = views.lineage(family, person)
+    if alive_in is not None:
+      keep = views.both(keep, views.alive_in(family, alive_in))
+    if where is not None:
+      keep = views.both(keep, views.where(family, where))
+    if names != 'full' or keep is not None:
+      family = views.FamilyView(family, names, keep, salt)
+    exporters.export_family(family, base_filename,
+        formats or exporters.DEFAULT_FORMATS,
+        split_components=split_components,
+        self_contained=self_contained, engine=engine, timeout=timeout)
+  except ValueError, e:
+    print("\n\033[91m{}\033[0m\n".format(e))
+    sys.exit(1)
@@ -0,0 +1,185 @@
+import json
+from pedigree import relate
+
+"""
+Answering many questions about one family without reading it
+again for each: `pedigree query --stdin` reads one JSON query to a
+line, such as
+
+    {"query": "parents", "name": "Pebbles Flintstone", "id": 7}
+
+and writes one JSON answer to a line as soon as it's worked out,
+
+    {"id": 7, "result": {"father": "Fred ...", "mother": "Wilma ..."}}
+
+or `{"id": 7, "error": "..."}`.  `id` is optional and handed back
+as it was given, to match answers up with queries.
+"""
+
+
+class QueryEngine(object):
+  """
+  Indexes of `family` by name, made in one pass over its
+  relations, for answering queries from.
+  """
+  def __init__(self, family):
+    self.family = family
+    self.persons = dict((person.name, person)
+        for person in family.persons())
+    self.fathers = {}
+    self.mothers = {}
+    self.children = {}
+    self.spouses = {}
+    for relator, person, relation_type in family.relations():
+      if relation_type == "spouse":
+        self.spouses.setdefault(relator.name, set()).add(person.name)
+        self.spouses.setdefault(person.name, set()).add(relator.name)
+      else:
+        parents = self.fathers if relation_type == "father" \
+            else self.mothers
+        parents[person.name] = relator.name
+        self.children.setdefault(relator.name, set()).add(person.name)
+    self.parents = dict((name, dict((role, parents[name])
+          for role, parents in [("father", self.fathers),
+            ("mother", self.mothers)]
+          if name in parents))
+        for name in set(self.fathers) | set(self.mothers))
+
+  def person(self, name):
+    if name not in self.persons:
+      raise ValueError(u"Nobody is called {}".format(name))
+    return self.persons[name]
+
+  def parents_of(self, name):
+    self.person(name)
+    return {"father": self.fathers.get(name),
+        "mother": self.mothers.get(name)}
+
+  def children_of(self, name):
+    self.person(name)
+    return sorted(self.children.get(name, ()))
+
+  def spouses_of(self, name):
+    self.person(name)
+    return sorted(self.spouses.get(name, ()))
+
+  def _reachable(self, name, step):
+    """Everyone `step` leads to from `name`, nearest first"""
+    self.person(name)
+    found = []
+    seen = set([name])
+    generation = [name]
+    while generation:
+      next_generation = []
+      for relative in generation:
+        for other in sorted(step(relative)):
+          if other not in seen:
+            seen.add(other)
+            next_generation.append(other)
+      found.extend(next_generation)
+      generation = next_generation
+    return found
+
+  def ancestors_of(self, name):
+    return self._reachable(name, lambda name: self.parents.get(name, {}).values())
+
+  def descendants_of(self, name):
+    return self._reachable(name, lambda name: self.children.get(name, ()))
+
+  def siblings_of(self, name):
+    """
+    Names of `name`'s full, paternal and maternal half and step
+    siblings (see Family.siblings)
+    """
+    person = self.person(name)
+    names = lambda siblings: sorted(sibling.name for sibling in siblings)
+    return {"full": names(self.family.full_siblings(person)),
+        "paternal_half": names(
+            self.family.half_siblings(person, "paternal")),
+        "maternal_half": names(
+            self.family.half_siblings(person, "maternal")),
+        "step": names(self.family.step_siblings(person))}
+
+  def couples(self, name=None):
+    """
+    Pairs of spouses or parents of a child together, `name`'s only
+    if given
+    """
+    pairs = set()
+    for one, spouses in self.spouses.iteritems():
+      for two in spouses:
+        pairs.add(tuple(sorted([one, two])))
+    for child, father in self.fathers.iteritems():
+      if child in self.mothers:
+        pairs.add(tuple(sorted([father, self.mothers[child]])))
+    if name is not None:
+      self.person(name)
+      pairs = [pair for pair in pairs if name in pair]
+    return [list(pair) for pair in sorted(pairs)]
+
+  def select(self, where):
+    """Names of everyone the filter `where` holds for, sorted"""
+    return sorted(person.name for person in self.family.select(where))
+
+  def relationship(self, name, other):
+    person, other = self.person(name), self.person(other)
+    index = relate.AncestorIndex(None, [person, other], self.parents)
+    return relate.relationship(index, person, other)._asdict()
+
+  def answer(self, query):
+    """The result of `query`, a dict; ValueError if it makes no sense"""
+    if not isinstance(query, dict) or query.get("query") not in QUERIES:
+      raise ValueError("Each query needs a \"query\" of {}".format(
+          ", ".join(sorted(QUERIES))))
+    method, arguments = QUERIES[query["query"]]
+    values = []
+    for argument in arguments:
+      optional = argument.endswith("?")
+      argument = argument.rstrip("?")
+      if argument in query:
+        if not isinstance(query[argument], basestring):
+          raise ValueError("A {} query's \"{}\" should be a string"
+              .format(query["query"], argument))
+        values.append(query[argument])
+      elif not optional:
+        raise ValueError("A {} query needs a \"{}\"".format(
+            query["query"], argument))
+    return method(self, *values)
+
+
+# Each query's method and the keys it takes, with "name?" optional
+QUERIES = {
+  "parents": (QueryEngine.parents_of, ["name"]),
+  "children": (QueryEngine.children_of, ["name"]),
+  "spouses": (QueryEngine.spouses_of, ["name"]),
+  "siblings": (QueryEngine.siblings_of, ["name"]),
+  "ancestors": (QueryEngine.ancestors_of, ["name"]),
+  "descendants": (QueryEngine.descendants_of, ["name"]),
+  "couples": (QueryEngine.couples, ["name?"]),
+  "relationship": (QueryEngine.relationship, ["name", "other"]),
+  "select": (QueryEngine.select, ["where"]),
+}
+
+
+def serve(family, input_file, output_file):
+  """
+  Answer each line of `input_file` with a line of `output_file`,
+  flushing after each so whoever is asking can read it straight
+  away.
+  """
+  engine = QueryEngine(family)
+  # Not `for line in input_file`, which reads ahead and would wait
+  # for more queries before answering the ones already sent
+  for line in iter(input_file.readline, ''):
+    if not line.strip():
+      continue
+    answer = {}
+    try:
+      query = json.loads(line)
+      if isinstance(query, dict) and "id" in query:
+        answer["id"] = query["id"]
+      answer["result"] = engine.answer(query)
+    except ValueError, e:
+      answer["error"] = unicode(e)
+    output_file.write(json.dumps(answer, sort_keys=True) + "\n")
+    output_file.flush()
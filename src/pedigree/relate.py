@@ -0,0 +1,241 @@
+import collections
+import csv
+import json
+
+"""
+How each of a set of people is related to each of the others.
+
+Everyone who is an ancestor of one of the people is given a bit,
+and each person's ancestors are kept as one int per generation
+back, with the bits of the ancestors that many generations up
+set.  Two people's closest common ancestors are then found by
+and-ing those ints, nearest generations first, rather than by
+walking up the family for every pair.
+"""
+
+Relationship = collections.namedtuple('Relationship',
+    ['person', 'other', 'relationship', 'common_ancestors',
+     'generations_up', 'other_generations_up'])
+
+FIELDS = list(Relationship._fields)
+
+ORDINALS = ["first", "second", "third", "fourth", "fifth", "sixth",
+    "seventh", "eighth", "ninth", "tenth"]
+TIMES = {1: "once", 2: "twice", 3: "three times"}
+
+# Words for what someone is, as a man and as a woman
+GENDERED = {
+  "parent": ("father", "mother"),
+  "child": ("son", "daughter"),
+  "sibling": ("brother", "sister"),
+  "aunt or uncle": ("uncle", "aunt"),
+  "niece or nephew": ("nephew", "niece"),
+}
+
+
+OTHER_ROLE = {"father": "mother", "mother": "father"}
+
+
+def parents_by_name(family):
+  """
+  Map each name to their known parents, as a dict from "father" or
+  "mother" to the parent's name
+  """
+  parents = {}
+  for relator, person, relation_type in family.relations():
+    if relation_type != "spouse":
+      parents.setdefault(person.name, {})[relation_type] = relator.name
+  return parents
+
+
+class AncestorIndex(object):
+  """
+  The ancestors of each of `people` (Persons of `family`), as
+  `levels[name][n]`: an int with the bits of their ancestors `n`
+  generations up, 0 being the person themselves.  Someone reached
+  by more than one line is only counted at the nearest.
+
+  `parents`, as from `parents_by_name`, saves going through the
+  family's relations again if they're already at hand.
+  """
+  def __init__(self, family, people, parents=None):
+    if parents is None:
+      parents = parents_by_name(family)
+    self.parents = parents
+    self.bit_of = {}
+    self.names = []
+    self.levels = {}
+    for person in people:
+      seen = set([person.name])
+      generation = [person.name]
+      levels = []
+      while generation:
+        levels.append(self._bits(generation))
+        next_generation = []
+        for name in generation:
+          for parent in parents.get(name, {}).values():
+            if parent not in seen:
+              seen.add(parent)
+              next_generation.append(parent)
+        generation = next_generation
+      self.levels[person.name] = levels
+
+  def _bits(self, names):
+    bits = 0
+    for name in names:
+      if name not in self.bit_of:
+        self.bit_of[name] = len(self.names)
+        self.names.append(name)
+      bits |= 1 << self.bit_of[name]
+    return bits
+
+  def names_in(self, bits):
+    """The names whose bits are set in `bits`, in order of bit"""
+    names = []
+    while bits:
+      lowest = bits & -bits
+      names.append(self.names[lowest.bit_length() - 1])
+      bits ^= lowest
+    return names
+
+  def closest(self, name, other):
+    """
+    `(up, other_up, bits)` for the nearest common ancestors of
+    `name` and `other`, who are `up` and `other_up` generations
+    above them, or None if they have none.
+    """
+    levels = self.levels[name]
+    other_levels = self.levels[other]
+    for total in range(len(levels) + len(other_levels) - 1):
+      for up in range(max(0, total - len(other_levels) + 1),
+          min(total, len(levels) - 1) + 1):
+        bits = levels[up] & other_levels[total - up]
+        if bits:
+          return up, total - up, bits
+    return None
+
+  def other_parents(self, name, ancestor, up):
+    """
+    The recorded other parent of each of `name`'s ancestors `up` - 1
+    generations above them who has `ancestor` for a parent, with
+    None where there's no such parent on record
+    """
+    others = []
+    for child in self.names_in(self.levels[name][up - 1]):
+      for role, parent in self.parents.get(child, {}).items():
+        if parent == ancestor:
+          others.append(self.parents[child].get(OTHER_ROLE[role]))
+    return others
+
+
+def greats(count, word):
+  """`greats(2, "aunt")` -> `"great-great-aunt"`"""
+  if count <= 2:
+    return "great-" * count + word
+  return "{}x great-{}".format(count, word)
+
+
+def describe(kind, gender):
+  """`kind` in the word for `gender`, if there is one"""
+  if kind in GENDERED and gender in ("male", "female"):
+    return GENDERED[kind][gender == "female"]
+  return kind
+
+
+def relationship_label(up, other_up, gender=None, half=False):
+  """
+  What someone is to a person, when their nearest common ancestor
+  is `up` generations above the person and `other_up` above them.
+  `gender` is theirs, and `half` says they only have one such
+  ancestor rather than a couple.
+  """
+  if up == 0 and other_up == 0:
+    return "self"
+  if up == 0:
+    if other_up == 1:
+      return describe("child", gender)
+    return greats(other_up - 2, "grand" + describe("child", gender))
+  if other_up == 0:
+    if up == 1:
+      return describe("parent", gender)
+    return greats(up - 2, "grand" + describe("parent", gender))
+  half = "half-" if half else ""
+  if up == 1 and other_up == 1:
+    return half + describe("sibling", gender)
+  if other_up == 1:
+    return half + greats(up - 2, describe("aunt or uncle", gender))
+  if up == 1:
+    return half + greats(other_up - 2, describe("niece or nephew", gender))
+
+  degree = min(up, other_up) - 1
+  removed = abs(up - other_up)
+  label = "{} cousin".format(ORDINALS[degree - 1]
+      if degree <= len(ORDINALS) else "{}th".format(degree))
+  if removed:
+    label += " {} removed".format(TIMES.get(removed,
+        "{} times".format(removed)))
+  return half + label
+
+
+def relationships(family, people, parents=None):
+  """
+  Yield a Relationship for each pair of `people`, saying what the
+  second is to the first, as it's worked out.
+  """
+  index = AncestorIndex(family, people, parents)
+  for i, person in enumerate(people):
+    for other in people[i + 1:]:
+      yield relationship(index, person, other)
+
+
+def relationship(index, person, other):
+  """The Relationship of `other` to `person`, both in `index`"""
+  closest = index.closest(person.name, other.name)
+  if closest is None:
+    return Relationship(person.name, other.name, "unrelated", [],
+        None, None)
+  up, other_up, bits = closest
+  ancestors = index.names_in(bits)
+  half = len(ancestors) == 1 and up > 0 and other_up > 0 and \
+      _half(index, person.name, other.name, ancestors[0], up, other_up)
+  return Relationship(person.name, other.name,
+      relationship_label(up, other_up, other.gender, half),
+      ancestors, up, other_up)
+
+
+def _half(index, name, other, ancestor, up, other_up):
+  """
+  Whether the lines down from `ancestor` go through two different
+  recorded partners of theirs; a missing parent may be the same one
+  """
+  others = index.other_parents(name, ancestor, up)
+  other_others = index.other_parents(other, ancestor, other_up)
+  return any(one is not None and two is not None and one != two
+      for one in others for two in other_others)
+
+
+def write_csv(rows, output_file):
+  """Common ancestors are joined with "; " to fit in one column"""
+  writer = csv.writer(output_file)
+  writer.writerow(FIELDS)
+  for row in rows:
+    writer.writerow([_cell(value) for value in row])
+
+
+def _cell(value):
+  if isinstance(value, list):
+    value = "; ".join(value)
+  if isinstance(value, unicode):
+    return value.encode('utf-8')
+  return "" if value is None else value
+
+
+def write_json(rows, output_file):
+  """A JSON list of objects, written as the rows come"""
+  output_file.write("[")
+  separator = "\n  "
+  for row in rows:
+    output_file.write(separator + json.dumps(row._asdict(),
+        sort_keys=True))
+    separator = ",\n  "
+  output_file.write("\n]\n")
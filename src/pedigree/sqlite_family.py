@@ -0,0 +1,564 @@
+import datetime
+import json
+import re
+import sqlite3
+import yaml
+from pedigree import pedigree_lib
+from pedigree.pedigree_lib import Person, GenderError, \
+    GenealogicalError, PersonExistsError, memoized
+
+"""
+A Family kept in a SQLite database instead of in memory.
+
+People, relations, notes and attributes live in four tables.  Relations are
+stored the way they are in Family's graph, as directed
+`parent -> child` rows whose relation_type is "father", "mother"
+or "spouse" (for spouses `parent` is simply the first of the two).
+Both directions of lookup are indexed, so asking for someone's
+father or children touches only the rows involved.
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+  name TEXT PRIMARY KEY,
+  gender TEXT,
+  born,
+  died
+);
+CREATE TABLE IF NOT EXISTS relations (
+  parent TEXT NOT NULL,
+  child TEXT NOT NULL,
+  relation_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS relations_by_child
+  ON relations (child, relation_type);
+CREATE INDEX IF NOT EXISTS relations_by_parent
+  ON relations (parent, relation_type);
+CREATE TABLE IF NOT EXISTS notes (
+  name TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  note TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_by_name ON notes (name, position);
+CREATE TABLE IF NOT EXISTS attributes (
+  name TEXT NOT NULL,
+  attribute TEXT NOT NULL,
+  value TEXT NOT NULL,
+  PRIMARY KEY (name, attribute)
+);
+"""
+
+
+# How sqlite3 stores a datetime.date
+iso_date_regex = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def read_date(value):
+  """
+  A born or died value as the YAML backend has it: sqlite3 stores a
+  datetime.date as ISO text, so that's made a date again.  Years
+  come back as ints already.
+  """
+  if isinstance(value, basestring) and iso_date_regex.match(value):
+    try:
+      return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+      return value
+  return value
+
+
+def row_to_person(name, gender, born, died):
+  return Person(name, gender, read_date(born), read_date(died))
+
+
+def connect(filename, check_same_thread=True):
+  connection = sqlite3.connect(filename,
+      check_same_thread=check_same_thread)
+  connection.executescript(SCHEMA)
+  # Databases made before people had dates
+  columns = [row[1] for row in
+      connection.execute("PRAGMA table_info(persons)")]
+  for column in pedigree_lib.DATE_FIELDS:
+    if column not in columns:
+      connection.execute(
+          "ALTER TABLE persons ADD COLUMN {}".format(column))
+  return connection
+
+
+class SqliteNotes(object):
+  """
+  Dict-like view of the notes table, keyed by Person like
+  `Family.notes`.  Nothing is read until asked for.  `changes`
+  counts the entries set, as NoteStore's does.
+  """
+  def __init__(self, connection):
+    self.connection = connection
+    self.changes = 0
+
+  def __contains__(self, person):
+    return self.connection.execute(
+        "SELECT 1 FROM notes WHERE name = ? LIMIT 1",
+        (person.name,)).fetchone() is not None
+
+  def __getitem__(self, person):
+    notes = [
+      row[0]
+      for row in self.connection.execute(
+          "SELECT note FROM notes WHERE name = ? ORDER BY position",
+          (person.name,))
+    ]
+    if not notes:
+      raise KeyError(person)
+    return notes
+
+  def get(self, person, default=None):
+    try:
+      return self[person]
+    except KeyError:
+      return default
+
+  def __setitem__(self, person, notes):
+    self.changes += 1
+    self.connection.execute("DELETE FROM notes WHERE name = ?",
+        (person.name,))
+    self.connection.executemany(
+        "INSERT INTO notes (name, position, note) VALUES (?, ?, ?)",
+        [(person.name, position, note)
+          for position, note in enumerate(notes)])
+
+  def __iter__(self):
+    for row in self.connection.execute(
+        "SELECT name, gender, born, died FROM persons"
+        " WHERE name IN (SELECT name FROM notes)"):
+      yield row_to_person(*row)
+
+  def keys(self):
+    return list(self)
+
+  def items(self):
+    return [(person, self[person]) for person in self]
+
+  def __len__(self):
+    return self.connection.execute(
+        "SELECT COUNT(DISTINCT name) FROM notes").fetchone()[0]
+
+
+def _attribute_rows(attributes_by_name):
+  """`(name, attribute, value)` rows for the attributes table"""
+  return [(name, attribute, json.dumps(value, default=unicode))
+      for name, attributes in attributes_by_name
+      for attribute, value in attributes.iteritems()]
+
+
+class SqliteFamily(pedigree_lib.Family):
+  """
+  Family whose people, relations and notes are queried from a
+  SQLite database on demand rather than held in memory.
+
+  Attributes are kept in the database a row to each, as JSON, and
+  read into an AttributeStore the first time they're asked for.
+
+  Changes are made inside a transaction; call `commit()` to keep
+  them.
+  """
+  def __init__(self, filename):
+    self.filename = filename
+    self.connection = connect(filename)
+    self.notes = SqliteNotes(self.connection)
+    self.version = 0
+    self._memo = {}
+    self._memo_shared = False
+    self._attributes = None
+
+  def commit(self):
+    self.connection.commit()
+
+  def snapshot(self):
+    """
+    The family as it is now, saved or not, copied into an in-memory
+    database on a connection of its own that may be used from
+    another thread.
+    """
+    snapshot = SqliteFamily.__new__(SqliteFamily)
+    snapshot.filename = self.filename
+    # iterdump reads through this connection, so sees unsaved changes
+    snapshot.connection = sqlite3.connect(':memory:',
+        check_same_thread=False)
+    snapshot.connection.executescript(
+        "\n".join(self.connection.iterdump()))
+    snapshot.notes = SqliteNotes(snapshot.connection)
+    snapshot.version = 0
+    snapshot._memo = {}
+    snapshot._memo_shared = False
+    snapshot._attributes = None
+    return snapshot
+
+  def close(self):
+    self.connection.close()
+
+  def _persons(self, query, parameters=()):
+    return [row_to_person(*row)
+        for row in self.connection.execute(query, parameters)]
+
+  def _relatives(self, column, other_column, name, relation_types):
+    return self._persons(
+        "SELECT persons.name, persons.gender, persons.born, persons.died"
+        " FROM relations"
+        " JOIN persons ON persons.name = relations.{0}"
+        " WHERE relations.{1} = ? AND relations.relation_type IN ({2})"
+        " ORDER BY relations.rowid".format(
+            column, other_column, ", ".join("?" * len(relation_types))),
+        (name,) + tuple(relation_types))
+
+  def _relators(self, relation_type):
+    return set(self._persons(
+        "SELECT name, gender, born, died FROM persons WHERE name IN"
+        " (SELECT parent FROM relations WHERE relation_type = ?)",
+        (relation_type,)))
+
+  def _add_relation(self, parent, child, relation_type):
+    self.add_person(parent)
+    self.add_person(child)
+    self.connection.execute(
+        "INSERT INTO relations (parent, child, relation_type)"
+        " VALUES (?, ?, ?)", (parent.name, child.name, relation_type))
+    self._changed()
+
+  def has_person(self, person):
+    return self.name_to_person(person.name) is not None
+
+  @property
+  def attributes(self):
+    if self._attributes is None:
+      from pedigree.attributes import AttributeStore
+      self._attributes = AttributeStore(self.persons())
+      persons = dict((person.name, person)
+          for person in self._attributes.persons)
+      for name, attribute, value in self.connection.execute(
+          "SELECT name, attribute, value FROM attributes ORDER BY rowid"):
+        if name in persons:
+          self._attributes.set(persons[name], attribute, json.loads(value))
+    return self._attributes
+
+  def set_attribute(self, person, attribute, value):
+    self.attributes.set(person, attribute, value)
+    if value is None:
+      self.connection.execute("DELETE FROM attributes"
+          " WHERE name = ? AND attribute = ?", (person.name, attribute))
+    else:
+      self.connection.executemany("INSERT OR REPLACE INTO attributes"
+          " (name, attribute, value) VALUES (?, ?, ?)",
+          _attribute_rows([(person.name, {attribute: value})]))
+    self._changed()
+
+  def add_person(self, person):
+    if self._attributes is not None:
+      self._attributes.add_person(person)
+    self.connection.execute(
+        "INSERT OR IGNORE INTO persons (name, gender, born, died)"
+        " VALUES (?, ?, ?, ?)",
+        (person.name, person.gender, person.born, person.died))
+    self._changed()
+
+  def persons(self):
+    return self._persons("SELECT name, gender, born, died FROM persons")
+
+  def number_of_persons(self):
+    return self.connection.execute(
+        "SELECT COUNT(*) FROM persons").fetchone()[0]
+
+  def search(self, query, k=10):
+    """
+    The `k` people whose names contain a word starting with every
+    word of `query`, or whose notes contain it.  Matches at the
+    start of the name come first.
+    """
+    tokens = pedigree_lib.search_tokens(query)
+    if not tokens:
+      return []
+    # Words are made of letters, digits and _, of which only _
+    # means anything to LIKE
+    patterns = [token.replace('_', '\\_') for token in tokens]
+    conditions = []
+    parameters = []
+    for pattern in patterns:
+      conditions.append("(name LIKE ? ESCAPE '\\'"
+          " OR name LIKE ? ESCAPE '\\'"
+          " OR name IN (SELECT name FROM notes"
+          "   WHERE note LIKE ? ESCAPE '\\'))")
+      parameters += [pattern + '%', '% ' + pattern + '%',
+          '%' + pattern + '%']
+    return self._persons(
+        "SELECT name, gender, born, died FROM persons WHERE {}"
+        " ORDER BY name NOT LIKE ? ESCAPE '\\', name LIMIT ?".format(
+            " AND ".join(conditions)),
+        parameters + [patterns[0] + '%', k])
+
+  def names(self):
+    return [row[0] for row in
+        self.connection.execute("SELECT name FROM persons")]
+
+  def name_to_person(self, name):
+    found = self._persons(
+        "SELECT name, gender, born, died FROM persons WHERE name = ?",
+        (name,))
+    return found[0] if found else None
+
+  def change_name(self, person, new_name):
+    renamed = Person(name=new_name, gender=person.gender,
+        born=person.born, died=person.died)
+    try:
+      self.connection.execute("UPDATE persons SET name = ? WHERE name = ?",
+          (new_name, person.name))
+    except sqlite3.IntegrityError:
+      raise ValueError("{} is already in the family".format(new_name))
+    for statement in [
+        "UPDATE relations SET parent = ? WHERE parent = ?",
+        "UPDATE relations SET child = ? WHERE child = ?",
+        "UPDATE notes SET name = ? WHERE name = ?",
+        "UPDATE attributes SET name = ? WHERE name = ?"]:
+      self.connection.execute(statement, (new_name, person.name))
+    if self._attributes is not None:
+      self._attributes.change_name(person.name, renamed)
+    self._changed()
+    return renamed
+
+  def change_gender(self, person, gender):
+    changed = Person(name=person.name, gender=gender, born=person.born,
+        died=person.died)
+    self.connection.execute("UPDATE persons SET gender = ? WHERE name = ?",
+        (changed.gender, person.name))
+    if self._attributes is not None:
+      self._attributes.change_name(person.name, changed)
+    self._changed()
+    return changed
+
+  def add_note(self, person, new_note):
+    self.connection.execute(
+        "INSERT INTO notes (name, position, note) VALUES (?,"
+        " (SELECT COALESCE(MAX(position) + 1, 0) FROM notes"
+        "  WHERE name = ?), ?)", (person.name, person.name, new_note))
+    self._changed()
+
+  def delete_note(self, person, to_be_deleted):
+    self.connection.execute(
+        "DELETE FROM notes WHERE rowid = (SELECT rowid FROM notes"
+        " WHERE name = ? AND note = ? ORDER BY position LIMIT 1)",
+        (person.name, to_be_deleted))
+    self._changed()
+
+  def add_child(self, parent, child):
+    if parent.gender == "male":
+      relation_type = "father"
+    elif parent.gender == "female":
+      relation_type = "mother"
+    else:
+      raise GenderError("Without a gender on {}, can't tell"
+          " whether she should be added "
+          "as a mother or father.".format(parent))
+    self._add_relation(parent, child, relation_type)
+
+  def add_spouse(self, person, spouse):
+    self._add_relation(person, spouse, "spouse")
+
+  def add_full_sibling(self, person, sibling):
+    if not self.has_person(person):
+      raise PersonExistsError(
+          "{} isn't in the family yet.".format(person))
+    self.add_person(sibling)
+
+    # Add either parent if they don't exist
+    if not self.father(person):
+      self.add_father(person,
+          Person(name=self.new_anonymous_name(), gender="male"))
+    if not self.mother(person):
+      self.add_mother(person,
+          Person(name=self.new_anonymous_name(), gender="female"))
+
+    self._add_relation(self.father(person), sibling, "father")
+    self._add_relation(self.mother(person), sibling, "mother")
+
+  def new_anonymous_name(self):
+    anon_lengths = [
+      len(row[0])
+      for row in self.connection.execute(
+          "SELECT name FROM persons WHERE name LIKE '?%'")
+      if re.match(r'^\?+$', row[0])
+    ]
+    return '?' * (max(anon_lengths + [0]) + 1)
+
+  def _add_parent(self, child, parent, relation_type, gender,
+      pronoun):
+    existing = self._relatives('parent', 'child', child.name,
+        [relation_type])
+    if existing:
+      raise GenealogicalError(
+          "{0} already has a {1} ({2})".format(child, relation_type,
+              existing[0]))
+    if child == parent:
+      raise GenealogicalError(
+          "{0} can't {1} {2}".format(child, relation_type, pronoun))
+    if parent.gender != gender:
+      raise GenderError("{0} isn't {1}, so can't " \
+          "be a {2}.".format(parent, gender, relation_type))
+    self._add_relation(parent, child, relation_type)
+
+  def add_mother(self, child, mother):
+    self._add_parent(child, mother, "mother", "female", "herself")
+
+  def add_father(self, child, father):
+    self._add_parent(child, father, "father", "male", "himself")
+
+  def children(self, parent):
+    if not self.has_person(parent):
+      raise PersonExistsError(
+          "{} isn't in the family yet.".format(parent))
+    return self._relatives('child', 'parent', parent.name,
+        ["father", "mother"])
+
+  @memoized
+  def fathers(self):
+    return self._relators("father")
+
+  @memoized
+  def mothers(self):
+    return self._relators("mother")
+
+  @memoized
+  def spouses(self):
+    return self._relators("spouse")
+
+  @memoized
+  def couples(self):
+    to_return = []
+    for one, two in self.connection.execute(
+        "SELECT DISTINCT fathers.parent, mothers.parent"
+        " FROM relations AS fathers JOIN relations AS mothers"
+        "   ON fathers.child = mothers.child"
+        " WHERE fathers.relation_type = 'father'"
+        "   AND mothers.relation_type = 'mother'"
+        " UNION SELECT parent, child FROM relations"
+        " WHERE relation_type = 'spouse'"):
+      couple = sorted([self.name_to_person(one),
+          self.name_to_person(two)])
+      if couple not in to_return:
+        to_return.append(couple)
+    return to_return
+
+  def father(self, person):
+    found = self._relatives('parent', 'child', person.name,
+        ["father"])
+    return found[0] if found else None
+
+  def mother(self, person):
+    found = self._relatives('parent', 'child', person.name,
+        ["mother"])
+    return found[0] if found else None
+
+  def all_spouses(self, person):
+    return self._relatives('child', 'parent', person.name,
+        ["spouse"])
+
+  def partners(self, person):
+    return pedigree_lib._unique(self.all_spouses(person) +
+        self._relatives('parent', 'child', person.name, ["spouse"]))
+
+  def relations(self):
+    for row in self.connection.execute(
+        "SELECT relators.name, relators.gender, relators.born,"
+        " relators.died, persons.name, persons.gender, persons.born,"
+        " persons.died, relation_type FROM relations"
+        " JOIN persons AS relators ON relators.name = relations.parent"
+        " JOIN persons ON persons.name = relations.child"):
+      yield row_to_person(*row[:4]), row_to_person(*row[4:8]), row[8]
+
+  @memoized
+  def people_with_notes(self):
+    return list(self.notes)
+
+
+def _yaml_sections(yaml_file):
+  """
+  Yield `(section_name, contents)` for each document of a .yaml
+  family file, parsing one document at a time.
+  """
+  for document in yaml.safe_load_all(yaml_file):
+    for section_name, contents in document.items():
+      yield section_name, contents
+
+
+def yaml_to_sqlite(yaml_file, db_filename):
+  """
+  Copy the family in `yaml_file` into a (new or empty) SQLite
+  database without building a Family in memory.
+  """
+  connection = connect(db_filename)
+  for section_name, contents in _yaml_sections(yaml_file):
+    if not contents:
+      continue
+    if section_name == 'people':
+      connection.executemany(
+          "INSERT OR IGNORE INTO persons (name, gender, born, died)"
+          " VALUES (?, ?, ?, ?)",
+          [(name, details['gender'], details['born'], details['died'])
+            for person in contents for name, value in person.items()
+            for details in [pedigree_lib.entry_details(value)]])
+      connection.executemany(
+          "INSERT OR REPLACE INTO attributes (name, attribute, value)"
+          " VALUES (?, ?, ?)", _attribute_rows(
+              (name, pedigree_lib.entry_attributes(value))
+              for person in contents for name, value in person.items()))
+    elif section_name in ('father', 'mother', 'spouse'):
+      connection.executemany(
+          "INSERT INTO relations (parent, child, relation_type)"
+          " VALUES (?, ?, ?)",
+          [(relator, relative, section_name)
+            for relator, relatives in contents.items()
+            for relative in relatives])
+    elif section_name == 'notes':
+      connection.executemany(
+          "INSERT INTO notes (name, position, note) VALUES (?, ?, ?)",
+          [(name, position, note)
+            for name, notes in contents.items()
+            for position, note in enumerate(notes)])
+  connection.commit()
+  connection.close()
+
+
+def _grouped(rows):
+  """Turn `(key, value)` rows into a {key: [values]} dict"""
+  grouped = {}
+  for key, value in rows:
+    grouped.setdefault(key, []).append(value)
+  return grouped
+
+
+def sqlite_to_yaml(db_filename, yaml_file):
+  """
+  Write the family in a SQLite database to the open file
+  `yaml_file` in the usual five-document layout.  Each document
+  is read from the database only when it's about to be written.
+  """
+  connection = connect(db_filename)
+
+  def documents():
+    attributes = {}
+    for name, attribute, value in connection.execute(
+        "SELECT name, attribute, value FROM attributes ORDER BY rowid"):
+      attributes.setdefault(name, {})[attribute] = json.loads(value)
+    yield {'people': [
+      pedigree_lib.person_entry(row_to_person(*row),
+          attributes.get(row[0]))
+      for row in connection.execute(
+          "SELECT name, gender, born, died FROM persons ORDER BY rowid")
+    ]}
+    for relation_type in ('father', 'mother', 'spouse'):
+      yield {relation_type: _grouped(connection.execute(
+          "SELECT parent, child FROM relations"
+          " WHERE relation_type = ? ORDER BY rowid",
+          (relation_type,)))}
+    yield {'notes': _grouped(connection.execute(
+        "SELECT name, note FROM notes ORDER BY name, position"))}
+
+  yaml.safe_dump_all(documents(), yaml_file)
+  connection.close()
@@ -0,0 +1,104 @@
+from pedigree import pedigree_lib
+from pedigree import attributes
+import random
+import pytest
+
+def person(name, gender="male", born=None):
+  return pedigree_lib.Person(name, gender, born)
+
+@pytest.fixture
+def family():
+  return pedigree_lib.yaml_to_family(
+      "people:\n"
+      "  - Ann: {gender: female, born: 1820, place: Bedrock,"
+      " occupation: quarry, tags: [miner, founder]}\n"
+      "  - Bob: {gender: male, born: 1901, place: Rockvegas, height: 1.8}\n"
+      "  - Cat: {gender: female, born: 1851, place: Bedrock, tags: [miner]}\n"
+      "  - Dan: male\n"
+      "---\nfather:\n  Bob: [Dan]\n---\nmother:\n---\nspouse:\n---\n"
+      "notes:\n")
+
+def names(persons):
+  return [person.name for person in persons]
+
+
+def test_columns(family):
+  store = family.attributes
+  assert store.names() == ['height', 'occupation', 'place', 'tags']
+  assert store.columns['place'].kind == 'text'
+  assert store.columns['height'].kind == 'number'
+  assert store.column('birth_year').kind == 'number'
+  assert family.attribute(family.name_to_person('Ann'), 'tags') == \
+      ['miner', 'founder']
+  assert family.attributes_of(family.name_to_person('Dan')) == {}
+
+  # A column takes whatever's put in it, by becoming text if need be
+  dan = family.name_to_person('Dan')
+  family.set_attribute(dan, 'height', "tall")
+  assert store.columns['height'].kind == 'text'
+  assert family.attribute(family.name_to_person('Bob'), 'height') == "1.8"
+  with pytest.raises(ValueError):
+    family.set_attribute(dan, 'birth_year', 1900)
+
+def test_select(family):
+  select = lambda expression: names(family.select(expression))
+  assert select('place == "Bedrock"') == ['Ann', 'Cat']
+  assert select('birth_year < 1900 and place == "Bedrock"') == \
+      ['Ann', 'Cat']
+  assert select('1850 < birth_year <= 1901') == ['Bob', 'Cat']
+  assert select('place != "Bedrock"') == ['Bob']
+  assert select('not place == "Bedrock"') == ['Bob', 'Dan']
+  assert select('place in ("Rockvegas", "Nowhere") or gender == "female"') \
+      == ['Ann', 'Bob', 'Cat']
+  assert select('"founder" in tags') == ['Ann']
+  assert select('tags in ["founder", "miner"]') == ['Ann', 'Cat']
+  assert select('place > "C"') == ['Bob']
+  cat = family.name_to_person('Cat')
+  family.change_gender(cat, 'male')
+  assert select('gender == "female"') == ['Ann']
+  family.change_name(family.name_to_person('Ann'), 'Anne')
+  assert select('gender == "female"') == ['Anne']
+  for bad in ['place', 'place == other', 'height + 1 > 2', 'place ==',
+      'nobody == 1', 'birth_year == "old"', 'place in "Bedrock"',
+      '"x" in place']:
+    with pytest.raises(ValueError):
+      family.select(bad)
+
+def test_select_matches_brute_force():
+  random.seed(2)
+  family = pedigree_lib.Family()
+  places = ["A", "B", "C", None]
+  for i in range(300):
+    someone = person(str(i), born=random.choice([None, 1800 + i % 90]))
+    family.add_person(someone)
+    family.set_attribute(someone, 'place', random.choice(places))
+  expected = [p.name for p in family.persons()
+      if p.born is not None and p.born >= 1850 and
+          family.attribute(p, 'place') in ("A", "C")]
+  assert sorted(names(family.select(
+      'birth_year >= 1850 and place in ("A", "C")'))) == sorted(expected)
+
+def test_yaml_and_snapshots(family):
+  written = pedigree_lib.family_to_yaml(family)
+  again = pedigree_lib.yaml_to_family(written)
+  assert again.attributes_of(again.name_to_person('Ann')) == \
+      {'place': 'Bedrock', 'occupation': 'quarry',
+       'tags': ['miner', 'founder']}
+
+  snapshot = family.snapshot()
+  cat = family.name_to_person('Cat')
+  family.set_attribute(cat, 'place', 'Rockvegas')
+  renamed = family.change_name(family.name_to_person('Ann'), 'Anne')
+  assert names(family.select('place == "Bedrock"')) == ['Anne']
+  assert names(snapshot.select('place == "Bedrock"')) == ['Ann', 'Cat']
+  assert family.attribute(renamed, 'occupation') == 'quarry'
+
+def test_generate_where(family, tmpdir):
+  yaml_filename = str(tmpdir.join('attributes.yaml'))
+  pedigree_lib.save_family(family, yaml_filename)
+  base = str(tmpdir.join('tree'))
+  pedigree_lib.generate_files(yaml_filename, base, ['dot'],
+      where='"miner" in tags')
+  dot = tmpdir.join('tree.dot').read()
+  assert 'label="Ann"' in dot and 'label="Cat"' in dot
+  assert 'label="Bob"' not in dot
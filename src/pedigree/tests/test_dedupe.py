@@ -0,0 +1,77 @@
+from pedigree import pedigree_lib
+from pedigree import dedupe
+import pytest
+
+def person(name, gender="male"):
+  return pedigree_lib.Person(name=name, gender=gender)
+
+@pytest.fixture
+def family():
+  """
+  John Smith (1) and Jon Smith are the same man, entered twice with
+  the same father, and may be John Smith (2) too; Jane Smith is his
+  sister and Joan Smith his wife.
+  """
+  family = pedigree_lib.Family()
+  father = person('Adam Smith')
+  family.add_children(father, [person('John Smith (1)'),
+      person('Jon Smith'), person('Jane Smith', 'female')])
+  family.add_spouse(person('John Smith (1)'),
+      person('Joan Smith', 'female'))
+  family.add_spouse(person('John Smith (2)'),
+      person('Joanne Smith', 'female'))
+  family.add_child(person('Adam Smyth'), person('Eve Jones', 'female'))
+  return family
+
+
+def test_names():
+  assert dedupe.normalize_name(u"  Zo\xeb  O'Brien (2) ") == "zoe obrien"
+  assert dedupe.surname("John Smith (1)") == "smith"
+  assert dedupe.surname("") == ""
+  assert [dedupe.soundex(word) for word in
+      ['Robert', 'Rupert', 'Ashcraft', 'Tymczak', 'Pfister', '']] == \
+      ['r163', 'r163', 'a261', 't522', 'p236', '']
+  assert dedupe.name_similarity("Jon Smith", "John Smith (2)") >= 0.9
+  assert dedupe.name_similarity("Ed Smith", "Zeke Smith") < 0.6
+  assert dedupe.normalize_name(u"\u0418\u0432\u0430\u0301\u043d") == \
+      u"\u0438\u0432\u0430\u043d"
+  assert dedupe.name_similarity(u"\u0418\u0432\u0430\u043d",
+      u"\u041f\u0451\u0442\u0440") < 0.5
+  assert dedupe.name_similarity(u"\u5f20\u4f1f", u"\u674e\u5a1c") < 0.5
+  assert dedupe.name_similarity("???", "!") == 0.0
+
+def test_non_latin_siblings():
+  family = pedigree_lib.Family()
+  family.add_children(person(u'\u0391\u03bd\u03b4\u03c1\u03ad\u03b1\u03c2'),
+      [person(u'\u0418\u0432\u0430\u043d'),
+        person(u'\u041f\u0451\u0442\u0440'),
+        person(u'\u5f20\u4f1f', 'female')])
+  assert dedupe.duplicates(family) == []
+
+def test_duplicates(family):
+  suggestions = dedupe.duplicates(family)
+  found = dict(((suggestion.person.name, suggestion.duplicate.name),
+      suggestion) for suggestion in suggestions)
+  assert found[('John Smith (1)', 'Jon Smith')].score == 1.0
+  assert 'same father' in found[('John Smith (1)', 'Jon Smith')].reasons
+  assert ('John Smith (1)', 'John Smith (2)') in found
+  # Only blocked together by how their surnames sound
+  assert ('Adam Smith', 'Adam Smyth') in found
+  assert [suggestion.score for suggestion in suggestions] == \
+      sorted([suggestion.score for suggestion in suggestions],
+          reverse=True)
+
+  # Jane isn't a man, and Joan is John's wife
+  everyone = dedupe.duplicates(family, threshold=0)
+  pairs = [(suggestion.person.name, suggestion.duplicate.name)
+      for suggestion in everyone]
+  assert ('Jane Smith', 'Jon Smith') not in pairs
+  assert ('Joan Smith', 'John Smith (1)') not in pairs
+  assert len(everyone) > len(suggestions)
+
+def test_big_blocks_skipped(family):
+  # Only people sharing a father or spouse are compared now
+  suggestions = dedupe.duplicates(family, threshold=0, max_block=3)
+  assert set((suggestion.person.name, suggestion.duplicate.name)
+      for suggestion in suggestions) == set([
+      ('John Smith (1)', 'Jon Smith')])
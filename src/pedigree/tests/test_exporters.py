@@ -0,0 +1,232 @@
+from pedigree import pedigree_lib
+from pedigree import exporters
+from pedigree import views
+import networkx as nx
+import json
+import pytest
+import sys
+import time
+import os
+
+@pytest.fixture
+def example2_yaml_path():
+  return os.path.join(sys.prefix, 'examples/example2.yaml')
+
+@pytest.fixture
+def family(example2_yaml_path):
+  return pedigree_lib.load_family(example2_yaml_path)
+
+@pytest.fixture
+def base_filename(tmpdir):
+  return str(tmpdir.join('family_tree'))
+
+
+def test_export_native_formats(family, base_filename):
+  exporters.export_family(family, base_filename,
+      ['json', 'graphml', 'gexf', 'html', 'dot'])
+  for extension in 'json', 'graphml', 'gexf', 'html', 'dot':
+    assert os.path.exists('{}.{}'.format(base_filename, extension))
+
+  with open(base_filename + '.json') as json_file:
+    written = json.load(json_file)
+  assert len(written['nodes']) == len(family.persons())
+  uid = pedigree_lib.name_to_uid
+  assert {"id": uid('a'), "name": "a", "gender": "male",
+      "notes": ["This guy is named a"]} in written['nodes']
+  assert {"source": uid('a'), "target": uid('c'), "type": "father"} in \
+      written['links']
+
+  graph = nx.read_graphml(base_filename + '.graphml')
+  assert sorted(graph.nodes()) == sorted(uid(name)
+      for name in family.names())
+  assert graph.node[uid('a')]['name'] == "a"
+  assert graph.node[uid('a')]['notes'] == "This guy is named a"
+  assert graph[uid('i')][uid('c')]['type'] == "mother"
+  assert graph.number_of_edges() == len(written['links'])
+  assert nx.read_gexf(base_filename + '.gexf').number_of_edges() == \
+      len(written['links'])
+
+def test_export_unicode(base_filename):
+  family = pedigree_lib.Family()
+  zoe = pedigree_lib.Person(u'Zo\xeb Br\xfbl\xe9', 'female')
+  family.add_child(pedigree_lib.Person(u'\u0410\u043d\u043d\u0430',
+      'female'), zoe)
+  family.add_note(zoe, u"N\xe9e \u2014 in K\xf6ln")
+  exporters.export_family(family, base_filename, ['graphml', 'gexf'])
+  uid = pedigree_lib.name_to_uid
+  graph = nx.read_graphml(base_filename + '.graphml')
+  assert graph.node[uid(zoe.name)]['name'] == zoe.name
+  assert graph.node[uid(zoe.name)]['notes'] == u"N\xe9e \u2014 in K\xf6ln"
+  graph = nx.read_gexf(base_filename + '.gexf')
+  assert sorted(graph.node[node]['label'] for node in graph) == \
+      sorted(family.names())
+
+def test_export_canvas_html(family, base_filename):
+  exporters.export_family(family, base_filename, ['canvas.html'])
+  with open(base_filename + '.canvas.html') as html_file:
+    page = html_file.read()
+  labels = json.loads(page.split("var labels = ")[1].split(";")[0]
+      .replace(",\n]", "]"))
+  assert sorted(labels) == sorted(family.names())
+  relations = json.loads(page.split("var relations = ")[1].split(";")[0]
+      .replace(",\n]", "]"))
+  assert [labels.index('a'), labels.index('c'), 0] in relations
+  assert len(relations) == len(list(family.relations()))
+  assert 'append("canvas")' in page and "d3.geom.quadtree" in page
+
+def test_d3_vendored():
+  # Shipped with the package, so charts work offline
+  assert os.path.basename(pedigree_lib.VENDORED_D3) == 'd3.v3.min.js'
+  with open(pedigree_lib.VENDORED_D3) as d3_file:
+    d3 = d3_file.read()
+  assert 'version:"3.' in d3
+  assert 'layout' in d3 and 'quadtree' in d3
+  assert pedigree_lib.d3_script() == '<script src="d3.v3.min.js"></script>'
+
+@pytest.fixture
+def vendored_d3(tmpdir, monkeypatch):
+  d3 = tmpdir.mkdir('static').join('d3.v3.min.js')
+  d3.write('var d3 = {version: "3"}; "</script>";\n')
+  monkeypatch.setattr(pedigree_lib, 'VENDORED_D3', str(d3))
+  return d3
+
+def test_d3_next_to_pages(family, tmpdir, vendored_d3):
+  base_filename = str(tmpdir.mkdir('out').join('family_tree'))
+  exporters.export_family(family, base_filename, ['html', 'canvas.html'])
+  assert tmpdir.join('out', 'd3.v3.min.js').read() == vendored_d3.read()
+  for extension in 'html', 'canvas.html':
+    with open('{}.{}'.format(base_filename, extension)) as html_file:
+      page = html_file.read()
+    assert '<script src="d3.v3.min.js"></script>' in page
+    assert 'http' not in page
+
+def test_d3_self_contained(family, tmpdir, vendored_d3):
+  base_filename = str(tmpdir.mkdir('out').join('family_tree'))
+  exporters.export_family(family, base_filename, ['html'],
+      self_contained=True)
+  assert not tmpdir.join('out', 'd3.v3.min.js').exists()
+  with open(base_filename + '.html') as html_file:
+    page = html_file.read()
+  assert '<script>var d3 = {version: "3"}; "<\\/script>";' in page
+  assert '<script src=' not in page
+
+def test_d3_missing(family, base_filename, tmpdir, monkeypatch):
+  monkeypatch.setattr(pedigree_lib, 'VENDORED_D3',
+      str(tmpdir.join('nowhere.js')))
+  with pytest.raises(ValueError):
+    exporters.export_family(family, base_filename, ['html'],
+        self_contained=True)
+  exporters.export_family(family, base_filename, ['html'])
+  with open(base_filename + '.html') as html_file:
+    assert pedigree_lib.D3_URL in html_file.read()
+
+def test_export_unknown_format(family, base_filename):
+  with pytest.raises(ValueError):
+    exporters.export_family(family, base_filename, ['json', 'bmp'])
+  assert not os.path.exists(base_filename + '.json')
+
+def test_cleanup_files(family, base_filename):
+  exporters.export_family(family, base_filename, ['json', 'ged'])
+  pedigree_lib.cleanup_files(None, base_filename)
+  assert not os.path.exists(base_filename + '.json')
+  assert not os.path.exists(base_filename + '.ged')
+
+def test_stitched_svg(tmpdir):
+  svg_filenames = []
+  for number, height in enumerate([50, 70]):
+    svg_filename = str(tmpdir.join('{}.svg'.format(number)))
+    with open(svg_filename, 'w') as svg_file:
+      svg_file.write('<?xml version="1.0"?>\n<!-- dot -->\n'
+          '<svg width="{0}pt" height="{1}pt"\n'
+          ' viewBox="0.00 0.00 {0}.00 {1}.00">\n'
+          '<g id="graph0"><title>part</title></g>\n</svg>\n'.format(
+              60 + number, height))
+    svg_filenames.append(svg_filename)
+  lines = list(exporters.stitched_svg_generator(svg_filenames))
+  assert 'width="61pt" height="120pt"' in lines[1]
+  assert lines[2] == '<svg x="0" y="0" width="60" height="50"' \
+      ' viewBox="0.00 0.00 60.00 50.00">'
+  assert lines[3] == '<g id="c1_graph0"><title>part</title></g>'
+  assert lines[5].startswith('<svg x="0" y="50" width="61" height="70"')
+  assert lines[-1] == '</svg>'
+
+def test_index_page(family):
+  parts = family.components()
+  lines = list(exporters.index_page_generator(parts,
+      ['/out/tree.1', '/out/tree.2', '/out/tree.3', '/out/tree.4'],
+      ['svg', 'png']))
+  assert '  <li>3 people (f, g, h): <a href="tree.3.svg">svg</a>' \
+      ' <a href="tree.3.png">png</a></li>' in lines
+
+@pytest.fixture
+def slow_dot(tmpdir, monkeypatch):
+  """A `dot` on the PATH that takes forever with -Kdot"""
+  bin_dir = tmpdir.mkdir('bin')
+  dot = bin_dir.join('dot')
+  dot.write('#!/bin/sh\n'
+      'for argument; do case $argument in\n'
+      '  -K*) engine=${argument#-K};;\n'
+      '  -T*) formats="$formats ${argument#-T}";;\n'
+      '  -O) ;;\n'
+      '  *) input=$argument;;\n'
+      'esac; done\n'
+      'if [ "$engine" = dot ]; then sleep 30; fi\n'
+      'for format in $formats; do echo "$engine" > "$input.$format"; done\n')
+  dot.chmod(0755)
+  monkeypatch.setenv('PATH', '{}:{}'.format(bin_dir, os.environ['PATH']))
+
+def test_choose_engine(family, monkeypatch):
+  assert exporters.choose_engine(family) == 'dot'
+  assert exporters.choose_engine(family, 'twopi') == 'twopi'
+  monkeypatch.setattr(exporters, 'DOT_LIMIT', 5)
+  assert exporters.choose_engine(family) == 'sfdp'
+  with pytest.raises(ValueError):
+    exporters.choose_engine(family, 'circo')
+  with pytest.raises(ValueError):
+    exporters.export_family(family, 'unused', ['svg'], engine='circo')
+
+def test_engine_timeout(family, base_filename, slow_dot, monkeypatch,
+    capsys):
+  monkeypatch.setattr(exporters, 'HEARTBEAT_INTERVAL', 0.2)
+  exporters.export_family(family, base_filename, ['svg'], engine='neato')
+  with open(base_filename + '.svg') as svg_file:
+    assert svg_file.read() == "neato\n"
+
+  started = time.time()
+  exporters.export_family(family, base_filename, ['svg', 'png'],
+      timeout=1)
+  assert time.time() - started < 10
+  for extension in 'svg', 'png':
+    with open('{}.{}'.format(base_filename, extension)) as output_file:
+      assert output_file.read() == "sfdp\n"
+  assert not os.path.exists(base_filename + '.dot.svg')
+  assert "Still drawing family_tree.dot.svg, family_tree.dot.png with dot" \
+      in capsys.readouterr()[1]
+
+def test_render_split_parts(family, base_filename, slow_dot):
+  exporters.export_family(family, base_filename, ['svg'],
+      split_components=True, engine='neato')
+  for number in range(1, len(family.components()) + 1):
+    with open('{}.{}.svg'.format(base_filename, number)) as svg_file:
+      assert svg_file.read() == "neato\n"
+    assert not os.path.exists('{}.{}.dot'.format(base_filename, number))
+  assert os.path.exists(base_filename + '.index.html')
+
+@pytest.mark.parametrize('names', ['anonymous', 'initials'])
+def test_split_parts_keep_view_names(base_filename, tmpdir, slow_dot,
+    names):
+  family = pedigree_lib.load_family(os.path.join(sys.prefix,
+      'examples/example.yaml'))
+  view = views.FamilyView(family, names=names)
+  parts = view.components()
+  assert len(parts) == len(family.components())
+  assert all(isinstance(part, views.FamilyView) for part in parts)
+  exporters.export_family(view, base_filename, ['svg', 'dot'],
+      split_components=True, engine='neato')
+  outputs = [output for output in tmpdir.listdir()
+      if output.basename.startswith('family_tree.')]
+  assert tmpdir.join('family_tree.1.dot') in outputs
+  assert tmpdir.join('family_tree.index.html') in outputs
+  text = "\n".join(output.read() for output in outputs)
+  for name in family.names():
+    assert name not in text
@@ -0,0 +1,158 @@
+from pedigree import pedigree_lib
+from pedigree import gedcom
+from pedigree import exporters
+import pytest
+import datetime
+import sys
+import os
+
+@pytest.fixture
+def example2_yaml_path():
+  return os.path.join(sys.prefix, 'examples/example2.yaml')
+
+@pytest.fixture
+def gedcom_lines():
+  return """\xef\xbb\xbf0 HEAD
+1 CHAR UTF-8
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+1 CHIL @I4@
+1 MARR
+2 DATE 1 JAN 1900
+0 @I1@ INDI
+1 NAME Fred /Flintstone/
+1 SEX M
+1 NOTE Lives in
+2 CONT Bedrock
+0 @I2@ INDI
+1 NAME Wilma /Slaghoople/
+1 NOTE @N1@
+0 @I3@ INDI
+1 NAME Pebbles /Flintstone/
+1 SEX F
+1 BIRT
+2 PLAC Bedrock
+2 DATE 22 FEB 1963
+0 @I4@ INDI
+1 NAME Fred /Flintstone/
+1 SEX M
+0 @N1@ NOTE Shared note
+0 TRLR
+""".splitlines(True)
+
+def person(name, gender="female"):
+  return pedigree_lib.Person(name=name, gender=gender)
+
+
+def test_parse_line():
+  assert gedcom.parse_line("0 @I1@ INDI\r\n") == (0, '@I1@', 'INDI', '')
+  assert gedcom.parse_line("1 NAME Fred /Flint/") == \
+      (1, None, 'NAME', 'Fred /Flint/')
+  assert gedcom.parse_line("") is None
+
+def test_read_gedcom(gedcom_lines):
+  family = gedcom.read_gedcom(gedcom_lines)
+  fred = family.name_to_person('Fred Flintstone')
+  wilma = family.name_to_person('Wilma Slaghoople')
+  junior = family.name_to_person('Fred Flintstone (2)')
+  pebbles = family.name_to_person('Pebbles Flintstone')
+
+  # Wilma has no SEX line, but is a WIFE
+  assert wilma.gender == "female"
+  assert sorted(family.children(fred)) == [junior, pebbles]
+  assert family.mother(junior) == wilma
+  assert family.all_spouses(fred) == [wilma]
+  assert family.all_spouses(wilma) == [fred]
+  assert family.notes[fred] == ["Lives in\nBedrock"]
+  assert wilma not in family.notes
+  assert (pebbles.born, pebbles.died) == ("22 FEB 1963", None)
+
+def test_read_gedcom_into_sqlite(gedcom_lines, tmpdir):
+  from pedigree.sqlite_family import SqliteFamily
+  family = SqliteFamily(str(tmpdir.join('family.sqlite')))
+  gedcom.read_gedcom(gedcom_lines, family)
+  family.commit()
+  family.close()
+
+  # Wilma's gender comes from her role in the FAM, read before her
+  family = SqliteFamily(str(tmpdir.join('family.sqlite')))
+  wilma = family.name_to_person('Wilma Slaghoople')
+  assert wilma.gender == "female"
+  assert family.mother(family.name_to_person('Pebbles Flintstone')) == \
+      wilma
+  assert family.attribute(wilma, 'gender') == "female"
+  family.close()
+
+def test_read_gedcom_into_existing(gedcom_lines):
+  family = pedigree_lib.Family()
+  family.add_person(person('Fred Flintstone', 'male'))
+  gedcom.read_gedcom(gedcom_lines, family)
+  assert sorted(family.names()) == ['Fred Flintstone',
+      'Fred Flintstone (2)', 'Fred Flintstone (3)',
+      'Pebbles Flintstone', 'Wilma Slaghoople']
+
+def test_gedcom_round_trip(example2_yaml_path):
+  with open(example2_yaml_path) as input_file:
+    family = pedigree_lib.yaml_to_family(input_file)
+  lines = list(gedcom.gedcom_generator(family))
+  assert lines[0] == "0 HEAD"
+  assert lines[-1] == "0 TRLR"
+  read = gedcom.read_gedcom(lines)
+  assert read == family
+  assert read.notes[read.name_to_person('a')] == \
+      ["This guy is named a"]
+
+def test_import_export(example2_yaml_path, tmpdir):
+  gedcom_filename = str(tmpdir.join('example2.ged'))
+  yaml_filename = str(tmpdir.join('imported.yaml'))
+  db_filename = str(tmpdir.join('imported.sqlite'))
+  pedigree_lib.export_gedcom(example2_yaml_path, gedcom_filename)
+  pedigree_lib.create_blank_yaml(yaml_filename)
+  pedigree_lib.import_gedcom(gedcom_filename, yaml_filename)
+  pedigree_lib.import_gedcom(gedcom_filename, db_filename)
+  original = pedigree_lib.load_family(example2_yaml_path)
+  assert pedigree_lib.load_family(yaml_filename) == original
+  assert pedigree_lib.load_family(db_filename) == original
+
+def test_gedcom_dates():
+  family = pedigree_lib.Family()
+  family.add_person(pedigree_lib.Person('Fred', 'male',
+      born=datetime.date(1930, 3, 2), died=1990))
+  lines = list(gedcom.gedcom_generator(family))
+  assert lines[lines.index("1 BIRT") + 1] == "2 DATE 2 MAR 1930"
+  assert lines[lines.index("1 DEAT") + 1] == "2 DATE 1990"
+  fred = gedcom.read_gedcom(lines).name_to_person('Fred')
+  assert (fred.born, fred.died) == ("2 MAR 1930", "1990")
+
+def test_gedcom_unicode(tmpdir):
+  zoe = pedigree_lib.Person(u'Zo\xeb Br\xfbl\xe9', 'female')
+  family = pedigree_lib.Family()
+  family.add_child(person(u'\u0410\u043d\u043d\u0430'), zoe)
+  family.add_note(zoe, u"N\xe9e \u2014 in\nK\xf6ln")
+  yaml_filename = str(tmpdir.join('family.yaml'))
+  gedcom_filename = str(tmpdir.join('family.ged'))
+  imported_filename = str(tmpdir.join('imported.yaml'))
+  pedigree_lib.save_family(family, yaml_filename)
+  pedigree_lib.export_gedcom(yaml_filename, gedcom_filename)
+  with open(gedcom_filename) as gedcom_file:
+    assert "1 NAME Zo\xc3\xab Br\xc3\xbbl\xc3\xa9\n" in gedcom_file
+  pedigree_lib.create_blank_yaml(imported_filename)
+  pedigree_lib.import_gedcom(gedcom_filename, imported_filename)
+  imported = pedigree_lib.load_family(imported_filename)
+  assert imported == family
+  assert imported.notes[zoe] == [u"N\xe9e \u2014 in\nK\xf6ln"]
+  with open(imported_filename) as yaml_file:
+    assert "!!python" not in yaml_file.read()
+
+  exporters.export_family(family, str(tmpdir.join('exported')), ['ged'])
+  with open(str(tmpdir.join('exported.ged'))) as gedcom_file:
+    assert gedcom.read_gedcom(gedcom_file) == family
+
+def test_gedcom_charset(gedcom_lines):
+  lines = ["0 HEAD\n", "1 CHAR ANSI\n", "0 @I1@ INDI\n",
+      "1 NAME Zo\xeb /Br\xfbl\xe9/\n", "1 SEX F\n", "0 TRLR\n"]
+  family = gedcom.read_gedcom(lines)
+  assert family.names() == [u'Zo\xeb Br\xfbl\xe9']
+  assert isinstance(gedcom.read_gedcom(gedcom_lines).names()[0], str)
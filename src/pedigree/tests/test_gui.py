@@ -0,0 +1,63 @@
+from pedigree import pedigree_lib
+from pedigree import gui
+import easygui
+import pytest
+import time
+import os
+
+@pytest.fixture
+def opened(monkeypatch):
+  """Charts the browser is asked to open, without one"""
+  opened = []
+  monkeypatch.setattr(gui.webbrowser, 'open', opened.append)
+  monkeypatch.setattr(gui, '_last_opened', None)
+  return opened
+
+
+def test_temp_dir_waits_for_browser(opened, monkeypatch):
+  monkeypatch.setattr(gui, 'BROWSER_LOAD_TIME', 0.5)
+  family = pedigree_lib.Family([pedigree_lib.Person('a', 'male')])
+  gui.show_temp_floating_chart(family)
+  chart_dir = gui.temp_dir()
+  assert len(opened) == 1 and os.listdir(chart_dir)
+  started = time.time()
+  gui.remove_temp_dir()
+  assert time.time() - started >= 0.3
+  assert not os.path.exists(chart_dir)
+
+def test_interact_cleans_up_when_interrupted(opened, monkeypatch, tmpdir):
+  monkeypatch.setattr(gui, 'BROWSER_LOAD_TIME', 0)
+  chart_dir = gui.temp_dir()
+  rendered = []
+  def choicebox(*args):
+    if rendered:
+      raise KeyboardInterrupt()
+    rendered.append(True)
+    return "l. See a floating chart in the browser"
+  monkeypatch.setattr(easygui, 'choicebox', choicebox)
+  yaml_filename = str(tmpdir.join('family.yaml'))
+  pedigree_lib.create_blank_yaml(yaml_filename)
+  with pytest.raises(KeyboardInterrupt):
+    gui.interact(yaml_filename)
+  # The chart asked for was still drawn before the charts went
+  assert len(opened) == 1
+  assert not os.path.exists(chart_dir)
+
+@pytest.mark.parametrize('extension', ['yaml', 'sqlite'])
+def test_cancelled_notes_search(monkeypatch, tmpdir, extension):
+  moves = ["t. Find a person by name or notes",
+      "s. Delete a note from a person", "q. Quit"]
+  # Every other question is cancelled
+  monkeypatch.setattr(easygui, 'choicebox', lambda message, *args:
+      moves.pop(0) if message == "What would you like to do?" else None)
+  monkeypatch.setattr(easygui, 'enterbox', lambda *args: None)
+  filename = str(tmpdir.join('family.' + extension))
+  if extension == 'yaml':
+    pedigree_lib.create_blank_yaml(filename)
+  family = pedigree_lib.load_family(filename)
+  a = pedigree_lib.Person('a', 'male')
+  family.add_person(a)
+  family.add_note(a, "A note")
+  gui.edit_family(family, filename, None)
+  assert not moves
+  assert family.notes[a] == ["A note"]
@@ -2,6 +2,8 @@ from pedigree import pedigree_lib
 import pytest
 import networkx as nx
 import copy
+import pickle
+import datetime
 import sys
 import os
 
@@ -47,7 +49,7 @@ def persons(persons_dict):
 
 @pytest.fixture
 def p():
-  p = pedigree_lib.Person(name='p', gender='female')
+  return pedigree_lib.Person(name='p', gender='female')
 
 @pytest.fixture
 def family(persons_dict):
@@ -334,6 +336,32 @@ def test_family_couples(family, persons_dict, couples):
   assert sorted(family.couples()) == sorted(couples)
 
 
+def test_family_siblings(family, persons_dict, p):
+  a, b, c, f, i, j = [persons_dict[name] for name in 'abcfij']
+  family.add_child(a, p)
+  family.add_child(i, p)
+  assert family.full_siblings(c) == [p]
+  assert family.half_siblings(c, "paternal") == [b]
+  assert family.half_siblings(c, "maternal") == [j]
+  assert family.siblings(c) == [p, b, j]
+  # b's mother isn't known, so a's other children are half siblings
+  assert family.full_siblings(b) == []
+  assert sorted(family.half_siblings(b)) == [c, p]
+  with pytest.raises(ValueError):
+    family.half_siblings(b, "both")
+
+  # Through the spouse of a parent, whichever way round they're listed
+  assert family.step_siblings(c) == []
+  family.add_spouse(f, a)
+  assert family.partners(a) == [f]
+  assert sorted(family.step_siblings(c)) == \
+      [persons_dict['g'], persons_dict['h']]
+  assert sorted(family.step_siblings(persons_dict['g'])) == [b, c, p]
+
+  lines = list(pedigree_lib.dot_file_generator(family))
+  uids = sorted([family.uid(c), family.uid(p)])
+  assert '  "{}" -> "{}" [style="invis"];'.format(*uids) in lines
+
 def test_family_all_spouses(family, persons, persons_dict):
   assert family.all_spouses(persons_dict['a']) == []
   assert family.all_spouses(persons_dict['b']) == []
@@ -382,10 +410,44 @@ def test_family_change_name(family, persons_dict, names):
   assert family != new_family
   assert family.names() != new_names
 
-  family.change_name(persons_dict['c'], 'boo')
+  assert family.change_name(persons_dict['c'], 'boo') == newly_named
 
   assert family == new_family
   assert set(family.names()) == set(new_names)
+  assert persons_dict['c'].name == 'c'
+  with pytest.raises(ValueError):
+    family.change_name(newly_named, 'b')
+
+def test_family_change_gender(family, persons_dict):
+  a = persons_dict['a']
+  changed = family.change_gender(a, 'female')
+  assert changed.gender is pedigree_lib.FEMALE
+  assert a.gender is pedigree_lib.MALE
+  assert family.name_to_person('a').gender is pedigree_lib.FEMALE
+  assert sorted(family.children(changed)) == \
+      [persons_dict['b'], persons_dict['c']]
+  assert family.notes[changed] == ["This guy is named a"]
+  assert family.select('gender == "female"').count(changed) == 1
+
+
+def test_person():
+  a = pedigree_lib.Person(name='a', gender='male')
+  also_a = pedigree_lib.Person(name=''.join(['a']), gender='male')
+  assert a == also_a and hash(a) == hash(also_a)
+  assert a.name is also_a.name
+  assert a != pedigree_lib.Person(name='b', gender='male')
+  assert a.gender is pedigree_lib.MALE
+  assert a.gender == "male"
+  with pytest.raises(AttributeError):
+    a.name = 'b'
+  with pytest.raises(AttributeError):
+    a.nickname = 'b'
+  with pytest.raises(AttributeError):
+    a.gender = "female"
+
+  unpickled = pickle.loads(pickle.dumps(a, pickle.HIGHEST_PROTOCOL))
+  assert unpickled == a
+  assert unpickled.gender is pedigree_lib.MALE
 
 
 def test_family_name_to_person(family, persons_dict, names):
@@ -425,6 +487,22 @@ def test_family_to_yaml(family, example2_yaml_path):
   assert pedigree_lib.yaml_to_family(left_side) == \
       pedigree_lib.yaml_to_family(right_side)
 
+def test_dates_in_yaml():
+  text = ("people:\n  - a: {gender: male, born: 1900, died: 1950-02-03}\n"
+      "  - b: female\n---\nfather:\n---\nmother:\n---\nspouse:\n"
+      "---\nnotes:\n")
+  family = pedigree_lib.yaml_to_family(text)
+  a = family.name_to_person('a')
+  assert (a.gender, a.born, a.died) == \
+      ("male", 1900, datetime.date(1950, 2, 3))
+  assert family.name_to_person('b').born is None
+  written = pedigree_lib.family_to_yaml(family)
+  assert "- b: female" in written
+  again = pedigree_lib.yaml_to_family(written).name_to_person('a')
+  assert (again.born, again.died) == (a.born, a.died)
+  renamed = family.change_name(a, 'aa')
+  assert (renamed.born, renamed.died) == (a.born, a.died)
+
 @pytest.mark.xfail()
 def test_d3_html_page_generator(example_yaml_path, example_html_path):
   with open(example_yaml_path) as input_file:
@@ -449,3 +527,424 @@ def test_dot_file_generator(example2_yaml_path, example2_dot_path):
       received = "\n".join(pedigree_lib.dot_file_generator(
           pedigree_lib.yaml_to_family(input_file))) + "\n"
       assert(received == output_file.read())
+
+@pytest.fixture
+def shard_dir(tmpdir):
+  """
+  example2.yaml split in two, with relations in each shard that
+  refer to people listed only in the other.
+  """
+  tmpdir.join('1.yaml').write(
+      "people:\n  - a: male\n  - b: female\n  - c: female\n"
+      "  - d: male\n  - e: female\n  - f: female\n  - g: female\n"
+      "---\nfather:\n  a: [c, b]\n  d: [k, e]\n"
+      "---\nmother:\n  f: [h, g]\n"
+      "---\nspouse:\n  n: [o]\n"
+      "---\nnotes:\n  a: [This guy is named a]\n")
+  tmpdir.join('2.yaml').write(
+      "people:\n  - a: male\n  - h: female\n  - i: female\n"
+      "  - j: female\n  - k: male\n  - l: male\n  - m: female\n"
+      "  - n: female\n  - o: male\n"
+      "---\nfather:\n  a: [b]\n"
+      "---\nmother:\n  i: [c, j]\n"
+      "---\nspouse:\n  k: [m, l]\n  m: [k]\n  l: [k]\n  o: [n]\n"
+      "---\nnotes:\n  d: [This guy is named d]\n")
+  return tmpdir
+
+def test_shards_to_family(family, shard_dir):
+  loaded = pedigree_lib.load_family(str(shard_dir))
+  assert loaded == family
+  assert dict((person.name, notes)
+      for person, notes in loaded.notes.items()) == \
+          {'a': ["This guy is named a"], 'd': ["This guy is named d"]}
+
+def test_shard_manifest(family, shard_dir):
+  shard_dir.join('manifest.yaml').write(
+      "# Both halves\nshards:\n  - 2.yaml\n  - 1.yaml\n")
+  manifest = str(shard_dir.join('manifest.yaml'))
+  assert pedigree_lib.is_shard_set(manifest)
+  assert pedigree_lib.shard_paths(manifest) == \
+      [str(shard_dir.join('2.yaml')), str(shard_dir.join('1.yaml'))]
+  assert pedigree_lib.load_family(manifest) == family
+  assert pedigree_lib.shard_paths(str(shard_dir)) == \
+      [str(shard_dir.join('1.yaml')), str(shard_dir.join('2.yaml'))]
+  assert pedigree_lib.load_family(str(shard_dir)) == family
+
+def test_shards_reparsed_only_when_changed(shard_dir, monkeypatch):
+  parsed = []
+  parse_shard = pedigree_lib._parse_shard
+  def counting_parse_shard(path):
+    parsed.append(os.path.basename(path))
+    return parse_shard(path)
+  monkeypatch.setattr(pedigree_lib, '_parse_shard', counting_parse_shard)
+  monkeypatch.setattr(pedigree_lib, '_shard_cache', {})
+  paths = pedigree_lib.shard_paths(str(shard_dir))
+  cache_dir = str(shard_dir.join('cache'))
+
+  pedigree_lib.shards_to_family(paths, cache_dir, processes=1)
+  assert sorted(parsed) == ['1.yaml', '2.yaml']
+
+  pedigree_lib.shards_to_family(paths, cache_dir, processes=1)
+  assert sorted(parsed) == ['1.yaml', '2.yaml']
+
+  # A fresh process only has the pickles to go on
+  monkeypatch.setattr(pedigree_lib, '_shard_cache', {})
+  shard_dir.join('2.yaml').write(
+      shard_dir.join('2.yaml').read() + "  n: [o]\n")
+  family = pedigree_lib.shards_to_family(paths, cache_dir,
+      processes=1)
+  assert sorted(parsed) == ['1.yaml', '2.yaml', '2.yaml']
+  assert family.notes[family.name_to_person('n')] == ['o']
+
+def test_merge_sections_gender_conflict():
+  with pytest.raises(pedigree_lib.GenderError):
+    pedigree_lib.merge_sections([
+      ([{'a': 'male'}], {}, {}, {}, {}),
+      ([{'a': 'female'}], {}, {}, {}, {}),
+    ])
+
+def test_merge_sections_conflicts():
+  first = ([{'a': 'male'}, {'b': 'male'}, {'m': 'female'}],
+      {'a': ['b']}, {'m': ['b']}, {}, {'b': ['one']})
+  second = ([{'bee': 'male'}, {'m': 'male'}, {'n': 'female'}],
+      {}, {'n': ['bee']}, {'bee': ['zed']}, {'bee': ['two']})
+  with pytest.raises(pedigree_lib.GenderError):
+    pedigree_lib.merge_sections([first, second])
+
+  conflicts = []
+  people, fathers, mothers, spouses, notes = \
+      pedigree_lib.merge_sections([first, second], {'bee': 'b'}, conflicts)
+  assert people == [{'a': 'male'}, {'b': 'male'}, {'m': 'female'},
+      {'n': 'female'}]
+  assert fathers == {'a': ['b']}
+  assert mothers['m'] == ['b'] and not mothers['n']
+  assert not spouses['b']
+  assert notes == {'b': ['one', 'two']}
+  assert conflicts == ["m is listed as both female and male.",
+      "b's mother is given as both m and n.",
+      "zed isn't listed in the people section."]
+
+def test_merge_sections_parent_genders():
+  first = ([{'c': 'male'}, {'m': 'female'}, {'w': 'female'}],
+      {}, {'m': ['c']}, {}, {})
+  second = ([{'f': 'male'}, {'x': {'born': 1900}}, {'d': 'female'}],
+      {'w': ['c'], 'x': ['d'], 'f': ['c']}, {}, {}, {})
+  with pytest.raises(pedigree_lib.GenderError):
+    pedigree_lib.merge_sections([first, second])
+
+  conflicts = []
+  family = pedigree_lib.sections_to_family(
+      *pedigree_lib.merge_sections([first, second], conflicts=conflicts))
+  assert sorted(conflicts) == [
+      "c's father is given as w, who is listed as female.",
+      "d's father is given as x, who is listed as neither male nor female."]
+  c = family.name_to_person('c')
+  assert family.mother(c) == family.name_to_person('m')
+  assert family.father(c) == family.name_to_person('f')
+  assert family.father(family.name_to_person('d')) is None
+
+def test_merge_sections_dates():
+  first = ([{'a': {'gender': 'male', 'born': 1900}}, {'b': 'female'}],
+      {}, {}, {}, {})
+  second = ([{'a': {'gender': 'male', 'born': 1901, 'died': 1960}},
+      {'b': {'gender': 'female', 'died': 1970, 'place': 'X'}}],
+      {}, {}, {}, {})
+  with pytest.raises(pedigree_lib.GenealogicalError):
+    pedigree_lib.merge_sections([first, second])
+  conflicts = []
+  people = pedigree_lib.merge_sections([first, second],
+      conflicts=conflicts)[0]
+  assert people == [{'a': {'gender': 'male', 'born': 1900, 'died': 1960}},
+      {'b': {'gender': 'female', 'died': 1970, 'place': 'X'}}]
+  assert conflicts == ["a is listed as born both 1900 and 1901."]
+
+def test_merge_files(tmpdir, example2_yaml_path, family):
+  other = tmpdir.join('other.yaml')
+  other.write("people:\n  - bee: female\n  - z: male\n---\n"
+      "father:\n  z: [bee]\n---\nmother:\n---\nspouse:\n---\n"
+      "notes:\n  bee: [Also b]\n")
+  aliases = tmpdir.join('aliases.yaml')
+  aliases.write("bee: b\n")
+  output = str(tmpdir.join('merged.yaml'))
+  conflicts = pedigree_lib.merge_files([example2_yaml_path, str(other)],
+      output, str(aliases))
+  assert conflicts == ["b's father is given as both a and z."]
+  merged = pedigree_lib.load_family(output)
+  assert merged.number_of_persons() == family.number_of_persons() + 1
+  b = merged.name_to_person('b')
+  assert merged.father(b).name == 'a'
+  assert merged.notes[b] == ['Also b']
+
+@pytest.fixture
+def example2_text(example2_yaml_path):
+  with open(example2_yaml_path) as input_file:
+    return input_file.read()
+
+def test_notes_parsed_lazily(example2_text, monkeypatch):
+  family = pedigree_lib.yaml_to_family(example2_text)
+  assert not family.notes.loaded()
+
+  a = family.name_to_person('a')
+  b = family.name_to_person('b')
+  d = family.name_to_person('d')
+  assert a in family.notes
+  assert b not in family.notes
+  assert sorted(family.people_with_notes()) == [a, d]
+
+  # Only a's entry gets parsed
+  parsed = []
+  safe_load = pedigree_lib.yaml.safe_load
+  def recording_safe_load(text):
+    parsed.append(text)
+    return safe_load(text)
+  monkeypatch.setattr(pedigree_lib.yaml, 'safe_load', recording_safe_load)
+  assert family.notes[a] == ["This guy is named a"]
+  assert parsed == ["a:\n  - This guy is named a\n"]
+  assert family.notes.get(b) is None
+  assert not family.notes.loaded()
+
+  # Editing relations and saving leaves the notes as they were
+  family.add_child(a, pedigree_lib.Person(name='p', gender='male'))
+  saved = pedigree_lib.family_to_yaml(family)
+  assert not family.notes.loaded()
+  assert saved.endswith(example2_text[example2_text.index('notes:'):])
+  assert pedigree_lib.yaml_to_family(saved) == family
+
+def test_notes_loaded_when_changed(example2_text):
+  family = pedigree_lib.yaml_to_family(example2_text)
+  a = family.name_to_person('a')
+  d = family.name_to_person('d')
+  dee = family.change_name(d, 'dee')
+  assert family.notes.loaded()
+  assert family.notes[dee] == ["This guy is named d"]
+  assert d not in family.notes
+
+  family = pedigree_lib.yaml_to_family(example2_text)
+  family.add_note(family.name_to_person('b'), "b's note")
+  assert family.notes.loaded()
+  reread = pedigree_lib.yaml_to_family(
+      pedigree_lib.family_to_yaml(family))
+  assert reread.notes[reread.name_to_person('b')] == ["b's note"]
+  assert reread.notes[reread.name_to_person('a')] == \
+      ["This guy is named a"]
+
+def test_notes_in_flow_style():
+  family = pedigree_lib.yaml_to_family(
+      "people:\n  - a: male\n---\nfather:\n---\nmother:\n---\n"
+      "spouse:\n---\nnotes: {a: [one, two]}\n")
+  a = family.name_to_person('a')
+  assert family.notes[a] == ['one', 'two']
+  assert dict(family.notes) == {a: ['one', 'two']}
+
+def test_family_search(family, persons_dict):
+  a = family.change_name(persons_dict['a'], 'Fred Flintstone')
+  b = family.change_name(persons_dict['b'], 'Pebbles Flintstone')
+  c = family.change_name(persons_dict['c'], 'Wilma Flint')
+  assert family.search('flint') == [a, b, c]
+  assert family.search('wil') == [c]
+  assert family.search('flintstone') == [a, b]
+  assert family.search('peb flint') == [b]
+  assert family.search('Fred Flintstone', k=1) == [a]
+  assert family.search('named') == [a, persons_dict['d']]
+  assert family.search('') == []
+
+  # The index built by the first search keeps up with changes
+  c = family.change_name(c, 'Wilma Slaghoople')
+  assert family.search('flint') == [a, b]
+  assert family.search('slag') == [c]
+  p = pedigree_lib.Person(name='Pearl Slaghoople', gender='female')
+  family.add_child(p, c)
+  assert family.search('slag') == [p, c]
+  family.add_note(persons_dict['e'], "Lives in Bedrock")
+  family.add_note(persons_dict['e'], "Likes bedrock")
+  assert family.search('bedrock') == [persons_dict['e']]
+  family.delete_note(persons_dict['e'], "Lives in Bedrock")
+  assert family.search('bedrock') == [persons_dict['e']]
+  family.delete_note(persons_dict['e'], "Likes bedrock")
+  assert family.search('bedrock') == []
+  family.delete_note(a, "This guy is named a")
+  assert family.search('named') == [persons_dict['d']]
+
+def test_family_snapshot(family, persons_dict):
+  snapshot = family.snapshot()
+  assert snapshot == family
+  assert snapshot.graph is family.graph
+
+  p = pedigree_lib.Person(name='p', gender='female')
+  family.add_child(persons_dict['a'], p)
+  family.change_name(persons_dict['b'], 'boo')
+  family.add_note(persons_dict['a'], "Another note")
+  assert snapshot.graph is not family.graph
+  assert sorted(snapshot.names()) == sorted(
+      ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l',
+       'm', 'n', 'o'])
+  assert sorted(snapshot.children(persons_dict['a'])) == \
+      [persons_dict['b'], persons_dict['c']]
+  assert snapshot.notes[persons_dict['a']] == ["This guy is named a"]
+
+  assert persons_dict['b'].name == 'b'
+  assert sorted(family.children(persons_dict['a'])) == \
+      [family.name_to_person('boo'), persons_dict['c'], p]
+  assert family.notes[persons_dict['a']] == \
+      ["This guy is named a", "Another note"]
+
+def test_family_memoized(family, persons_dict):
+  fathers = family.fathers()
+  couples = family.couples()
+  dot_lines = pedigree_lib.generated_lines(family,
+      pedigree_lib.dot_file_generator)
+  assert family.fathers() is fathers
+  assert family.couples() is couples
+  assert pedigree_lib.generated_lines(family,
+      pedigree_lib.dot_file_generator) is dot_lines
+  assert pedigree_lib.generated_lines(family,
+      pedigree_lib.dot_file_generator, True) is not dot_lines
+
+  # A snapshot shares what's been worked out until either changes
+  snapshot = family.snapshot()
+  assert snapshot.couples() is couples
+  version = family.version
+  p = pedigree_lib.Person(name='p', gender='male')
+  family.add_child(persons_dict['a'], p)
+  family.add_note(p, "A note")
+  assert family.version == version + 2
+  assert snapshot.version == version
+  assert snapshot.fathers() is fathers
+  assert p in family.people_with_notes()
+  assert family.fathers() is not fathers
+  assert family.fathers() == fathers
+  assert 'p' in "\n".join(pedigree_lib.generated_lines(family,
+      pedigree_lib.dot_file_generator))
+  assert snapshot.people_with_notes() is not family.people_with_notes()
+  assert p not in snapshot.people_with_notes()
+
+  mothers = family.mothers()
+  family.add_full_sibling(p, pedigree_lib.Person(name='q', gender='male'))
+  assert family.name_to_person('q') in family.children(
+      family.name_to_person('a'))
+  assert len(family.mothers()) == len(mothers) + 1
+  family.change_name(p, 'r')
+  assert ['a', 'r'] not in [[one.name, two.name]
+      for one, two in family.couples()]
+
+  # Even notes set directly, and changed genders
+  with_notes = family.people_with_notes()
+  c = persons_dict['c']
+  family.notes[c] = ["Set directly"]
+  assert c in family.people_with_notes()
+  del family.notes[c]
+  assert family.people_with_notes() == with_notes
+  a = persons_dict['a']
+  assert with_notes[with_notes.index(a)].gender == "male"
+  family.change_gender(a, 'female')
+  with_notes = family.people_with_notes()
+  assert with_notes[with_notes.index(a)].gender == "female"
+
+def test_background_renderer(family, persons_dict):
+  import threading
+  started = threading.Event()
+  release = threading.Event()
+  rendered = []
+  def render(snapshot, label):
+    started.set()
+    release.wait()
+    rendered.append((label, sorted(snapshot.names())))
+
+  renderer = pedigree_lib.BackgroundRenderer()
+  renderer.submit(render, family, 'first')
+  started.wait()
+
+  # While 'first' renders, 'second' is replaced by 'third', which
+  # sees the family as it was when it was asked for
+  renderer.submit(render, family, 'second')
+  family.add_person(pedigree_lib.Person(name='p', gender='male'))
+  renderer.submit(render, family, 'third')
+  family.add_person(pedigree_lib.Person(name='q', gender='male'))
+  release.set()
+  renderer.close()
+  assert [label for label, names in rendered] == ['first', 'third']
+  assert 'p' in rendered[1][1]
+  assert 'q' not in rendered[1][1]
+
+def test_family_generations(family, persons_dict):
+  generations = family.generations()
+  assert sorted(generations) == sorted(family.names())
+  assert [generations[name] for name in 'adfibcekmln'] == \
+      [0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0]
+
+  # r marries u, whose father v is only an in-law
+  person = lambda name: pedigree_lib.Person(name=name, gender="male")
+  r, u, v = person('r'), person('u'), person('v')
+  family.add_child(persons_dict['k'], r)
+  family.add_child(v, u)
+  family.add_spouse(r, u)
+  generations = family.generations()
+  assert generations['r'] == generations['u'] == 2
+  assert generations['v'] == 1
+
+  # Someone can't be in the same generation as their grandchild
+  w = person('w')
+  family.add_child(r, w)
+  family.add_spouse(persons_dict['d'], w)
+  family.add_spouse(w, persons_dict['d'])
+  generations = family.generations()
+  assert [generations[name] for name in 'dkrw'] == [0, 1, 2, 3]
+  assert generations['m'] == generations['l'] == 1
+  assert generations['u'] == 2
+
+def test_family_generations_couples(example_yaml_path):
+  family = pedigree_lib.load_family(example_yaml_path)
+  generations = family.generations()
+  assert family.generations() is generations
+  row = lambda *names: set(generations[name] for name in names)
+  # Parents of a child together share a row, married or not
+  assert len(row('Frederick Joseph \\"Fred\\" Flintstone',
+      'Wilma Pebbles Slaghoople', 'Secret Ex-Wife', 'Barney Rubble',
+      'Betty Jean McBricker')) == 1
+  assert len(row('Bamm-Bamm Rubble', 'Pebbles Flintstone')) == 1
+  assert len(row('Ed Flintstone', 'Zeke Flintstone')) == 1
+  assert len(row('Chip Rubble', 'Roxy Rubble')) == 1
+
+  family.add_child(family.name_to_person('Pebbles Flintstone'),
+      pedigree_lib.Person(name='Pebbles Jr.', gender='female'))
+  assert family.generations() is not generations
+  assert family.generations()['Pebbles Jr.'] == \
+      generations['Pebbles Flintstone'] + 1
+
+def test_dot_file_ranks(family):
+  lines = list(pedigree_lib.dot_file_generator(family))
+  ranks = [line for line in lines if 'rank=same' in line]
+  assert len(ranks) == 2
+  assert '"{}";'.format(pedigree_lib.name_to_uid('k')) in ranks[1]
+  assert '"{}";'.format(pedigree_lib.name_to_uid('m')) in ranks[1]
+
+def test_family_summary(family, persons_dict):
+  assert family.summary() == {
+    'persons': 15,
+    'missing_parents': 14,
+    'no_parents': 8,
+    'generations': 2,
+    'widest_generation': (0, 8),
+    'couples': 4,
+    'children_per_couple': 0.25,
+    'remarriages': 1,
+    'components': 4,
+  }
+  family.add_child(persons_dict['b'], persons_dict['o'])
+  family.add_child(persons_dict['d'], persons_dict['o'])
+  summary = family.summary()
+  assert summary['generations'] == 3
+  assert summary['couples'] == 5
+  assert summary['remarriages'] == 1
+  assert summary['components'] == 2
+  assert pedigree_lib.Family().summary()['widest_generation'] is None
+
+def test_family_components(family, persons_dict):
+  parts = family.components()
+  assert [sorted(part.names()) for part in parts] == [
+      list('abcij'), list('deklm'), list('fgh'), list('no')]
+  assert parts[0].children(persons_dict['a']) == \
+      family.children(persons_dict['a'])
+  assert parts[0].notes[persons_dict['a']] == ["This guy is named a"]
+  assert [sorted(part.names()) for part in family.components(4)] == [
+      list('abcij'), list('deklm'), list('fghno')]
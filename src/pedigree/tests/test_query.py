@@ -0,0 +1,72 @@
+from pedigree import pedigree_lib
+from pedigree import query
+from StringIO import StringIO
+import pytest
+import json
+import sys
+import os
+
+@pytest.fixture
+def example_yaml_path():
+  return os.path.join(sys.prefix, 'examples/example.yaml')
+
+@pytest.fixture
+def engine(example_yaml_path):
+  return query.QueryEngine(pedigree_lib.load_family(example_yaml_path))
+
+
+def test_queries(engine):
+  assert engine.parents_of('Ed Flintstone') == {
+      "father": "???", "mother": "????"}
+  assert engine.children_of('Ed Flintstone') == \
+      ['Frederick Joseph \\"Fred\\" Flintstone']
+  fred = 'Frederick Joseph \\"Fred\\" Flintstone'
+  assert engine.spouses_of(fred) == ['Secret Ex-Wife']
+  assert engine.siblings_of('Ed Flintstone') == {"full": ['Zeke Flintstone'],
+      "paternal_half": [], "maternal_half": [], "step": []}
+  ancestors = engine.ancestors_of('Pebbles Flintstone')
+  assert ancestors[:2] == ['Frederick Joseph \\"Fred\\" Flintstone',
+      'Wilma Pebbles Slaghoople']
+  assert ancestors[-2:] == ['???', '????']
+  assert 'Pebbles Flintstone' in engine.descendants_of('Ed Flintstone')
+  assert ['Ed Flintstone', 'Edna Hardrock Flintstone'] in engine.couples()
+  # Parents of a child together count as a couple, married or not
+  assert engine.couples(fred) == [[fred, 'Secret Ex-Wife'],
+      [fred, 'Wilma Pebbles Slaghoople']]
+  assert engine.relationship('Pebbles Flintstone',
+      'Ed Flintstone')['relationship'] == "grandfather"
+  assert engine.select('gender == "female" and birth_year < 1900') == []
+  assert 'Pebbles Flintstone' in engine.select('gender == "female"')
+  with pytest.raises(ValueError):
+    engine.children_of('Nobody')
+
+def test_serve(example_yaml_path):
+  queries = StringIO("\n".join([
+      '{"query": "children", "name": "Ed Flintstone", "id": 1}',
+      '',
+      '{"query": "relationship", "name": "Ed Flintstone",'
+      ' "other": "Zeke Flintstone", "id": "two"}',
+      '{"query": "relationship", "name": "Ed Flintstone"}',
+      '{"query": "cousins", "name": "Ed Flintstone"}',
+      'not json',
+      '{"query": "parents", "name": ["Ed Flintstone"], "id": 6}',
+      '{"query": "select", "where": 5}',
+      '{"query": "couples", "name": null}',
+      '{"query": "children", "name": "Ed Flintstone"}']) + "\n")
+  answers = StringIO()
+  pedigree_lib.answer_queries(example_yaml_path, queries, answers)
+  answers = [json.loads(line) for line in answers.getvalue().splitlines()]
+  assert len(answers) == 9
+  assert answers[0] == {"id": 1,
+      "result": ['Frederick Joseph \\"Fred\\" Flintstone']}
+  assert answers[1]["id"] == "two"
+  assert answers[1]["result"]["relationship"] == "brother"
+  assert answers[2] == {"error": "A relationship query needs a \"other\""}
+  assert "couples" in answers[3]["error"]
+  assert "error" in answers[4]
+  assert answers[5] == {"id": 6,
+      "error": "A parents query's \"name\" should be a string"}
+  assert answers[6] == {
+      "error": "A select query's \"where\" should be a string"}
+  assert "error" in answers[7]
+  assert answers[8] == {"result": answers[0]["result"]}
@@ -0,0 +1,99 @@
+from pedigree import pedigree_lib
+from pedigree import relate
+import pytest
+import json
+import sys
+import os
+
+@pytest.fixture
+def example_yaml_path():
+  return os.path.join(sys.prefix, 'examples/example.yaml')
+
+@pytest.fixture
+def family(example_yaml_path):
+  return pedigree_lib.load_family(example_yaml_path)
+
+def people(family, *names):
+  return [family.name_to_person(name) for name in names]
+
+
+def test_relationship_labels():
+  label = relate.relationship_label
+  assert label(0, 0) == "self"
+  assert label(1, 0, "male") == "father"
+  assert label(0, 1) == "child"
+  assert label(0, 5, "female") == "3x great-granddaughter"
+  assert label(1, 1, "female", half=True) == "half-sister"
+  assert label(3, 1, "male") == "great-uncle"
+  assert label(1, 2) == "niece or nephew"
+  assert label(2, 2) == "first cousin"
+  assert label(3, 2) == "first cousin once removed"
+  assert label(2, 4, half=True) == "half-first cousin twice removed"
+  assert label(4, 4) == "third cousin"
+
+def test_ancestor_index(family):
+  ed, zeke, roxy, bamm_bamm = people(family, 'Ed Flintstone',
+      'Zeke Flintstone', 'Roxy Rubble', 'Bamm-Bamm Rubble')
+  index = relate.AncestorIndex(family, [ed, zeke, roxy, bamm_bamm])
+  assert len(index.levels['Roxy Rubble']) == 5
+  up, other_up, bits = index.closest('Ed Flintstone', 'Zeke Flintstone')
+  assert (up, other_up) == (1, 1)
+  assert sorted(index.names_in(bits)) == ['???', '????']
+  assert index.closest('Roxy Rubble', 'Ed Flintstone')[:2] == (3, 0)
+  assert index.closest('Ed Flintstone', 'Bamm-Bamm Rubble') is None
+
+def test_half_relationships():
+  """
+  Al and Bo share only their father, each with his own mother on
+  record; Cy has the same father and no mother on record
+  """
+  person = lambda name, gender="male": pedigree_lib.Person(name, gender)
+  family = pedigree_lib.Family()
+  family.add_children(person('Dad'), [person('Al'), person('Bo'),
+      person('Cy')])
+  family.add_child(person('Ann', 'female'), person('Al'))
+  family.add_child(person('Bea', 'female'), person('Bo'))
+  family.add_child(person('Al'), person('Di', 'female'))
+  family.add_child(person('Bo'), person('Ed'))
+  family.add_child(person('Cy'), person('Fay', 'female'))
+  rows = relate.relationships(family,
+      people(family, 'Al', 'Bo', 'Cy', 'Di', 'Ed', 'Fay'))
+  found = dict(((row.person, row.other), row.relationship)
+      for row in rows)
+  assert found[('Al', 'Bo')] == "half-brother"
+  assert found[('Di', 'Ed')] == "half-first cousin"
+  assert found[('Al', 'Cy')] == "brother"
+  assert found[('Bo', 'Fay')] == "niece"
+  assert found[('Di', 'Fay')] == "first cousin"
+
+def test_relationships(family, example_yaml_path, tmpdir):
+  selected = people(family, 'Pebbles Flintstone', 'Ed Flintstone',
+      'Zeke Flintstone', 'Bamm-Bamm Rubble')
+  rows = list(relate.relationships(family, selected))
+  assert len(rows) == 6
+  found = dict(((row.person, row.other), row) for row in rows)
+  assert found[('Pebbles Flintstone', 'Ed Flintstone')].relationship == \
+      "grandfather"
+  assert found[('Pebbles Flintstone', 'Zeke Flintstone')].relationship == \
+      "great-uncle"
+  assert found[('Ed Flintstone', 'Zeke Flintstone')].relationship == \
+      "brother"
+  unrelated = found[('Ed Flintstone', 'Bamm-Bamm Rubble')]
+  assert unrelated.relationship == "unrelated"
+  assert unrelated.common_ancestors == []
+
+  people_file = tmpdir.join('people.txt')
+  people_file.write("# Reunion\nPebbles Flintstone\n\nEd Flintstone\n")
+  output = tmpdir.join('table.json')
+  pedigree_lib.relate_people(example_yaml_path, str(people_file),
+      str(output))
+  assert json.loads(output.read()) == [{
+    "person": "Pebbles Flintstone", "other": "Ed Flintstone",
+    "relationship": "grandfather", "common_ancestors": ["Ed Flintstone"],
+    "generations_up": 2, "other_generations_up": 0}]
+
+  output = tmpdir.join('table.csv')
+  pedigree_lib.relate_people(example_yaml_path, str(people_file),
+      str(output))
+  assert output.read().splitlines() == [",".join(relate.FIELDS),
+      "Pebbles Flintstone,Ed Flintstone,grandfather,Ed Flintstone,2,0"]
@@ -0,0 +1,238 @@
+from pedigree import pedigree_lib
+from pedigree import sqlite_family
+from pedigree import exporters
+import pytest
+import datetime
+import sqlite3
+import sys
+import os
+
+@pytest.fixture
+def example2_yaml_path():
+  return os.path.join(sys.prefix, 'examples/example2.yaml')
+
+@pytest.fixture
+def yaml_family(example2_yaml_path):
+  with open(example2_yaml_path) as input_file:
+    return pedigree_lib.yaml_to_family(input_file)
+
+@pytest.fixture
+def db_filename(tmpdir, example2_yaml_path):
+  db_filename = str(tmpdir.join('example2.sqlite'))
+  pedigree_lib.convert_family(example2_yaml_path, db_filename)
+  return db_filename
+
+@pytest.fixture
+def family(db_filename):
+  return pedigree_lib.load_family(db_filename)
+
+def person(name, gender="female"):
+  return pedigree_lib.Person(name=name, gender=gender)
+
+
+def test_load_sqlite(family, yaml_family):
+  assert isinstance(family, sqlite_family.SqliteFamily)
+  assert family == yaml_family
+  assert sorted(family.couples()) == sorted(yaml_family.couples())
+  assert family.generations() == yaml_family.generations()
+  assert family.summary() == yaml_family.summary()
+  assert family.notes[person('a')] == ["This guy is named a"]
+  assert person('b') not in family.notes
+  assert sorted(family.people_with_notes()) == \
+      [person('a'), person('d')]
+
+def test_indexes(db_filename):
+  connection = sqlite_family.connect(db_filename)
+  plan = " ".join(str(row) for row in connection.execute(
+      "EXPLAIN QUERY PLAN SELECT parent FROM relations"
+      " WHERE child = 'c' AND relation_type = 'father'"))
+  assert 'relations_by_child' in plan
+  plan = " ".join(str(row) for row in connection.execute(
+      "EXPLAIN QUERY PLAN SELECT child FROM relations"
+      " WHERE parent = 'a' AND relation_type = 'father'"))
+  assert 'relations_by_parent' in plan
+
+def test_sqlite_relations(family):
+  assert family.father(person('c')) == person('a')
+  assert family.mother(person('c')) == person('i')
+  assert family.mother(person('a')) is None
+  assert sorted(family.children(person('a'))) == \
+      [person('b'), person('c')]
+  assert sorted(family.all_spouses(person('k'))) == \
+      [person('l'), person('m')]
+  with pytest.raises(pedigree_lib.PersonExistsError):
+    family.children(person('zzz'))
+
+def test_sqlite_add_parents(family):
+  boo = person('boo', 'male')
+  with pytest.raises(pedigree_lib.GenealogicalError):
+    family.add_father(person('b'), boo)
+  with pytest.raises(pedigree_lib.GenealogicalError):
+    family.add_father(person('i'), person('i', 'male'))
+  with pytest.raises(pedigree_lib.GenderError):
+    family.add_mother(person('a'), boo)
+  fathers = family.fathers()
+  assert family.fathers() is fathers
+  family.add_father(person('j'), boo)
+  assert family.father(person('j')) == boo
+  assert sorted(family.fathers()) == \
+      [person('a', 'male'), boo, person('d', 'male')]
+
+  family.add_full_sibling(person('j'), person('p'))
+  assert sorted(family.children(boo)) == [person('j'), person('p')]
+  assert family.mother(person('p')) == person('i')
+  assert family.full_siblings(person('j')) == [person('p')]
+  assert family.half_siblings(person('c'), "maternal") == \
+      [person('j'), person('p')]
+  assert family.partners(person('l')) == [person('k')]
+  family.add_full_sibling(person('e'), person('q'))
+  assert family.mother(person('q')) == person('?')
+
+def test_sqlite_edits_need_commit(family, db_filename):
+  family.change_name(person('c'), 'boo')
+  family.add_note(person('a'), "Another note")
+  family.delete_note(person('d'), "This guy is named d")
+  assert family.father(person('boo')) == person('a')
+  assert family.notes[person('a')] == \
+      ["This guy is named a", "Another note"]
+  assert person('d') not in family.notes
+
+  assert pedigree_lib.load_family(db_filename).name_to_person('boo') \
+      is None
+  pedigree_lib.save_family(family, db_filename)
+  reopened = pedigree_lib.load_family(db_filename)
+  assert reopened.mother(person('boo')) == person('i')
+  assert reopened.notes[person('a')] == \
+      ["This guy is named a", "Another note"]
+
+def test_sqlite_snapshot_unsaved(family, tmpdir):
+  family.add_person(person('new'))
+  family.add_note(person('new'), "Not saved yet")
+  snapshot = family.snapshot()
+  family.add_person(person('newer'))
+  assert snapshot.number_of_persons() == family.number_of_persons() - 1
+  assert snapshot.notes[person('new')] == ["Not saved yet"]
+
+  base_filename = str(tmpdir.join('tree'))
+  exporters.export_family(family, base_filename, ['dot'])
+  with open(base_filename + '.dot') as dot_file:
+    dot = dot_file.read()
+  assert pedigree_lib.name_to_uid('new') in dot
+  assert pedigree_lib.name_to_uid('newer') in dot
+
+def test_sqlite_to_yaml(db_filename, yaml_family, tmpdir):
+  yaml_filename = str(tmpdir.join('back.yaml'))
+  pedigree_lib.convert_family(db_filename, yaml_filename)
+  assert pedigree_lib.load_family(yaml_filename) == yaml_family
+
+def test_sqlite_unicode_names(family, db_filename):
+  family.add_person(person(u'Zo\xeb'))
+  family.add_note(person(u'Zo\xeb'), u"Caf\xe9 owner")
+  family.commit()
+  reopened = pedigree_lib.load_family(db_filename)
+  zoe = reopened.name_to_person(u'Zo\xeb')
+  assert type(zoe.name) is unicode and zoe.name == u'Zo\xeb'
+  assert reopened.notes[zoe] == [u"Caf\xe9 owner"]
+
+def test_sqlite_rename_taken(family):
+  with pytest.raises(ValueError):
+    family.change_name(person('c'), 'b')
+  assert family.father(person('c')) == person('a')
+
+def test_sqlite_search(family):
+  family.change_name(person('b'), 'Pebbles Flintstone')
+  family.change_name(person('c'), 'Wilma Flint')
+  assert family.search('flint') == [person('Pebbles Flintstone'),
+      person('Wilma Flint')]
+  assert family.search('wil') == [person('Wilma Flint')]
+  assert family.search('peb flint') == [person('Pebbles Flintstone')]
+  assert family.search('named', k=1) == [person('a')]
+  assert family.number_of_persons() == 15
+
+def test_sqlite_dates(tmpdir):
+  yaml_filename = str(tmpdir.join('dates.yaml'))
+  with open(yaml_filename, 'w') as yaml_file:
+    yaml_file.write("people:\n  - a: {gender: male, born: 1900}\n"
+        "  - b: {gender: female, born: 1930, died: c. 2000}\n  - c: male\n"
+        "---\nfather:\n  a: [b]\n---\nmother:\n---\nspouse:\n---\n"
+        "notes:\n")
+  db_filename = str(tmpdir.join('dates.sqlite'))
+  pedigree_lib.convert_family(yaml_filename, db_filename)
+  family = pedigree_lib.load_family(db_filename)
+  b = family.name_to_person('b')
+  assert (b.born, b.died) == (1930, "c. 2000")
+  assert family.father(b).born == 1900
+  assert sorted(family.alive_in(1950)) == [person('a'), person('b')]
+  family.add_person(pedigree_lib.Person('d', 'male', born=1990))
+  assert sorted(family.alive_in(2001)) == [person('d')]
+
+  back = str(tmpdir.join('back.yaml'))
+  pedigree_lib.convert_family(db_filename, back)
+  assert pedigree_lib.load_family(back).name_to_person('b').died == \
+      "c. 2000"
+
+def test_sqlite_date_types(tmpdir):
+  yaml_filename = str(tmpdir.join('dates.yaml'))
+  with open(yaml_filename, 'w') as yaml_file:
+    yaml_file.write("people:\n  - a: {gender: male, born: 1930-03-02}\n"
+        "  - b: {gender: female, born: 1931, died: 1999-12-31}\n"
+        "---\nfather:\n  a: [b]\n---\nmother:\n---\nspouse:\n---\n"
+        "notes:\n")
+  db_filename = str(tmpdir.join('dates.sqlite'))
+  pedigree_lib.convert_family(yaml_filename, db_filename)
+  yaml_family = pedigree_lib.load_family(yaml_filename)
+  family = pedigree_lib.load_family(db_filename)
+  for name in 'ab':
+    for field in 'born', 'died':
+      value = getattr(family.name_to_person(name), field)
+      yaml_value = getattr(yaml_family.name_to_person(name), field)
+      assert (value, type(value)) == (yaml_value, type(yaml_value))
+  assert family.father(family.name_to_person('b')).born == \
+      datetime.date(1930, 3, 2)
+  for where in 'birth_year < 1931', 'birth_year == 1931':
+    assert family.select(where) == yaml_family.select(where)
+  assert family.select('birth_year < 1931') == [person('a')]
+
+  back = str(tmpdir.join('back.yaml'))
+  pedigree_lib.convert_family(db_filename, back)
+  assert pedigree_lib.load_family(back).name_to_person('a').born == \
+      datetime.date(1930, 3, 2)
+
+def test_sqlite_old_database(tmpdir):
+  db_filename = str(tmpdir.join('old.sqlite'))
+  connection = sqlite3.connect(db_filename)
+  connection.execute("CREATE TABLE persons (name TEXT PRIMARY KEY,"
+      " gender TEXT)")
+  connection.execute("INSERT INTO persons VALUES ('a', 'male')")
+  connection.commit()
+  connection.close()
+  family = pedigree_lib.load_family(db_filename)
+  assert family.name_to_person('a').born is None
+
+def test_sqlite_attributes(tmpdir):
+  yaml_filename = str(tmpdir.join('attributes.yaml'))
+  with open(yaml_filename, 'w') as yaml_file:
+    yaml_file.write("people:\n  - a: {gender: male, place: Bedrock}\n"
+        "  - b: {gender: female, tags: [x, y]}\n---\nfather:\n  a: [b]\n"
+        "---\nmother:\n---\nspouse:\n---\nnotes:\n")
+  db_filename = str(tmpdir.join('attributes.sqlite'))
+  pedigree_lib.convert_family(yaml_filename, db_filename)
+  family = pedigree_lib.load_family(db_filename)
+  assert family.select('"y" in tags') == [person('b')]
+  family.set_attribute(person('b'), 'place', 'Bedrock')
+  store = family.attributes
+  family.change_name(family.name_to_person('a'), 'aa')
+  family.add_person(person('c'))
+  assert family.attributes is store
+  assert sorted(family.select('place == "Bedrock"')) == \
+      [person('aa'), person('b')]
+  assert family.select('gender == "female"') == [person('b'), person('c')]
+  family.commit()
+
+  reopened = pedigree_lib.load_family(db_filename)
+  assert sorted(reopened.select('place == "Bedrock"')) == \
+      [person('aa'), person('b')]
+  back = str(tmpdir.join('back.yaml'))
+  pedigree_lib.convert_family(db_filename, back)
+  assert pedigree_lib.load_family(back).attributes_of(person('b')) == \
+      {'place': 'Bedrock', 'tags': ['x', 'y']}
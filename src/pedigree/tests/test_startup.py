@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+# Nothing the GUI or chart drawing needs, nor the slower libraries,
+# should be imported just to start a command.
+HEAVY_MODULES = ['easygui', 'Tkinter', 'webbrowser', 'tempfile',
+    'networkx', 'hashids', 'yaml', 'multiprocessing', 'sqlite3']
+
+
+def imported_modules(statement):
+  output = subprocess.check_output([sys.executable, '-c',
+      "import sys\n{}\nprint('\\n'.join(sys.modules))".format(statement)])
+  return set(output.split())
+
+
+def test_startup_imports_nothing_heavy():
+  modules = imported_modules("from pedigree import main")
+  assert 'pedigree.pedigree_lib' in modules
+  assert [name for name in HEAVY_MODULES if name in modules] == []
+
+def test_lazy_module():
+  modules = imported_modules(
+      "from pedigree import pedigree_lib\npedigree_lib.nx.MultiDiGraph")
+  assert 'networkx' in modules
+  assert 'yaml' not in modules
+
+def test_lazy_module_imports_once(monkeypatch):
+  from pedigree import pedigree_lib
+  imported = []
+  def import_module(name):
+    imported.append(name)
+    return __import__(name)
+  monkeypatch.setattr(pedigree_lib.importlib, 'import_module', import_module)
+  lazy_json = pedigree_lib.LazyModule('json')
+  assert lazy_json.dumps([1]) == '[1]'
+  assert lazy_json.loads('[1]') == [1]
+  assert imported == ['json']
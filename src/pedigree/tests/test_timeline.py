@@ -0,0 +1,76 @@
+from pedigree import pedigree_lib
+from pedigree import timeline
+import datetime
+import random
+import pytest
+
+def person(name, born=None, died=None, gender="male"):
+  return pedigree_lib.Person(name, gender, born, died)
+
+@pytest.fixture
+def family():
+  return pedigree_lib.yaml_to_family(
+      "people:\n"
+      "  - Ann: {gender: female, born: 1820, died: 1870}\n"
+      "  - Bob: {gender: male, born: 1815-06-01, died: c. 1850}\n"
+      "  - Cat: {gender: female, born: 1851}\n"
+      "  - Dan: male\n"
+      "  - Eve: {gender: female, died: 12 MAR 1890}\n"
+      "---\nfather:\n  Bob: [Cat]\n---\nmother:\n  Ann: [Cat]\n"
+      "---\nspouse:\n  Dan: [Eve]\n---\nnotes:\n")
+
+
+def test_year():
+  assert timeline.year(1850) == 1850
+  assert timeline.year(datetime.date(1850, 3, 2)) == 1850
+  assert timeline.year("12 MAR 1850") == 1850
+  assert timeline.year("c. 850") == 850
+  assert timeline.year("unknown") is None
+  assert timeline.year(None) is None
+
+def test_lifespan():
+  assert timeline.lifespan(person('a', 1800, 1850)) == (1800, 1850)
+  assert timeline.lifespan(person('a', 1800)) == (1800, 1900)
+  assert timeline.lifespan(person('a', died=1850)) == (1750, 1850)
+  assert timeline.lifespan(person('a')) is None
+
+def test_lifespans_match_brute_force():
+  random.seed(1)
+  persons = []
+  for i in range(500):
+    born = random.randint(1500, 2000)
+    persons.append(person(str(i), born, born + random.randint(0, 90)))
+  persons.append(person('undated'))
+  lifespans = timeline.Lifespans(persons)
+  assert len(lifespans) == 500
+  for year in range(1490, 2100, 7):
+    assert sorted(lifespans.alive_in(year)) == sorted(p for p in persons
+        if p.born is not None and p.born <= year <= p.died)
+    assert sorted(lifespans.alive_between(year, year + 20)) == \
+        sorted(p for p in persons
+            if p.born is not None and p.born <= year + 20 and
+                p.died >= year)
+
+def test_family_timeline(family):
+  names = lambda persons: sorted(p.name for p in persons)
+  assert names(family.alive_in(1849)) == ['Ann', 'Bob', 'Eve']
+  assert names(family.alive_in(1851)) == ['Ann', 'Cat', 'Eve']
+  assert names(family.alive_between(1880, 1900)) == ['Cat', 'Eve']
+  # Dan has no dates to go by
+  assert [(names([one, other]), years)
+      for one, other, years in family.couples_overlapping()] == \
+      [(['Ann', 'Bob'], (1820, 1850))]
+
+  # Newcomers are found once they're added
+  family.add_person(person('Fay', 1849, 1849))
+  assert 'Fay' in names(family.alive_in(1849))
+
+def test_generate_alive_in(family, tmpdir):
+  yaml_filename = str(tmpdir.join('dates.yaml'))
+  pedigree_lib.save_family(family, yaml_filename)
+  base = str(tmpdir.join('tree'))
+  pedigree_lib.generate_files(yaml_filename, base, ['dot'],
+      alive_in=1851)
+  dot = tmpdir.join('tree.dot').read()
+  assert 'label="Cat"' in dot and 'label="Ann"' in dot
+  assert 'label="Bob"' not in dot and 'label="Dan"' not in dot
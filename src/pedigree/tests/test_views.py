@@ -0,0 +1,79 @@
+from pedigree import pedigree_lib
+from pedigree import views
+from pedigree import gedcom
+import pytest
+import hashlib
+import sys
+import os
+
+@pytest.fixture
+def example_yaml_path():
+  return os.path.join(sys.prefix, 'examples/example.yaml')
+
+@pytest.fixture
+def family(example_yaml_path):
+  return pedigree_lib.load_family(example_yaml_path)
+
+def person(name, gender="female"):
+  return pedigree_lib.Person(name=name, gender=gender)
+
+
+def test_name_transforms():
+  assert views.initials("Fred Joseph Flintstone") == "F. J. F."
+  assert views.pseudonym("Fred", "salt") == views.pseudonym("Fred", "salt")
+  assert views.pseudonym("Fred", "salt") != views.pseudonym("Fred", "pepper")
+  assert views.pseudonym("Fred", "salt") != views.pseudonym("Wilma", "salt")
+  # Not a bare hash of the name, which could be looked up
+  assert hashlib.sha1("Fred").hexdigest()[:10] not in \
+      views.pseudonym("Fred", "")
+  assert views.pseudonym(u"Zo\xeb Br\xfbl\xe9", u"s\xe9l").startswith(
+      "Person ")
+  assert views.new_salt() != views.new_salt()
+  with pytest.raises(ValueError):
+    views.FamilyView(pedigree_lib.Family(), names='nicknames')
+
+def test_view_names(family):
+  wilma = family.name_to_person('Wilma Pebbles Slaghoople')
+  first = views.FamilyView(family, names='first')
+  assert first.label(wilma) == "Wilma"
+  assert first.uid(wilma) == family.uid(wilma)
+  assert first.notes is family.notes
+  assert first == family
+
+  anonymous = views.FamilyView(first, names='anonymous')
+  assert anonymous.label(wilma) == \
+      views.pseudonym('Wilma Pebbles Slaghoople', anonymous.salt)
+  assert anonymous.snapshot().label(wilma) == anonymous.label(wilma)
+  assert views.FamilyView(first, names='anonymous').label(wilma) != \
+      anonymous.label(wilma)
+  assert views.FamilyView(first, names='anonymous', salt="s").label(
+      wilma) == views.pseudonym('Wilma Pebbles Slaghoople', "s")
+  assert anonymous.uid(wilma) != family.uid(wilma)
+  assert anonymous.notes == {}
+  text = "\n".join(list(pedigree_lib.dot_file_generator(anonymous)) +
+      list(pedigree_lib.d3_html_page_generator(anonymous)) +
+      list(gedcom.gedcom_generator(anonymous)))
+  assert "Wilma" not in text
+  assert family.uid(wilma) not in text
+
+def test_lineage_view(family):
+  pebbles = family.name_to_person('Pebbles Flintstone')
+  view = views.FamilyView(family,
+      keep=views.lineage(family, pebbles))
+  names = view.names()
+  assert len(names) == 11
+  for name in ['Pebbles Flintstone', 'Roxy Rubble',
+      'Wilma Pebbles Slaghoople', 'Ricky Slaghoople', 'Ed Flintstone']:
+    assert name in names
+  # Spouses aren't part of the lineage
+  assert 'Bamm-Bamm Rubble' not in names
+  assert view.name_to_person('Bamm-Bamm Rubble') is None
+  assert view.all_spouses(pebbles) == []
+  assert sorted(view.children(pebbles)) == \
+      sorted(family.children(pebbles))
+  assert len(view.spouses()) < len(family.spouses())
+  with pytest.raises(TypeError):
+    view.add_person(person('Dino', 'male'))
+  with pytest.raises(TypeError):
+    view.change_gender(pebbles, 'male')
+  assert family.name_to_person('Pebbles Flintstone').gender == 'female'
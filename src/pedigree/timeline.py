@@ -0,0 +1,164 @@
+import bisect
+import datetime
+import re
+
+"""
+When people lived, for questions like "who was alive in 1850?"
+
+Each person with a known birth or death year has a lifespan, the
+years from one to the other, and Lifespans keeps them all in an
+interval tree: each node holds the lifespans containing its
+centre year, sorted by start and by end, with those entirely
+before or after it in its left and right subtrees.  A year is
+looked up by going down one path of the tree, taking lifespans
+off the front of the lists at each node until one doesn't
+contain it, so a query takes O(log n + k) for k people found.
+"""
+
+# Years someone is taken to have lived when only one of their
+# dates is known
+MAX_AGE = 100
+
+year_regex = re.compile(r'\b(\d{3,4})\b')
+
+
+def year(date):
+  """
+  The year of a date as it might be given: 1850, a `datetime.date`
+  or text such as "12 MAR 1850" or "c. 1850".  None if there's no
+  telling.
+  """
+  if date is None or isinstance(date, bool):
+    return None
+  if isinstance(date, (int, long)):
+    return date
+  if isinstance(date, (datetime.date, datetime.datetime)):
+    return date.year
+  match = year_regex.search(unicode(date))
+  return int(match.group(1)) if match else None
+
+
+def lifespan(person):
+  """
+  `(born, died)` years for `person`, guessing one from the other
+  with MAX_AGE if need be, or None if neither is known.
+  """
+  born, died = year(person.born), year(person.died)
+  if born is None and died is None:
+    return None
+  if born is None:
+    born = died - MAX_AGE
+  if died is None:
+    died = born + MAX_AGE
+  return (born, died) if born <= died else (died, born)
+
+
+def overlap(span, other_span):
+  """The years two lifespans share, as `(start, end)`, or None"""
+  start = max(span[0], other_span[0])
+  end = min(span[1], other_span[1])
+  return (start, end) if start <= end else None
+
+
+class Lifespans(object):
+  """
+  An interval tree of the lifespans of `persons`, built once in
+  O(n log n).  Those with no dates at all are left out.
+  """
+  def __init__(self, persons):
+    self.spans = {}
+    for person in persons:
+      span = lifespan(person)
+      if span is not None:
+        self.spans[person] = span
+    entries = sorted((span[0], span[1], person)
+        for person, span in self.spans.iteritems())
+    # Everyone sorted by start, for people born in a range of years
+    self.starts = [entry[0] for entry in entries]
+    self.by_start = [entry[2] for entry in entries]
+    self.root = self._build(entries)
+
+  def _build(self, entries):
+    """
+    A node `(centre, starts, by_start, ends, by_end, left, right)`
+    for `entries`, sorted by start, or None if there are none.
+    `ends` go from the latest down, so both lists are read from
+    the front.
+    """
+    if not entries:
+      return None
+    centre = entries[len(entries) // 2][0]
+    # Nobody in the node can end before the centre, so the
+    # spans of people born after it are all on the right
+    before = []
+    here = []
+    after = []
+    for entry in entries:
+      if entry[1] < centre:
+        before.append(entry)
+      elif entry[0] > centre:
+        after.append(entry)
+      else:
+        here.append(entry)
+    by_end = sorted(here, key=lambda entry: -entry[1])
+    return (centre,
+        [entry[0] for entry in here], [entry[2] for entry in here],
+        [entry[1] for entry in by_end], [entry[2] for entry in by_end],
+        self._build(before), self._build(after))
+
+  def __len__(self):
+    return len(self.spans)
+
+  def alive_in(self, year):
+    """Everyone whose lifespan includes `year`"""
+    found = []
+    node = self.root
+    while node is not None:
+      centre, starts, by_start, ends, by_end, left, right = node
+      if year < centre:
+        found.extend(by_start[:bisect.bisect_right(starts, year)])
+        node = left
+      elif year > centre:
+        # `ends` goes down, so count how many are still >= year
+        found.extend(by_end[:_count_at_least(ends, year)])
+        node = right
+      else:
+        found.extend(by_start)
+        node = None
+    return found
+
+  def alive_between(self, start, end):
+    """Everyone alive at some point from `start` to `end`"""
+    # Alive at the start, or born after it but by the end
+    found = self.alive_in(start)
+    found.extend(self.by_start[bisect.bisect_right(self.starts, start):
+        bisect.bisect_right(self.starts, end)])
+    return found
+
+  def overlapping(self, person, other):
+    """The years `person` and `other` were both alive, or None"""
+    if person not in self.spans or other not in self.spans:
+      return None
+    return overlap(self.spans[person], self.spans[other])
+
+  def couples_overlapping(self, couples):
+    """
+    `(person, other, (start, end))` for each of `couples` (pairs,
+    as from Family.couples) who were alive at the same time.
+    """
+    for person, other in couples:
+      years = self.overlapping(person, other)
+      if years is not None:
+        yield person, other, years
+
+
+def _count_at_least(descending, value):
+  """How many of the front of `descending` are >= `value`"""
+  low, high = 0, len(descending)
+  while low < high:
+    middle = (low + high) // 2
+    if descending[middle] >= value:
+      low = middle + 1
+    else:
+      high = middle
+  return low
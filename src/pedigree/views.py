@@ -0,0 +1,247 @@
+import hashlib
+import hmac
+import os
+from pedigree.pedigree_lib import Family, PersonExistsError, first_name, \
+    memoized, name_to_uid
+
+"""
+Views show a Family with its names changed (first names only,
+initials, or anonymized) and/or only some of its people, without
+copying anything.  A view can be given to anything that takes a
+Family to read from, such as the chart generators and exporters,
+and works things out from the Family it shows as it's asked.
+Views can be wrapped in other views but not changed.
+"""
+
+
+def initials(name):
+  """`"Fred Joseph Flintstone"` -> `"F. J. F."`"""
+  return " ".join(word[0] + "." for word in name.split())
+
+
+def new_salt():
+  """A random salt for `pseudonym`, different every time"""
+  return os.urandom(16).encode('hex')
+
+
+def _utf8(text):
+  return text.encode('utf-8') if isinstance(text, unicode) else text
+
+
+def pseudonym(name, salt):
+  """
+  A stand-in for `name`, the same every time for the same `salt`:
+  an HMAC of the name keyed with `salt`, so it can't be worked out
+  from a list of likely names without the salt.
+  """
+  return "Person {}".format(hmac.new(_utf8(salt), _utf8(name),
+      hashlib.sha1).hexdigest()[:10])
+
+
+NAME_TRANSFORMS = {
+  'full': None,
+  'first': first_name,
+  'initials': initials,
+  'anonymous': pseudonym,
+}
+
+
+def lineage(family, person):
+  """
+  A filter for FamilyView keeping `person` with all their
+  ancestors and descendants.
+  """
+  parents = {}
+  children = {}
+  for relator, relative, relation_type in family.relations():
+    if relation_type != "spouse":
+      parents.setdefault(relative.name, []).append(relator.name)
+      children.setdefault(relator.name, []).append(relative.name)
+  kept = set([person.name])
+  for edges in parents, children:
+    to_visit = [person.name]
+    while to_visit:
+      for name in edges.get(to_visit.pop(), []):
+        if name not in kept:
+          kept.add(name)
+          to_visit.append(name)
+  return lambda person: person.name in kept
+
+
+def alive_in(family, year):
+  """A filter for FamilyView keeping those alive in `year`"""
+  kept = set(person.name for person in family.alive_in(year))
+  return lambda person: person.name in kept
+
+
+def where(family, expression):
+  """
+  A filter for FamilyView keeping those `expression` (as in
+  attributes.Filter) holds for
+  """
+  kept = set(person.name for person in family.select(expression))
+  return lambda person: person.name in kept
+
+
+def both(keep, other_keep):
+  """A filter keeping who both filters keep, either being None"""
+  if keep is None or other_keep is None:
+    return keep or other_keep
+  return lambda person: keep(person) and other_keep(person)
+
+
+class FamilyView(Family):
+  """
+  `family` with names shown as `names` says (one of
+  NAME_TRANSFORMS) and only the people `keep(person)` is true for.
+
+  Ids of people (`uid`) stay those of `family`, so they match
+  from one view to another, except in anonymized views, whose ids
+  and labels come from `pseudonym(name, salt)` and which have no
+  notes.  Without a `salt` the view makes a random one, so its
+  pseudonyms only match those of its own snapshots.
+  """
+  def __init__(self, family, names='full', keep=None, salt=None):
+    if names not in NAME_TRANSFORMS:
+      raise ValueError("Unknown names {}; choose from {}".format(
+          names, ", ".join(sorted(NAME_TRANSFORMS))))
+    self.family = family
+    self.names_shown = names
+    self.keep = keep
+    self.salt = new_salt() if salt is None else salt
+    self.notes = {} if names == 'anonymous' else family.notes
+    self._search_index = None
+    self._memo = {}
+
+  def snapshot(self):
+    return FamilyView(self.family.snapshot(), self.names_shown,
+        self.keep, self.salt)
+
+  @property
+  def attributes(self):
+    return self.family.attributes
+
+  @property
+  def version(self):
+    return self.family.version
+
+  def attributes_of(self, person):
+    if self.names_shown == 'anonymous':
+      return {}
+    return self.family.attributes_of(person)
+
+  def select(self, expression):
+    return [person for person in self.family.select(expression)
+        if self._keeps(person)]
+
+  def _keeps(self, person):
+    return person is not None and (self.keep is None or self.keep(person))
+
+  def label(self, person):
+    if self.names_shown == 'anonymous':
+      return pseudonym(person.name, self.salt)
+    label = self.family.label(person)
+    if self.names_shown == 'full':
+      return label
+    return NAME_TRANSFORMS[self.names_shown](label)
+
+  def uid(self, person):
+    if self.names_shown == 'anonymous':
+      return name_to_uid(self.label(person))
+    return self.family.uid(person)
+
+  def persons(self):
+    if self.keep is None:
+      return self.family.persons()
+    return [person for person in self.family.persons()
+        if self.keep(person)]
+
+  def number_of_persons(self):
+    if self.keep is None:
+      return self.family.number_of_persons()
+    return len(self.persons())
+
+  def name_to_person(self, name):
+    person = self.family.name_to_person(name)
+    return person if self._keeps(person) else None
+
+  def relations(self):
+    for relator, person, relation_type in self.family.relations():
+      if self._keeps(relator) and self._keeps(person):
+        yield relator, person, relation_type
+
+  def _relators(self, relation_type):
+    # One Person per name, in case `family` makes new ones each time
+    return set(dict(
+        (relator.name, relator)
+        for relator, person, kind in self.relations()
+        if kind == relation_type
+      ).values())
+
+  @memoized
+  def fathers(self):
+    if self.keep is None:
+      return self.family.fathers()
+    return self._relators("father")
+
+  @memoized
+  def mothers(self):
+    if self.keep is None:
+      return self.family.mothers()
+    return self._relators("mother")
+
+  @memoized
+  def spouses(self):
+    if self.keep is None:
+      return self.family.spouses()
+    return self._relators("spouse")
+
+  def children(self, parent):
+    if not self._keeps(parent):
+      raise PersonExistsError(
+          "{} isn't in the family yet.".format(parent))
+    return [child for child in self.family.children(parent)
+        if self._keeps(child)]
+
+  def father(self, person):
+    father = self.family.father(person)
+    return father if self._keeps(father) else None
+
+  def mother(self, person):
+    mother = self.family.mother(person)
+    return mother if self._keeps(mother) else None
+
+  def all_spouses(self, person):
+    return [spouse for spouse in self.family.all_spouses(person)
+        if self._keeps(spouse)]
+
+  def partners(self, person):
+    return [partner for partner in self.family.partners(person)
+        if self._keeps(partner)]
+
+  def components(self, batch_size=1):
+    """
+    As Family.components, but each part is a view like this one of
+    the people in it, so parts show the same names and ids
+    """
+    parts = []
+    for part in Family.components(self, batch_size):
+      names = frozenset(part.names())
+      parts.append(FamilyView(self.family, self.names_shown,
+          both(self.keep, lambda person, names=names: person.name in names),
+          self.salt))
+    return parts
+
+
+def _read_only(method_name):
+  def method(self, *args, **kwargs):
+    raise TypeError("Can't {} through a FamilyView; change the"
+        " Family it shows instead.".format(method_name))
+  method.__name__ = method_name
+  return method
+
+for method_name in ['add_person', 'change_name', 'add_note',
+    'delete_note', 'add_child', 'add_children', 'add_spouse',
+    'add_spouses', 'add_full_sibling', 'add_mother', 'add_father',
+    'set_attribute', 'change_gender']:
+  setattr(FamilyView, method_name, _read_only(method_name))